@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+Measures the throughput of parsing a synthetic Drill /query.json response body
+with the ijson backend used by the driver, fed first by the original
+byte-at-a-time stream wrapper and then by the buffered ResponseStreamWrapper.
+
+Usage: PYTHONPATH=. python benchmarks/bench_stream_reader.py [--mb 1024] [--chunk-size 65536]
+"""
+import argparse
+import io
+import time
+from itertools import chain, islice
+
+from requests import Response
+
+from sqlalchemy_drill.drilldbapi._drilldbapi import ResponseStreamWrapper, _ijson_backend
+from sqlalchemy_drill.drilldbapi._transport import wrap_requests_response
+
+_HEAD = (
+    b'{"queryId":"1f8a3c2e-0000-0000-0000-000000000000",'
+    b'"columns":["id","name","amount","ts"],'
+    b'"metadata":["BIGINT","VARCHAR","FLOAT8","TIMESTAMP"],"rows":['
+)
+_ROW = (
+    b'{"id":%d,"name":"customer name %d","amount":%d.25,"ts":1622505600000},'
+)
+_TAIL = b'{}],"queryState":"COMPLETED"}'
+
+
+class SyntheticBody(io.RawIOBase):
+    """A raw stream generating a query.json body of roughly the given size."""
+
+    def __init__(self, size: int):
+        super().__init__()
+        self._size = size
+        self._produced = 0
+        self._pending = bytearray(_HEAD)
+        self._row = 0
+        self._done = False
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while len(self._pending) < len(b) and not self._done:
+            rows = b''.join(_ROW % (i, i, i) for i in range(self._row, self._row + 1000))
+            self._row += 1000
+            self._produced += len(rows)
+            if self._produced >= self._size:
+                rows += _TAIL
+                self._done = True
+            self._pending += rows
+
+        n = min(len(b), len(self._pending))
+        b[:n] = self._pending[:n]
+        del self._pending[:n]
+        return n
+
+
+class ByteAtATimeWrapper:
+    """The original byte-at-a-time stream wrapper, retained for comparison."""
+
+    def __init__(self, resp: Response):
+        self.data = chain.from_iterable(resp.iter_content())
+
+    def read(self, n):
+        return bytes(islice(self.data, None, n))
+
+
+def make_response(size: int) -> Response:
+    resp = Response()
+    resp.status_code = 200
+    resp.raw = io.BufferedReader(SyntheticBody(size), buffer_size=1024 * 1024)
+    return resp
+
+
+def read_all(reader, chunk_size: int):
+    while reader.read(chunk_size):
+        pass
+
+
+def parse_all(reader, chunk_size: int):
+    for _ in _ijson_backend.parse(reader, buf_size=chunk_size):
+        pass
+
+
+def run(name: str, size: int, make_reader, chunk_size: int):
+    for label, consume in (('read', read_all), ('ijson parse', parse_all)):
+        reader = make_reader(make_response(size))
+        start = time.perf_counter()
+        consume(reader, chunk_size)
+        elapsed = time.perf_counter() - start
+        print(f'{name:>24} {label:>12}: {size / elapsed / 2**20:8.1f} MB/s')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--mb', type=int, default=1024, help='body size in MiB')
+    parser.add_argument('--chunk-size', type=int, default=64 * 1024)
+    args = parser.parse_args()
+    size = args.mb * 2**20
+    print(f'ijson backend: {_ijson_backend.backend_name}')
+
+    run('byte-at-a-time (before)', size, ByteAtATimeWrapper, args.chunk_size)
+    run(
+        'buffered (after)', size,
+        lambda resp: ResponseStreamWrapper(wrap_requests_response(resp), args.chunk_size), args.chunk_size
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -55,6 +55,10 @@ setup(name='sqlalchemy_drill',
       extras_require={
           "jdbc": ["JPype1", "JayDeBeApi"],
           "odbc": ["pyodbc"],
+          "arrow": ["pyarrow"],
+          "pandas": ["pandas>=2.0"],
+          "httpx": ["httpx[http2]"],
+          "asyncio": ["httpx[http2]", "greenlet"],
       },
       keywords='SQLAlchemy Apache Drill',
       author='John Omernik, Charles Givre, Davide Miceli, Massimo Martiradonna'
@@ -74,6 +78,7 @@ setup(name='sqlalchemy_drill',
           'sqlalchemy.dialects': [
               'drill = sqlalchemy_drill.sadrill:DrillDialect_sadrill',
               'drill.sadrill = sqlalchemy_drill.sadrill:DrillDialect_sadrill',
+              'drill.async = sqlalchemy_drill.sadrill:DrillDialect_async',
               'drill.jdbc = sqlalchemy_drill.jdbc:DrillDialect_jdbc',
               'drill.odbc = sqlalchemy_drill.odbc:DrillDialect_odbc',
           ]
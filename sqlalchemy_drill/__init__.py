@@ -24,6 +24,7 @@ from sqlalchemy.dialects import registry
 
 registry.register("drill", "sqlalchemy_drill.sadrill", "DrillDialect_sadrill")
 registry.register("drill.sadrill", "sqlalchemy_drill.sadrill", "DrillDialect_sadrill")
+registry.register("drill.async", "sqlalchemy_drill.sadrill", "DrillDialect_async")
 
 registry.register("drill.jdbc", "sqlalchemy_drill.jdbc", "DrillDialect_jdbc")
 
@@ -21,7 +21,12 @@
 
 from __future__ import absolute_import
 from __future__ import unicode_literals
+import copy
+import functools
 import logging
+import re
+import threading
+import time
 from urllib.parse import unquote
 
 from sqlalchemy import exc, pool, types
@@ -31,6 +36,9 @@ from sqlalchemy import inspect
 
 logger = logging.getLogger('drilldbapi')
 
+# Statements after which cached metadata may be out of date
+_DDL_PATTERN = re.compile(r'^[\s(]*(create|drop|alter|refresh)\b', re.IGNORECASE)
+
 
 _type_map = {
     'bit': types.BOOLEAN,
@@ -68,6 +76,40 @@ _type_map = {
 }
 
 
+def _cached_metadata(method):
+    """
+    Decorator caching the results of a reflection method by its arguments,
+    other than the connection, for the dialect's metadata_cache_ttl seconds.
+    Results of None, returned after errors, are not cached.
+    """
+    code = method.__code__
+    names = code.co_varnames[2:code.co_argcount]
+
+    @functools.wraps(method)
+    def wrapper(self, connection, *args, **kw):
+        ttl = self.metadata_cache_ttl
+        if not ttl:
+            return method(self, connection, *args, **kw)
+
+        bound = dict(zip(names, args))
+        bound.update((n, kw[n]) for n in names if n in kw)
+        key = (method.__name__,) + tuple(bound.get(n) for n in names)
+        now = time.monotonic()
+        with self._metadata_lock:
+            cached = self._metadata_cache.get(key)
+        if cached is not None and cached[0] > now:
+            logger.debug(f'uses cached metadata for {key}.')
+            return copy.deepcopy(cached[1])
+
+        result = method(self, connection, *args, **kw)
+        if result is not None:
+            with self._metadata_lock:
+                self._metadata_cache[key] = (now + ttl, copy.deepcopy(result))
+        return result
+
+    return wrapper
+
+
 class DrillCompiler_sadrill(compiler.SQLCompiler):
 
     def default_from(self):
@@ -210,7 +252,7 @@ class DrillDialect(default.DefaultDialect):
     description_encoding = None
     supports_native_boolean = True
 
-    def __init__(self, **kw):
+    def __init__(self, metadata_cache_ttl: float = 0, **kw):
         super().__init__(**kw)
         self.supported_extensions = []
         # Initialize attributes that will be set in create_connect_args
@@ -223,6 +265,39 @@ class DrillDialect(default.DefaultDialect):
         self.workspace = None
         self.plugin_type = None
         self.quoted_schema = None
+        # Reflected metadata with its expiry time, shared by the connections
+        # of the engine. The cache is off while the TTL is 0.
+        self.metadata_cache_ttl = float(metadata_cache_ttl)
+        self._metadata_cache = {}
+        self._metadata_lock = threading.Lock()
+
+    def clear_metadata_cache(self):
+        """Empties the cache of reflected schemas, plugin types, tables, views and columns."""
+        with self._metadata_lock:
+            self._metadata_cache.clear()
+
+    def _pop_dialect_args(self, qargs: dict):
+        """Removes URL query parameters which configure the dialect rather than the connection."""
+        if 'metadata_cache_ttl' in qargs:
+            self.metadata_cache_ttl = float(qargs.pop('metadata_cache_ttl'))
+
+    def _invalidate_metadata(self, statement: str):
+        """Clears the metadata cache before a statement which may change the metadata."""
+        if self._metadata_cache and _DDL_PATTERN.match(statement):
+            logger.debug('clears the metadata cache before a DDL statement.')
+            self.clear_metadata_cache()
+
+    def do_execute(self, cursor, statement, parameters, context=None):
+        self._invalidate_metadata(statement)
+        super().do_execute(cursor, statement, parameters, context)
+
+    def do_execute_no_params(self, cursor, statement, context=None):
+        self._invalidate_metadata(statement)
+        super().do_execute_no_params(cursor, statement, context)
+
+    def do_executemany(self, cursor, statement, parameters, context=None):
+        self._invalidate_metadata(statement)
+        super().do_executemany(cursor, statement, parameters, context)
 
     @classmethod
     def import_dbapi(cls):
@@ -259,6 +334,7 @@ class DrillDialect(default.DefaultDialect):
 
             qargs.update(url.query)
             qargs['db'] = db
+            self._pop_dialect_args(qargs)
 
             # Convert stream_results to boolean if present
             if 'stream_results' in qargs:
@@ -290,6 +366,7 @@ class DrillDialect(default.DefaultDialect):
         """Drill has no support for primary keys.  Retunrs an empty list."""
         return []
 
+    @_cached_metadata
     def get_schema_names(self, connection, **kw):
         # Get table information
         query = "SHOW DATABASES"
@@ -313,6 +390,7 @@ class DrillDialect(default.DefaultDialect):
         logger.info(f"Storage Plugin: {self.storage_plugin}")
         return self.storage_plugin
 
+    @_cached_metadata
     def get_table_names(self, connection, schema=None, **kw):
         if schema is None:
             schema = connection.engine.url.database
@@ -359,6 +437,7 @@ class DrillDialect(default.DefaultDialect):
 
         return tuple(tables_names)
 
+    @_cached_metadata
     def get_view_names(self, connection, schema=None, **kw):
         view_names = []
         curs = connection.execute(
@@ -402,6 +481,7 @@ class DrillDialect(default.DefaultDialect):
             logger.warning(f"Unknown Drill data type: '{data_type}', using UserDefinedType")
             return types.UserDefinedType
 
+    @_cached_metadata
     def get_columns(self, connection, table_name, schema=None, **kw):
         result = []
 
@@ -471,6 +551,7 @@ class DrillDialect(default.DefaultDialect):
         logger.debug(f"Result: {result}")
         return result
 
+    @_cached_metadata
     def get_plugin_type(self, connection, plugin=None):
         if plugin is None:
             return None
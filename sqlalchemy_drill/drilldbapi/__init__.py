@@ -1,2 +1,3 @@
 from ._drilldbapi import *
+from ._async import *
 from .api_exceptions import *
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+Builds Apache Arrow arrays and record batches from the row data batches
+decoded by the Cursor. This module is only imported on demand because pyarrow
+is an optional dependency, installable with the arrow extra.
+"""
+import logging
+from json import dumps
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+logger = logging.getLogger('drilldbapi')
+
+# Arrow types for Drill column types, other types are inferred from the data
+_ARROW_TYPES = {
+    'BIT': pa.bool_(),
+    'TINYINT': pa.int8(),
+    'SMALLINT': pa.int16(),
+    'INT': pa.int32(),
+    'BIGINT': pa.int64(),
+    'FLOAT4': pa.float32(),
+    'FLOAT8': pa.float64(),
+    'VARCHAR': pa.string(),
+    'DATE': pa.date32(),
+    'TIME': pa.time32('ms'),
+    'TIMESTAMP': pa.timestamp('ms'),
+}
+
+_MS_PER_DAY = 86_400_000
+
+
+def _first_value(values: list):
+    return next((v for v in values if v is not None), None)
+
+
+def _array_from_strings(values: list, col_type: str, arrow_type: pa.DataType) -> pa.Array:
+    """
+    Returns an Arrow array of the given type parsed from the strings which
+    Drill < 1.19 sends for the values of every column, e.g. '2021-06-01' for
+    a DATE or '2021-06-01T12:30:45.123' for a TIMESTAMP.
+    """
+    strings = pa.array(values, pa.string())
+    if col_type == 'TIME':
+        # strings cannot be cast to times, timestamps can
+        strings = pc.binary_join_element_wise('1970-01-01T', strings, '')
+        return strings.cast(pa.timestamp('ms')).cast(arrow_type)
+    return strings.cast(arrow_type)
+
+
+def _inferred_array(values: list, col_type: str) -> pa.Array:
+    """
+    Returns an Arrow array of a type inferred from the values, or of their
+    JSON strings if they have none in common, e.g. those of a MAP column.
+    """
+    try:
+        return pa.array(values)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        logger.debug(f'could not infer an Arrow type for {col_type}, using JSON strings.')
+        return pa.array(
+            [v if v is None or isinstance(v, str) else dumps(v, default=str) for v in values],
+            pa.string()
+        )
+
+
+def _date_array(values: list, arrow_type: pa.DataType) -> pa.Array:
+    return pa.array(values, pa.timestamp('ms')).cast(arrow_type)
+
+
+def _time_array(values: list, arrow_type: pa.DataType) -> pa.Array:
+    return pa.array(
+        [None if v is None else v % _MS_PER_DAY for v in values], arrow_type
+    )
+
+
+def _typed_array(values: list, arrow_type: pa.DataType) -> pa.Array:
+    try:
+        return pa.array(values, arrow_type)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # e.g. floating point values decoded as Decimal
+        if pa.types.is_floating(arrow_type):
+            return pa.array([None if v is None else float(v) for v in values], arrow_type)
+        raise
+
+
+# Builders of Arrow arrays from Unix times in ms, other typed columns are
+# built by _typed_array
+_ARRAY_BUILDERS = {
+    'DATE': _date_array,
+    'TIME': _time_array,
+}
+
+
+def column_array(values: list, col_type: str = None) -> pa.Array:
+    """
+    Returns an Arrow array holding the raw (not typecast) values of a column of
+    the given Drill type. Temporal values are expected as Unix time in ms, or
+    as the strings sent by Drill < 1.19.
+    """
+    arrow_type = _ARROW_TYPES.get(col_type)
+    if arrow_type is None:
+        return _inferred_array(values, col_type)
+    if arrow_type != pa.string() and isinstance(_first_value(values), str):
+        return _array_from_strings(values, col_type, arrow_type)
+
+    return _ARRAY_BUILDERS.get(col_type, _typed_array)(values, arrow_type)
+
+
+def record_batch(columns: list, names: list, col_types: list,
+                 schema: pa.Schema = None) -> pa.RecordBatch:
+    """
+    Returns a record batch of the given columns of raw values. If a schema is
+    given, e.g. the schema of the first batch of a result, arrays with types
+    inferred differently are cast to it.
+    """
+    arrays = [column_array(col, t) for col, t in zip(columns, col_types)]
+
+    if schema is not None:
+        arrays = [
+            arr if arr.type == field.type else arr.cast(field.type)
+            for arr, field in zip(arrays, schema)
+        ]
+        return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+    return pa.RecordBatch.from_arrays(arrays, names=names)
+
+
+def empty_schema(names: list, col_types: list) -> pa.Schema:
+    """Returns the schema of a result without rows, typing unknown columns as strings."""
+    return pa.schema([
+        pa.field(name, _ARROW_TYPES.get(t, pa.string()))
+        for name, t in zip(names, col_types)
+    ])
+
+
+def table(batches: list, schema: pa.Schema) -> pa.Table:
+    """Returns a table of the given record batches."""
+    return pa.Table.from_batches(batches, schema=schema)
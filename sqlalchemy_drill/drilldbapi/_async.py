@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+asyncio counterparts of the Connection and Cursor.
+
+An AsyncConnection wraps a Connection over an AsyncHttpxTransport. Its
+methods run the blocking methods of the Connection and Cursor in greenlets
+spawned by SQLAlchemy's greenlet_spawn, which the transport suspends while
+it awaits the network, so that many queries can be in flight on one event
+loop without a thread each. Result parsing, load balancing and retries are
+those of the blocking Connection. Rows of the current batch are fetched
+without spawning a greenlet. Requires httpx and greenlet, installable with
+the asyncio extra.
+"""
+from sqlalchemy.util import greenlet_spawn
+
+from . import api_globals
+from ._drilldbapi import Connection, Cursor, connect
+from .api_exceptions import NotSupportedError
+
+__all__ = ['AsyncConnection', 'AsyncCursor', 'async_connect']
+
+
+class AsyncCursor:
+    """An asyncio cursor, whose methods which may read from Drill are coroutines."""
+
+    def __init__(self, cursor: Cursor):
+        self._cursor = cursor
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self) -> int:
+        return self._cursor.rowcount
+
+    @property
+    def rownumber(self) -> int:
+        return self._cursor.rownumber
+
+    @property
+    def arraysize(self) -> int:
+        return self._cursor.arraysize
+
+    @arraysize.setter
+    def arraysize(self, size: int):
+        self._cursor.arraysize = size
+
+    @property
+    def use_cache(self) -> bool:
+        return self._cursor.use_cache
+
+    @use_cache.setter
+    def use_cache(self, use: bool):
+        self._cursor.use_cache = use
+
+    @property
+    def result_md(self) -> dict:
+        return self._cursor.result_md
+
+    @property
+    def bytes_received(self) -> int:
+        return self._cursor.bytes_received
+
+    @property
+    def bytes_decoded(self) -> int:
+        return self._cursor.bytes_decoded
+
+    def get_query_id(self) -> str:
+        return self._cursor.get_query_id()
+
+    def get_column_names(self):
+        return self._cursor.get_column_names()
+
+    async def execute(self, operation, parameters=(), options: dict = None):
+        await greenlet_spawn(self._cursor.execute, operation, parameters, options)
+
+    async def executemany(self, operation, seq_of_parameters, options: dict = None):
+        await greenlet_spawn(
+            self._cursor.executemany, operation, seq_of_parameters, options
+        )
+
+    async def fetchone(self):
+        if self._cursor._buffered_rows:
+            return self._cursor.fetchone()
+        return await greenlet_spawn(self._cursor.fetchone)
+
+    async def fetchmany(self, size: int = None):
+        if 0 < (size or self.arraysize) <= self._cursor._buffered_rows:
+            return self._cursor.fetchmany(size)
+        return await greenlet_spawn(self._cursor.fetchmany, size)
+
+    async def fetchall(self):
+        return await greenlet_spawn(self._cursor.fetchall)
+
+    async def fetch_columns(self, size: int = None):
+        return await greenlet_spawn(self._cursor.fetch_columns, size)
+
+    async def fetch_arrow_table(self):
+        return await greenlet_spawn(self._cursor.fetch_arrow_table)
+
+    async def fetch_df(self):
+        return await greenlet_spawn(self._cursor.fetch_df)
+
+    async def close(self):
+        await greenlet_spawn(self._cursor.close)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._cursor._buffered_rows:
+            return next(self._cursor)
+
+        row = await greenlet_spawn(self._cursor.fetchone)
+        if row is None:
+            raise StopAsyncIteration
+        return row
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        if self._cursor._is_open:
+            await self.close()
+
+
+class AsyncConnection:
+    """An asyncio connection to Drill, made by async_connect."""
+
+    def __init__(self, connection: Connection):
+        # the blocking connection, whose methods must be run by greenlet_spawn
+        self.sync_connection = connection
+
+    @property
+    def drill_version(self) -> str:
+        return self.sync_connection.drill_version
+
+    @property
+    def result_cache(self):
+        return self.sync_connection.result_cache
+
+    def is_connected(self) -> bool:
+        return self.sync_connection.is_connected()
+
+    def cursor(self) -> AsyncCursor:
+        return AsyncCursor(self.sync_connection.cursor())
+
+    async def commit(self):
+        self.sync_connection.commit()
+
+    async def cancel_query(self, query_id: str):
+        await greenlet_spawn(self.sync_connection.cancel_query, query_id)
+
+    async def close(self):
+        await greenlet_spawn(self.sync_connection.close)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        if self.is_connected():
+            await self.close()
+
+
+async def async_connect(host: str, port: int = 8047, **kwargs) -> AsyncConnection:
+    """
+    Establishes an asyncio connection with an Apache Drill server, using an
+    httpx AsyncClient. Takes the parameters of connect() except transport,
+    prefetch and hedge_percentile.
+    """
+    for name in ('transport', 'prefetch', 'hedge_percentile'):
+        if kwargs.get(name):
+            raise NotSupportedError(
+                f'The {name} parameter is not supported by async connections.',
+                None
+            )
+    kwargs['transport'] = 'httpx_async'
+    kwargs.setdefault('pool_maxsize', api_globals._ASYNC_POOL_MAXSIZE)
+
+    return AsyncConnection(await greenlet_spawn(connect, host, port, **kwargs))
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+Client side load balancing of queries across the drillbits of a cluster.
+
+Every drillbit can act as the foreman of a query, so a connection given
+several drillbits spreads its queries across them rather than making one
+foreman of them all. Drillbits which cannot be reached are ejected for a
+period which doubles with each consecutive failure, then re-admitted on
+trial, one query at a time. Once every drillbit has been ejected and the
+first due back has failed repeatedly, its circuit breaker is open and
+queries fail fast until it is due. Balancers, and so the outstanding query
+counts and health of the drillbits, are shared by all of the connections in
+a process to the same drillbits.
+
+Balancers also record how long drillbits take to start responding, from
+which the delay before hedging a query on a second drillbit is taken, and
+hold the budget which limits how many failed queries are retried.
+"""
+import logging
+import random
+import threading
+import time
+from collections import deque
+from typing import List
+
+from . import api_globals
+from .api_exceptions import OperationalError, ProgrammingError
+
+logger = logging.getLogger('drilldbapi')
+
+_POLICIES = ('round_robin', 'least_outstanding')
+
+
+class Drillbit:
+    """The REST endpoint of a drillbit and its health as seen by this process."""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        # queries sent to the drillbit whose responses are still open
+        self.outstanding = 0
+        # consecutive failures to reach the drillbit
+        self.failures = 0
+        self.ejected_until = 0.0
+
+    def __repr__(self):
+        return f'Drillbit({self.base_url})'
+
+
+class Balancer:
+    """Chooses the drillbit for each query by round robin or least outstanding queries."""
+
+    def __init__(self, base_urls: List[str], policy: str = 'round_robin'):
+        self.drillbits = [Drillbit(url) for url in base_urls]
+        self._policy = policy
+        # connections start their rotations at different drillbits
+        self._next = random.randrange(len(self.drillbits))
+        # the latest times taken to receive response headers, in seconds
+        self._latencies = deque(maxlen=api_globals._LATENCY_SAMPLES)
+        # retries are allowed while more than half of these tokens are left
+        self._retry_tokens = float(api_globals._RETRY_TOKENS)
+        self._lock = threading.Lock()
+
+    def acquire(self, exclude: Drillbit = None) -> Drillbit:
+        """
+        Returns the drillbit to send a query to, counting it as outstanding.
+        If a drillbit to exclude is given, returns a different drillbit or
+        None if there is no other that has not been ejected. Raises
+        OperationalError if the circuit breakers of all drillbits are open.
+        """
+        with self._lock:
+            now = time.monotonic()
+            candidates = [
+                d for d in self.drillbits
+                if d.ejected_until <= now and d is not exclude
+            ]
+            if exclude is not None and not candidates:
+                return None
+            if not candidates:
+                # every drillbit is ejected, try the one due back first
+                # unless it has failed too often
+                due = min(self.drillbits, key=lambda d: d.ejected_until)
+                if self._circuit_open(now):
+                    raise OperationalError(
+                        f'Drill is unavailable after {due.failures} consecutive '
+                        f'failures to reach {due.base_url}, it will be tried '
+                        f'again in {due.ejected_until - now:.1f} s.',
+                        None
+                    )
+                candidates = [due]
+
+            i = self._next % len(candidates)
+            self._next += 1
+            if self._policy == 'least_outstanding':
+                # rotating the candidates breaks ties by round robin
+                candidates = candidates[i:] + candidates[:i]
+                drillbit = min(candidates, key=lambda d: d.outstanding)
+            else:
+                drillbit = candidates[i]
+
+            if drillbit.failures and drillbit.ejected_until <= now:
+                # a trial query, others keep away until it has succeeded
+                drillbit.ejected_until = now + self._eject_s(drillbit)
+            drillbit.outstanding += 1
+            return drillbit
+
+    def release(self, drillbit: Drillbit, reached: bool = True):
+        """
+        Counts a query sent to the drillbit as no longer outstanding and
+        records whether the drillbit could be reached.
+        """
+        with self._lock:
+            drillbit.outstanding -= 1
+
+            if reached:
+                if drillbit.failures:
+                    logger.info(f're-admits drillbit {drillbit.base_url}.')
+                drillbit.failures = 0
+                drillbit.ejected_until = 0.0
+                return
+
+            drillbit.failures += 1
+            eject_s = self._eject_s(drillbit)
+            drillbit.ejected_until = time.monotonic() + eject_s
+            if len(self.drillbits) > 1:
+                logger.warning(
+                    f'ejects drillbit {drillbit.base_url} for {eject_s} s after '
+                    f'{drillbit.failures} consecutive failures.'
+                )
+
+    def circuit_open(self) -> bool:
+        """Returns whether queries fail fast because no drillbit can be reached."""
+        with self._lock:
+            return self._circuit_open(time.monotonic())
+
+    def _circuit_open(self, now: float) -> bool:
+        due = min(self.drillbits, key=lambda d: d.ejected_until)
+        return due.ejected_until > now and due.failures >= api_globals._BREAKER_FAILURES
+
+    @staticmethod
+    def _eject_s(drillbit: Drillbit) -> float:
+        return min(
+            api_globals._EJECT_S * 2 ** max(drillbit.failures - 1, 0),
+            api_globals._EJECT_MAX_S
+        )
+
+    def record_outcome(self, succeeded: bool):
+        """
+        Records whether a query succeeded or failed transiently, refilling or
+        draining the retry budget.
+        """
+        with self._lock:
+            if succeeded:
+                self._retry_tokens = min(
+                    self._retry_tokens + api_globals._RETRY_TOKEN_RATIO,
+                    api_globals._RETRY_TOKENS
+                )
+            else:
+                self._retry_tokens = max(self._retry_tokens - 1, 0.0)
+
+    def allows_retry(self) -> bool:
+        """
+        Returns whether the retry budget allows a failed query to be retried,
+        which it does not while many queries to these drillbits are failing.
+        """
+        with self._lock:
+            return self._retry_tokens > api_globals._RETRY_TOKENS / 2
+
+    def record_latency(self, seconds: float):
+        """Records the time taken to receive the headers of a response."""
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def hedge_delay(self, percentile: float) -> float:
+        """
+        Returns the given percentile of the latest response header latencies,
+        the time after which a query is hedged.
+        """
+        with self._lock:
+            latencies = sorted(self._latencies)
+
+        if len(latencies) < api_globals._HEDGE_MIN_SAMPLES:
+            return api_globals._HEDGE_INITIAL_DELAY_S
+
+        i = min(int(len(latencies) * percentile / 100), len(latencies) - 1)
+        return max(latencies[i], api_globals._HEDGE_MIN_DELAY_S)
+
+
+# Balancers shared by the connections of this process, by policy and drillbits
+_balancers = {}
+_balancers_lock = threading.Lock()
+
+
+def get_balancer(base_urls: List[str], policy: str = 'round_robin') -> Balancer:
+    """Returns the balancer of this process for the given drillbits and policy."""
+    if policy not in _POLICIES:
+        raise ProgrammingError(
+            f'Unknown balance policy {policy}, use one of {", ".join(_POLICIES)}.',
+            None
+        )
+
+    key = (policy, tuple(base_urls))
+    with _balancers_lock:
+        balancer = _balancers.get(key)
+        if balancer is None:
+            balancer = _balancers[key] = Balancer(base_urls, policy)
+
+    return balancer
@@ -0,0 +1,615 @@
+# -*- coding: utf-8 -*-
+"""
+Caches of query results, used by connections made with a result_cache_bytes
+or a result_cache_dir.
+
+Results are cached as the batches of decoded but not yet typecast columns
+which the Cursor fetches rows from, so that a cached result is fetched in
+the same way as one streamed from Drill. Columns of fixed width numbers
+without nulls are stored as arrays. Entries are evicted least recently used
+first once the cache holds more than its maximum bytes, and expire after a
+time to live. Caches, and so their in-memory entries and counters, are
+shared by all of the connections in a process to the same drillbit with the
+same cache settings.
+
+A DiskResultCache beneath the in-memory cache shares results between
+processes through a directory holding a file per result, see
+DiskResultCache.
+
+Connections made with result_cache_validate record a signature of the files
+read by each cached query, their sizes and modification times from SHOW
+FILES, and discard a cached result if the signature has changed since. The
+directory listings are cached by the ResultCache for a short time.
+"""
+import hashlib
+import io
+import logging
+import mmap
+import os
+import pickle
+import re
+import struct
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from array import array
+from collections import OrderedDict
+from decimal import Decimal
+from sys import getsizeof
+from typing import Callable, List
+
+from . import api_globals
+
+logger = logging.getLogger('drilldbapi')
+
+# Quoted literals and identifiers, within which whitespace is significant,
+# or runs of whitespace outside them
+_WHITESPACE_PATTERN = re.compile(
+    r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|`[^`]*`)|\s+"
+)
+
+# The table references following FROM or JOIN, with string literals matched
+# first so that references are not looked for within them. References to
+# table functions, followed by a parenthesis, are excluded.
+_REFERENCE = (
+    r"((?:`[^`]+`|[A-Za-z_]\w*)(?:\s*\.\s*(?:`[^`]+`|[A-Za-z_]\w*))*)"
+    r"(?![\w.`]|\s*\()"
+)
+_TABLE_REFERENCE_PATTERN = re.compile(
+    r"'(?:[^']|'')*'|\b(?:FROM|JOIN)\s+" + _REFERENCE, re.IGNORECASE
+)
+# A further reference in a comma separated FROM list, after any alias
+_NEXT_REFERENCE_PATTERN = re.compile(
+    r"(?:\s+(?:AS\s+)?(?:`[^`]+`|[A-Za-z_]\w*))?\s*,\s*" + _REFERENCE, re.IGNORECASE
+)
+_IDENTIFIER_PATTERN = re.compile(r"`([^`]+)`|([A-Za-z_]\w*)")
+
+# array typecodes to store columns of these types with, for integers and,
+# if decoded as float, non-integers
+_INT_TYPECODES = {'TINYINT': 'b', 'SMALLINT': 'h', 'INT': 'i', 'BIGINT': 'q'}
+_FLOAT_TYPECODES = {'FLOAT4': 'd', 'FLOAT8': 'd'}
+
+
+def normalize_sql(query: str) -> str:
+    """
+    Returns a query with runs of whitespace outside of quotes collapsed and
+    any trailing semicolon removed, so that queries differing only in their
+    layout share cache entries.
+    """
+    query = _WHITESPACE_PATTERN.sub(
+        lambda m: m.group(1) or ' ', query
+    ).strip()
+    return query.rstrip(';').rstrip()
+
+
+def table_references(query: str) -> List[List[str]]:
+    """
+    Returns the identifier parts of the tables following FROM or JOIN in a
+    query, e.g. ['dfs', 'tmp', 'sales/2024'] for dfs.tmp.`sales/2024`.
+    Subqueries and table functions are not included.
+    """
+    references = []
+    for m in _TABLE_REFERENCE_PATTERN.finditer(query):
+        while m is not None and m.group(1):
+            parts = [a or b for a, b in _IDENTIFIER_PATTERN.findall(m.group(1))]
+            if parts not in references:
+                references.append(parts)
+            m = _NEXT_REFERENCE_PATTERN.match(query, m.end())
+    return references
+
+
+class CachedResult:
+    """
+    A query result held by a ResultCache: the result metadata, how its
+    non-integers were decoded, its batches of columns and the signature of
+    the files it was read from, if they were probed.
+    """
+
+    def __init__(self, result_md: dict, decoded_numbers: str, batches: List[list], size: int,
+                 signature: tuple = None):
+        self.result_md = result_md
+        self.decoded_numbers = decoded_numbers
+        self.batches = batches
+        # the approximate bytes of memory taken by the batches
+        self.size = size
+        self.signature = signature
+        self.expires = 0.0
+
+
+class ResultCapture:
+    """
+    Records the batches of a result as they are fetched from Drill, to be
+    cached once the result has been read to the end. Gives up if the result
+    grows larger than max_bytes.
+    """
+
+    def __init__(self, col_types: list, decoded_numbers: str, max_bytes: int,
+                 signature: tuple = None):
+        typecodes = dict(_INT_TYPECODES)
+        if decoded_numbers == 'float':
+            typecodes.update(_FLOAT_TYPECODES)
+        self._typecodes = [typecodes.get(t) for t in col_types or ()]
+        self._decoded_numbers = decoded_numbers
+        self._max_bytes = max_bytes
+        self._signature = signature
+        self.batches = []
+        self.size = 0
+
+    @property
+    def abandoned(self) -> bool:
+        return self.batches is None
+
+    def record(self, batches):
+        """Generates the given batches, recording them as they pass."""
+        for batch in batches:
+            if self.batches is not None:
+                self._add(batch)
+            yield batch
+
+    def _add(self, batch: list):
+        columns = [
+            _compact(col, typecode)
+            for col, typecode in zip(batch, self._typecodes or [None] * len(batch))
+        ]
+        self.size += sum(_column_size(col) for col in columns)
+        if self.size > self._max_bytes:
+            # too large to be worth caching
+            self.batches = None
+            return
+        self.batches.append(columns)
+
+    def result(self, result_md: dict) -> CachedResult:
+        return CachedResult(
+            result_md, self._decoded_numbers, self.batches, self.size, self._signature
+        )
+
+
+def _compact(column: list, typecode: str):
+    if typecode is None:
+        return column
+    try:
+        return array(typecode, column)
+    except (TypeError, OverflowError):
+        # nulls are not representable in an array
+        return column
+
+
+def _column_size(column) -> int:
+    if isinstance(column, array):
+        return getsizeof(column)
+    return getsizeof(column) + sum(map(getsizeof, column))
+
+
+class ResultCache:
+    """
+    A cache of query results by key, bounded in bytes with least recently
+    used eviction and expiring entries after ttl seconds. Results not held
+    in memory, of which there are none if max_bytes is 0, are looked for in
+    the disk cache if there is one, and those found there which are small
+    enough to be cached in memory are decoded and kept in memory until they
+    expire from the disk cache.
+    """
+
+    def __init__(self, max_bytes: int, ttl_s: float, disk: 'DiskResultCache' = None):
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self.disk = disk
+        self._entries = OrderedDict()
+        self._bytes = 0
+        # directory listings by which results are validated, with their expiry
+        self._listings = {}
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expirations = 0
+        self.invalidations = 0
+
+    @property
+    def max_entry_bytes(self) -> int:
+        """The size of the largest result cached, a fraction of the cache."""
+        max_bytes = self.max_bytes
+        if self.disk is not None:
+            max_bytes = max(max_bytes, self.disk.max_bytes)
+        return int(max_bytes * api_globals._CACHE_MAX_ENTRY_FRACTION)
+
+    def get(self, key) -> CachedResult:
+        """Returns the unexpired result cached for the key, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                entry = None
+
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+
+        if self.disk is not None:
+            entry = self.disk.get(key)
+        if entry is not None and self._fits(entry):
+            entry = self._promote(key, entry)
+
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return entry
+
+    def _fits(self, entry: CachedResult) -> bool:
+        return entry.size <= self.max_bytes * api_globals._CACHE_MAX_ENTRY_FRACTION
+
+    def _promote(self, key, entry: CachedResult) -> CachedResult:
+        """
+        Decodes the batches of a result read from disk, which closes its memory
+        map, and caches it in memory. Returns None if its batches are unreadable.
+        """
+        try:
+            entry.batches = list(entry.batches)
+        except Exception as ex:  # pylint: disable=broad-except
+            logger.warning(f'discards an unreadable result from the cache directory: {ex}')
+            self.disk.discard(key)
+            return None
+
+        self._insert(key, entry)
+        return entry
+
+    def put(self, key, entry: CachedResult):
+        """Caches a result, evicting the least recently used to make room."""
+        if self.disk is not None:
+            self.disk.put(key, entry)
+        if self._fits(entry):
+            entry.expires = time.monotonic() + self.ttl_s
+            self._insert(key, entry)
+
+    def _insert(self, key, entry: CachedResult):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._bytes += entry.size
+
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        self._bytes -= self._entries.pop(key).size
+
+    def discard(self, key):
+        """Removes the result cached for the key, whose files have changed."""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self.invalidations += 1
+        if self.disk is not None:
+            self.disk.discard(key)
+
+    def listing(self, key, ttl_s: float, list_dir: Callable[[], dict]) -> dict:
+        """
+        Returns the directory listing cached for the key, or lists the
+        directory with list_dir and caches the listing for ttl_s seconds.
+        """
+        now = time.monotonic()
+        with self._lock:
+            cached = self._listings.get(key)
+        if cached is not None and cached[0] > now:
+            return cached[1]
+
+        listing = list_dir()
+        with self._lock:
+            self._listings = {k: v for k, v in self._listings.items() if v[0] > now}
+            self._listings[key] = (now + ttl_s, listing)
+        return listing
+
+    def clear(self):
+        """Removes every entry, including those on disk."""
+        with self._lock:
+            self._entries.clear()
+            self._listings.clear()
+            self._bytes = 0
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self) -> dict:
+        """
+        Returns the counters and current size of the cache. Hits and misses
+        count lookups in memory and on disk together, the other figures are
+        those of the in-memory cache. The disk cache's own follow under disk.
+        """
+        with self._lock:
+            stats = {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+            }
+        if self.disk is not None:
+            stats['disk'] = self.disk.stats()
+        return stats
+
+
+class _ResultUnpickler(pickle.Unpickler):
+    """Loads the pickles of cache files, which hold only plain values and Decimals."""
+
+    def find_class(self, module, name):
+        if (module, name) == ('decimal', 'Decimal'):
+            return Decimal
+        raise pickle.UnpicklingError(f'Cache files may not refer to {module}.{name}.')
+
+
+def _loads(data) -> object:
+    return _ResultUnpickler(io.BytesIO(zlib.decompress(data))).load()
+
+
+def _dumps(obj) -> bytes:
+    return zlib.compress(
+        pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL),
+        api_globals._CACHE_FILE_COMPRESSION
+    )
+
+
+class MappedBatches:
+    """
+    The batches of a result in a cache file, decoded from a memory map of the
+    file one batch at a time as they are iterated over. They may be iterated
+    over once, after which, or once iteration is abandoned, the map is closed.
+    """
+
+    def __init__(self, mapped: mmap.mmap, data_at: int, specs: list):
+        self._mapped = mapped
+        self._data_at = data_at
+        self._specs = specs
+
+    def __iter__(self):
+        try:
+            with memoryview(self._mapped) as view:
+                for specs in self._specs:
+                    yield [self._column(view, *spec) for spec in specs]
+        finally:
+            self._mapped.close()
+
+    def _column(self, view: memoryview, offset: int, length: int, typecode: str):
+        start = self._data_at + offset
+        with view[start:start + length] as data:
+            if typecode is None:
+                return _loads(data)
+            column = array(typecode)
+            column.frombytes(data)
+            return column
+
+
+class DiskResultCache:
+    """
+    A cache of query results in a directory which may be shared by several
+    processes, bounded in bytes and expiring results after ttl seconds.
+
+    Each result is a file named by a hash of its key, written to a temporary
+    file which then replaces any earlier one, so that readers only ever see
+    complete files. A file starts with a header giving the key, the expiry
+    time and the result metadata, followed by the columns of each batch:
+    fixed width numbers as the bytes of an array and other columns as
+    compressed pickles, which are unpickled allowing only plain values. Hits
+    memory map the file and decode its batches as they are fetched, see
+    MappedBatches. Reading
+    a file marks it as used, and the least recently used files are deleted
+    once the directory holds more than max_bytes.
+    """
+
+    _MAGIC = b'DRLC1' + sys.byteorder[0].encode()
+    _SUFFIX = '.drc'
+
+    def __init__(self, directory: str, max_bytes: int, ttl_s: float, namespace: str = ''):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        # distinguishes the results of different servers sharing a directory
+        self._namespace = namespace
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expirations = 0
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+
+    def _path(self, key) -> str:
+        digest = hashlib.sha256(repr((self._namespace, key)).encode()).hexdigest()
+        return os.path.join(self.directory, digest + self._SUFFIX)
+
+    def _count(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def get(self, key) -> CachedResult:
+        """Returns the unexpired result cached for the key, or None."""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            # ValueError: an empty file
+            self._count('misses')
+            return None
+
+        batches = None
+        try:
+            header, data_at = self._read_header(mapped, key)
+            remaining_s = header['expires'] - time.time()
+            if remaining_s <= 0:
+                self._remove(path)
+                self._count('expirations')
+                self._count('misses')
+                return None
+            batches = MappedBatches(mapped, data_at, header['batches'])
+        except Exception as ex:  # pylint: disable=broad-except
+            logger.warning(f'ignores the unreadable cache file {path}: {ex}')
+            self._remove(path)
+            self._count('misses')
+            return None
+        finally:
+            if batches is None:
+                mapped.close()
+
+        try:
+            # the time of last use, by which files are evicted
+            os.utime(path)
+        except OSError:
+            pass
+        self._count('hits')
+        entry = CachedResult(
+            header['result_md'], header['decoded_numbers'], batches, header['size'],
+            header['signature']
+        )
+        # when to stop using a copy of the result held in memory
+        entry.expires = time.monotonic() + remaining_s
+        return entry
+
+    def _read_header(self, mapped: mmap.mmap, key) -> tuple:
+        """Returns the header of a mapped file and the offset of its batches."""
+        magic_len = len(self._MAGIC)
+        if mapped[:magic_len] != self._MAGIC:
+            raise ValueError('not a result cache file')
+        (header_len,) = struct.unpack_from('<Q', mapped, magic_len)
+        header_at = magic_len + 8
+        data_at = header_at + header_len
+        header = _loads(mapped[header_at:data_at])
+        if header['key'] != repr((self._namespace, key)):
+            raise ValueError('a hash collision')
+        return header, data_at
+
+    def put(self, key, entry: CachedResult):
+        """Writes a result to the directory, then evicts files if it is full."""
+        blocks = []
+        batch_specs = []
+        # offsets from the end of the header
+        offset = 0
+        for batch in entry.batches:
+            specs = []
+            for column in batch:
+                if isinstance(column, array):
+                    data, typecode = column.tobytes(), column.typecode
+                else:
+                    data, typecode = _dumps(column), None
+                specs.append([offset, len(data), typecode])
+                blocks.append(data)
+                offset += len(data)
+            batch_specs.append(specs)
+        if offset > self.max_bytes * api_globals._CACHE_MAX_ENTRY_FRACTION:
+            return
+
+        header_data = _dumps({
+            'key': repr((self._namespace, key)),
+            'expires': time.time() + self.ttl_s,
+            'result_md': entry.result_md,
+            'decoded_numbers': entry.decoded_numbers,
+            'size': entry.size,
+            'signature': entry.signature,
+            'batches': batch_specs,
+        })
+
+        tmp_path = None
+        try:
+            fd, tmp_path = tempfile.mkstemp(
+                prefix=api_globals._CACHE_TMP_PREFIX, dir=self.directory
+            )
+            with os.fdopen(fd, 'wb') as f:
+                f.write(self._MAGIC)
+                f.write(struct.pack('<Q', len(header_data)))
+                f.write(header_data)
+                for data in blocks:
+                    f.write(data)
+            os.replace(tmp_path, self._path(key))
+        except OSError as ex:
+            logger.warning(f'failed to write a result to the cache directory: {ex}')
+            if tmp_path is not None:
+                self._remove(tmp_path)
+            return
+
+        self._evict()
+
+    def discard(self, key):
+        """Removes the result file for the key."""
+        self._remove(self._path(key))
+
+    def _files(self) -> list:
+        """Returns the (last use, size, path) of each file, removing stale temporary files."""
+        files = []
+        now = time.time()
+        with os.scandir(self.directory) as entries:
+            for f in entries:
+                try:
+                    stat = f.stat()
+                except OSError:
+                    continue
+                if f.name.endswith(self._SUFFIX):
+                    files.append((stat.st_mtime, stat.st_size, f.path))
+                elif f.name.startswith(api_globals._CACHE_TMP_PREFIX) and \
+                        stat.st_mtime < now - api_globals._CACHE_TMP_MAX_AGE_S:
+                    # left by a process which died while writing
+                    self._remove(f.path)
+        return files
+
+    def _evict(self):
+        files = self._files()
+        total = sum(size for _, size, _ in files)
+        if total <= self.max_bytes:
+            return
+
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            if self._remove(path):
+                self._count('evictions')
+            total -= size
+
+    @staticmethod
+    def _remove(path: str) -> bool:
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            # e.g. removed by another process
+            return False
+
+    def clear(self):
+        """Removes every result file in the directory."""
+        for _, _, path in self._files():
+            self._remove(path)
+
+    def stats(self) -> dict:
+        """Returns the counters of this process and the current size of the directory."""
+        files = self._files()
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'entries': len(files),
+                'bytes': sum(size for _, size, _ in files),
+                'max_bytes': self.max_bytes,
+            }
+
+
+# Caches shared by the connections of this process, by drillbit and settings
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_result_cache(base_url: str, max_bytes: int, ttl_s: float,
+                     directory: str = None,
+                     directory_bytes: int = api_globals._CACHE_DIR_BYTES) -> ResultCache:
+    """Returns the result cache of this process for the drillbit and settings."""
+    key = (base_url, max_bytes, ttl_s, directory, directory_bytes)
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            disk = None
+            if directory is not None:
+                disk = DiskResultCache(directory, directory_bytes, ttl_s, base_url)
+            cache = _caches[key] = ResultCache(max_bytes, ttl_s, disk)
+
+    return cache
@@ -0,0 +1,885 @@
+# -*- coding: utf-8 -*-
+"""
+This module provides the implementation of the Cursor object for interfacing with
+the Drill database. It adheres to the Python DB API 2.0 standard, enabling execution
+of SQL queries, retrieval of data, and management of cursor states.
+
+This module fetches and processes query results from Drill, supporting both
+metadata extraction and data streaming for enhanced query handling.
+
+Classes:
+- Cursor: Encapsulates the functionality for executing SQL statements, retrieving
+  query results, and maintaining database connection integrity.
+"""
+import logging
+import re
+from typing import List
+
+from ._cache import CachedResult, ResultCapture
+from ._flight import get_flight
+from ._parsing import (
+    ResponseStreamWrapper, _column_batches, _ijson_backend, _items_once, _leading_metadata, _loads
+)
+from ._prefetch import RowPrefetcher
+from ._retry import _READ_ONLY_PATTERN
+from ._transport import HTTPResponse
+from ._types import (
+    DBAPITypeObject, _DECIMAL_TYPES, _FLOAT_TYPES, _column_container, _floats_from_numbers,
+    _per_value, _typecast_columns
+)
+
+from . import _keys, api_globals
+from .api_exceptions import (
+    ConnectionClosedException,
+    CursorClosedException,
+    DatabaseError,
+    ProgrammingError,
+)
+
+logger = logging.getLogger('drilldbapi')
+
+
+class Cursor:
+
+    @staticmethod
+    def substitute_in_query(string_query, parameters):
+        logger.info(f'substitutes parameters in query {string_query}.')
+        query = string_query
+        try:
+            for param in parameters:
+                if isinstance(param, str):
+                    param = f"'{param}'"
+                else:
+                    param = str(param)
+
+                query = query.replace('?', param, 1)
+                logger.debug(f'set parameter value {param}')
+        except Exception as ex:
+            logger.error(f'query parameter substitution encountered {ex}.')
+            raise ProgrammingError(
+                'Could not substitute query parameter values',
+                None
+            ) from ex
+
+        return query
+
+    def __init__(self, conn):
+
+        self.arraysize: int = 1
+        self.description: tuple = None
+        self.connection = conn
+        self.rowcount: int = -1
+        self.rownumber: int = None
+        self.result_md = {}
+        # Number of row batches to parse ahead on a background thread, 0 disables
+        self.prefetch: int = conn._prefetch
+        # Whether results may be taken from and put in the connection's result cache
+        self.use_cache: bool = True
+
+        self._is_open: bool = True
+        # the HTTP response of the current query, until it has been read
+        self._response: HTTPResponse = None
+        # size of the last query's response body as received, None if unknown,
+        # and once decoded
+        self.bytes_received: int = 0
+        self.bytes_decoded: int = 0
+        self._result_event_stream = self._batch_stream = None
+        self._prefetcher: RowPrefetcher = None
+        self._typecaster_list: list = None
+        self._col_types: list = None
+        # how JSON non-integers in the current result were decoded
+        self._decoded_numbers: str = None
+        # the batch of row data, as a list of columns, currently being fetched
+        self._batch: list = None
+        self._batch_pos = self._batch_len = 0
+        # typecast rows of the current batch, from _batch_pos, for iteration
+        self._row_iter = None
+        # the recording of the current result for the result cache, and its key
+        self._capture: ResultCapture = None
+        self._capture_key = None
+
+    def is_open(func):
+        """Decorator for methods which require a connection"""
+
+        def func_wrapper(self, *args, **kwargs):
+            if self._is_open is False:
+                raise CursorClosedException(
+                    f'Cannot call {func} with a closed cursor.'
+                )
+            elif self.connection._connected is False:
+                raise ConnectionClosedException(
+                    f'Cannot call {func} with a closed connection.'
+                )
+            else:
+                return func(self, *args, **kwargs)
+
+        return func_wrapper
+
+    def _gen_description(self, col_types):
+        blank = [None] * len(self.result_md['columns'])
+        dbapi_col_types = [DBAPITypeObject(col_type) for col_type in col_types or []]
+
+        self.description = tuple(
+            zip(
+                self.result_md['columns'],  # name
+                dbapi_col_types or blank,  # type_code
+                blank,  # display_size
+                blank,  # internal_size
+                blank,  # precision
+                blank,  # scale
+                blank   # null_ok
+            )
+        )
+
+    def _report_query_state(self):
+        md = self.result_md
+        query_state = md.get('queryState', None)
+        exception = md.get(
+                    'exception',
+                    'No exception returned.'
+                )
+        error_message = md.get(
+            'errorMessage',
+            'No error message is returned (which most likely means that ' \
+            'drill.exec.http.rest.errors.verbose is set to false.)'
+        )
+        stack_trace = md.get('stackTrace', 'No stack trace returned.')
+
+        logger.info(
+            f'received final query state {query_state}.'
+        )
+
+        if query_state != 'COMPLETED':
+            logger.warning(exception)
+            logger.warning(error_message)
+            logger.warning(stack_trace)
+
+            raise DatabaseError(
+                f'Final Drill query state is {query_state}. {error_message}',
+                None
+            )
+
+    def _outer_parsing_loop(self) -> bool:
+        '''Internal method to process the outermost query result JSON structure.
+
+        This loop will parse result JSON, recording metadata as it goes, until
+        it either encounters row data or the end of the result stream.  If row
+        data is encountered then parsing is halted in order that it can be driven
+        in a streaming fashion by the user making calls to the fetchN() methods.
+
+        Since there is also result metadata found _after_ row data, the fetchN()
+        methods should start this loop again once they've encountered the end of
+        the row data.
+
+        Returns True iff row data is encountered in the result.
+        '''
+        try:
+            while True:
+                prefix, event, value = next(self._result_event_stream)
+                logger.debug(f'ijson parsed {prefix}, {event}, {value}')
+
+                if event != 'map_key':
+                    continue
+
+                if value == 'rows':
+                    # discard the array node itself
+                    next(self._result_event_stream)
+
+                    self._prepare_columns()
+                    self._batch_stream = _column_batches(
+                        self._result_event_stream,
+                        self.result_md['columns']
+                    )
+                    # stop here so that row parsing can be driven by user calls
+                    # to fetchN
+                    return True
+                else:
+                    # save the parsed object to the result metadata dict
+                    self.result_md[value] = next(
+                        _items_once(self._result_event_stream, value)
+                    )
+        except StopIteration:
+            logger.info(
+                'reached the end of the result stream, parsing complete.'
+            )
+
+        self._report_query_state()
+        return False
+
+    def _whole_body(self, resp, stream) -> bytes:
+        '''Internal method returning the entire decoded body of a response if
+        it is to be parsed in one pass, otherwise None.  Bodies which have
+        already been read (stream_results=False) are parsed in one pass, as
+        are streamed bodies which end within the connection's whole_body_bytes
+        whatever their Content-Length or Content-Encoding.  To find out, the
+        body is read ahead into the stream's buffer, from which a longer body
+        is then parsed incrementally.
+        '''
+        if resp.consumed:
+            return resp.content
+
+        limit = self.connection._whole_body_bytes
+        if limit > 0 and stream.read_ahead(limit):
+            return stream.peek()
+
+        return None
+
+    def _parse_whole_body(self, content: bytes) -> bool:
+        '''Internal method to decode an entire query result in one pass into
+        the same result metadata and row stream as incremental parsing sets up.
+
+        Returns True iff row data is present in the result.
+        '''
+        logger.debug(f'parses a body of {len(content)} bytes in one pass.')
+        numbers = self.connection._numbers
+        self._decoded_numbers = 'decimal' if numbers == 'decimal' else 'float'
+        result = _loads(content, self._decoded_numbers)
+
+        if numbers == 'auto' and any(
+            re.sub(r'\(.*\)', '', m) in _DECIMAL_TYPES
+            for m in result.get('metadata', ())
+        ):
+            logger.debug('decodes the body again for its DECIMAL columns.')
+            self._decoded_numbers = 'decimal'
+            result = _loads(content, self._decoded_numbers)
+
+        rows = result.pop('rows', None)
+        self.result_md.update(result)
+        # the outer parsing loop then finds nothing trailing the row data
+        self._result_event_stream = iter(())
+
+        if rows is None:
+            self._report_query_state()
+            return False
+
+        self._prepare_columns()
+        batch = [[row.get(col) for row in rows] for col in self.result_md['columns']]
+        self._batch_stream = iter([batch] if rows else [])
+        return True
+
+    def _stream_numbers(self, stream) -> str:
+        '''Internal method to choose how non-integers in a streamed result are
+        decoded.  In auto mode the column metadata is looked for in the first
+        chunk of the stream and floats are used if it has no DECIMAL columns.
+        If the metadata is not found there the result is decoded exactly and
+        its floating point columns converted once the types are known.
+        '''
+        numbers = self.connection._numbers
+        if numbers != 'auto':
+            return numbers
+
+        col_types = _leading_metadata(stream.peek())
+        if col_types is None or any(
+            re.sub(r'\(.*\)', '', m) in _DECIMAL_TYPES for m in col_types
+        ):
+            return 'decimal'
+
+        return 'float'
+
+    def _prepare_columns(self):
+        '''Internal method to set up the description and typecasters of the
+        result columns once the start of the row data has been reached.
+        '''
+        # Column metadata could be trailing or entirely absent
+        if 'metadata' in self.result_md:
+            md = self.result_md['metadata']
+            # strip size information from column types e.g. VARCHAR(10)
+            basic_coltypes = [re.sub(r'\(.*\)', '', m) for m in md]
+            self._gen_description(basic_coltypes)
+            self._col_types = basic_coltypes
+
+            self._typecaster_list = [
+                self._column_typecaster(col) for col in basic_coltypes
+            ]
+        else:
+            self._gen_description(None)
+            self._typecaster_list = self._col_types = None
+            logger.warning(
+                'encountered data before metadata, typecasting during '
+                'streaming by this module will not take place.  Upgrade '
+                'to Drill >= 1.19 or apply your own typecasting.'
+            )
+
+    def _column_typecaster(self, col_type: str):
+        conn = self.connection
+        typecaster = conn.column_typecasters.get(col_type) or \
+            _per_value(conn.python_typecasters.get(col_type))
+
+        if typecaster is None and col_type in _FLOAT_TYPES and \
+                conn._numbers == 'auto' and self._decoded_numbers == 'decimal':
+            return _floats_from_numbers
+
+        return typecaster
+
+    @is_open
+    def getdesc(self):
+        return self.description
+
+    def _close_prefetcher(self):
+        if self._prefetcher is not None:
+            self._prefetcher.close()
+            self._prefetcher = None
+
+    def _close_response(self):
+        '''Internal method to release the HTTP response of the current query.
+        A response which has been read to the end returns its connection to
+        the pool, one which has not is aborted.
+        '''
+        if self._response is not None:
+            self.bytes_received = self._response.bytes_received
+            self.bytes_decoded = self._response.bytes_decoded
+            logger.debug(
+                f'received {self.bytes_received} bytes of response body, '
+                f'{self.bytes_decoded} bytes decoded.'
+            )
+            self._response.close()
+            self._response = None
+
+    def _cancel_query(self):
+        '''Internal method to abort the unread remainder of the current
+        query's HTTP response and to cancel the query on the server, which
+        would otherwise carry on executing it.
+        '''
+        drillbit = self._response.drillbit
+        self._close_response()
+
+        query_id = self.result_md.get('queryId')
+        if query_id is None:
+            logger.warning('cannot cancel a query before receiving its ID.')
+            return
+
+        try:
+            # only the query's foreman can cancel it
+            self.connection.cancel_query(query_id, drillbit)
+        except Exception as ex:  # pylint: disable=broad-except
+            logger.warning(f'failed to cancel query {query_id}: {ex}')
+
+    def _interrupt_response(self):
+        '''Internal method to wake a read of the query's HTTP response which
+        is blocked in another thread.
+        '''
+        if self._response is not None:
+            self._response.interrupt()
+
+    def _close_batch_stream(self):
+        if self._prefetcher is not None:
+            # the prefetch thread may be blocked reading from a stalled
+            # response, which would otherwise hold up its join
+            self._interrupt_response()
+        self._close_prefetcher()
+        if hasattr(self._batch_stream, 'close'):
+            self._batch_stream.close()
+        # a result which has not been read to the end is not cached
+        self._capture = None
+        if self._response is not None:
+            # the rows have not all been read
+            self._cancel_query()
+        self._batch_stream = self._batch = self._row_iter = None
+        self._batch_pos = self._batch_len = 0
+
+    @is_open
+    def close(self):
+        self._is_open = False
+        if self._batch_stream is not None:
+            self._close_batch_stream()
+            logger.debug('closed row data stream.')
+        else:
+            logger.debug('had no row data stream to close.')
+
+    @is_open
+    def execute(self, operation, parameters=(), options: dict = None):
+        '''Executes a query.  The unofficial options parameter is a dict of
+        additional fields for the Drill REST API query payload, e.g.
+        {'autoLimit': '100', 'defaultSchema': 'dfs.tmp'}.  An autoLimit must
+        be a non-negative integer, given as an int or a string of digits, and a
+        defaultSchema a string.
+        '''
+        options = _checked_options(options)
+        if self._response is not None:
+            logger.warning(
+                'will close the existing row data stream.'
+            )
+        if self._batch_stream is not None:
+            self._close_batch_stream()
+
+        self.rowcount = -1
+        self.description = None
+        self.bytes_received = self.bytes_decoded = 0
+        self.rownumber = 0
+        self.result_md = {}
+
+        matchObj = re.match(r'^SHOW FILES FROM\s(.+)',
+                            operation, re.IGNORECASE)
+        if matchObj:
+            self._default_storage_plugin = matchObj.group(1)
+            logger.info(
+                'sets the default storage plugin to '
+                f'{self._default_storage_plugin}'
+            )
+
+        query = self.substitute_in_query(operation, parameters)
+        cache = self.connection.result_cache
+        cache_key = signature = None
+        if cache is not None and self.use_cache and _READ_ONLY_PATTERN.match(query):
+            cache_key = _keys.cache_key(self.connection, query, options)
+            cached = cache.get(cache_key)
+            if self.connection._validate_cache:
+                # probed before the query runs, so that changes to the files
+                # while it runs invalidate its result
+                signature = _keys.file_signature(self.connection, query, options)
+                if cached is not None and cached.signature != signature:
+                    logger.info('discards a cached result whose files have changed.')
+                    cache.discard(cache_key)
+                    cached = None
+            if cached is not None:
+                self._replay(cached)
+                return
+
+        if self.connection._single_flight and _READ_ONLY_PATTERN.match(query):
+            self._execute_shared(query, options, cache_key, signature)
+            return
+
+        self._send_query(query, options, cache_key, signature)
+
+    def _send_query(self, query: str, options: dict, cache_key, signature: tuple):
+        '''Internal method to send a query and parse its result up to the row
+        data, recording the rows for the result cache if a cache key is given.
+        '''
+        resp = self.connection.submit_query(query, options=options)
+
+        if resp.status_code != 200:
+            err_msg = resp.json().get('errorMessage', None)
+            raise ProgrammingError(err_msg, resp.status_code)
+
+        if resp.attempts is not None:
+            self.result_md['hedgeAttempts'] = resp.attempts
+        self._response = resp
+        parse_whole = False
+        try:
+            stream = ResponseStreamWrapper(resp, self.connection._chunk_size)
+            content = self._whole_body(resp, stream)
+            parse_whole = content is not None
+            if parse_whole:
+                row_data_present = self._parse_whole_body(content)
+            else:
+                self._decoded_numbers = self._stream_numbers(stream)
+                self._result_event_stream = _ijson_backend.parse(
+                    stream,
+                    buf_size=self.connection._chunk_size,
+                    use_float=self._decoded_numbers == 'float'
+                )
+                row_data_present = self._outer_parsing_loop()
+        finally:
+            if parse_whole or self._batch_stream is None:
+                self._close_response()
+        # The leading result metadata has now been parsed.
+
+        logger.info(
+            f'received Drill query ID {self.result_md.get("queryId", None)}.'
+        )
+
+        if not row_data_present:
+            return
+
+        if cache_key is not None:
+            self._capture = ResultCapture(
+                self._col_types, self._decoded_numbers,
+                self.connection.result_cache.max_entry_bytes, signature
+            )
+            self._capture_key = cache_key
+            self._batch_stream = self._capture.record(self._batch_stream)
+
+        if self.prefetch and not parse_whole and self.connection._transport.blocking:
+            self._prefetcher = RowPrefetcher(self._batch_stream, self.prefetch)
+            self._batch_stream = self._prefetcher.batches()
+
+        logger.info(
+            f'opened a row data stream of {len(self.result_md["columns"])} '
+            'columns.'
+        )
+
+    def _execute_shared(self, query: str, options: dict, cache_key, signature: tuple):
+        '''Internal method to execute a read-only query by joining an
+        identical query in flight, or by sending it from a source cursor for
+        other cursors to join.
+        '''
+        conn = self.connection
+        flight, consumer = get_flight(
+            (conn._base_url, conn._transport.blocking, _keys.cache_key(conn, query, options)),
+            conn._transport.condition
+        )
+        if consumer is None:
+            try:
+                source = conn.cursor()
+                source.rownumber = 0
+                source._send_query(query, options, cache_key, signature)
+                flight.start(
+                    source.result_md, source._decoded_numbers,
+                    source._read_batch if source._batch_stream is not None else None,
+                    source.close, source._interrupt_response
+                )
+            except Exception as ex:
+                flight.fail(ex)
+                raise
+            else:
+                consumer = flight.join()
+            finally:
+                flight.lock.release()
+        else:
+            consumer.result_md['coalesced'] = True
+            logger.info(
+                f'joins Drill query ID {consumer.result_md.get("queryId")} in flight.'
+            )
+
+        if flight.error is not None:
+            consumer.close()
+            raise flight.error
+
+        self.result_md = consumer.result_md
+        if not flight.has_rows:
+            consumer.close()
+            return
+
+        self._decoded_numbers = flight.decoded_numbers
+        # the trailing metadata is added to result_md by the consumer
+        self._result_event_stream = iter(())
+        self._prepare_columns()
+        self._batch_stream = consumer
+
+    def _read_batch(self) -> list:
+        '''Internal method returning the next batch of row data of the query
+        of a flight, or None after the last one.
+        '''
+        if not self._next_batch():
+            return None
+        self.rownumber += self._batch_len
+        return self._batch
+
+    def _replay(self, cached: CachedResult):
+        '''Internal method to set up the fetching of a result from the cache.'''
+        self.result_md = dict(cached.result_md, cached=True)
+        self._decoded_numbers = cached.decoded_numbers
+        # the trailing metadata was cached with the rest
+        self._result_event_stream = iter(())
+        self._prepare_columns()
+        self._batch_stream = iter(cached.batches)
+        logger.info(
+            f'fetches the cached result of Drill query ID {self.result_md.get("queryId")}.'
+        )
+
+    def _cache_result(self):
+        '''Internal method to cache the result just read to the end, if it
+        was recorded and not too large.
+        '''
+        capture, self._capture = self._capture, None
+        if capture is None or capture.abandoned:
+            return
+
+        result_md = {k: v for k, v in self.result_md.items() if k != 'hedgeAttempts'}
+        self.connection.result_cache.put(self._capture_key, capture.result(result_md))
+        logger.debug(f'cached a result of {capture.size} bytes.')
+
+    @is_open
+    def executemany(self, operation, seq_of_parameters, options: dict = None):
+        for parameters in seq_of_parameters:
+            logger.debug(f'executes with parameters {parameters}.')
+            self.execute(operation, parameters, options)
+
+    @is_open
+    def fetchone(self):
+        return next(self, None)
+
+    def _next_batch(self) -> bool:
+        '''Internal method to advance to the next batch of row data.
+
+        Returns False once the row data is exhausted, at which point any
+        trailing result metadata is parsed.
+        '''
+        try:
+            self._batch = next(self._batch_stream)
+        except StopIteration:
+            self._batch = None
+            self._batch_pos = self._batch_len = 0
+            self.rowcount = self.rownumber
+            logger.info(
+                f'reached the end of the row data after {self.rownumber}'
+                ' records.'
+            )
+            self._close_prefetcher()
+            try:
+                # restart the outer parsing loop to collect trailing metadata
+                self._outer_parsing_loop()
+            finally:
+                self._close_response()
+            self._cache_result()
+            return False
+
+        self._batch_pos = 0
+        self._batch_len = len(self._batch[0]) if self._batch else 0
+        return True
+
+    @property
+    def _buffered_rows(self) -> int:
+        '''Internal property giving the number of rows which can be fetched
+        without reading further from the response.
+        '''
+        return self._batch_len - self._batch_pos
+
+    def _column_slices(self, size: int):
+        '''Internal generator dispatching the next size rows (all remaining
+        rows if size is negative) as lists of column slices, one for each batch
+        of row data they span.  Values are not yet typecast.
+        '''
+        if self._batch_stream is None:
+            raise ProgrammingError(
+                'has no row data, have you executed a query that returns data?',
+                None
+            )
+
+        # rows buffered for iteration may now be skipped over
+        self._row_iter = None
+        remaining = size
+        while remaining != 0:
+            if self._batch_pos == self._batch_len and not self._next_batch():
+                return
+
+            start = self._batch_pos
+            n = self._batch_len - start
+            if 0 < remaining < n:
+                n = remaining
+            if remaining > 0:
+                remaining -= n
+
+            self._batch_pos += n
+            prev_rownumber = self.rownumber
+            self.rownumber += n
+            if self.rownumber // api_globals._PROGRESS_LOG_N > \
+                    prev_rownumber // api_globals._PROGRESS_LOG_N:
+                logger.info(f'streamed {self.rownumber} rows.')
+
+            if n == self._batch_len:
+                yield self._batch
+            else:
+                yield [col[start:start + n] for col in self._batch]
+
+    @is_open
+    def fetchmany(self, size: int = None):
+        '''Fetch the next set of rows of a query result.
+
+        The number of rows to fetch per call is specified by the size
+        parameter. If it is not given, the cursor's arraysize determines the
+        number of rows to be fetched. If size is negative then all remaining
+        rows are fetched.
+        '''
+        results = []
+        for cols in self._column_slices(size or self.arraysize):
+            results.extend(zip(*_typecast_columns(cols, self._typecaster_list)))
+
+        return results
+
+    def _fetch_column_lists(self, size: int, typecast: bool = True) -> List:
+        '''Internal method returning the next size rows as a list of
+        columns, or None if there are no rows left.
+        '''
+        columns = None
+        for cols in self._column_slices(size):
+            if typecast:
+                cols = _typecast_columns(cols, self._typecaster_list)
+            if columns is None:
+                columns = [list(col) for col in cols]
+            else:
+                for acc, col in zip(columns, cols):
+                    acc.extend(col)
+
+        return columns
+
+    @is_open
+    def fetch_columns(self, size: int = None) -> List:
+        '''Unofficial extension for fetching the next set of rows of a query
+        result as one container per column, in the order of the description,
+        without building a tuple per row.
+
+        The size parameter has the same meaning as for fetchmany.  Columns of
+        integer and floating point types that contain no nulls are returned as
+        array.array objects (which NumPy can wrap using numpy.frombuffer),
+        all other columns as lists.
+        '''
+        columns = self._fetch_column_lists(size or self.arraysize)
+        if columns is None:
+            columns = [[] for _ in self.description or ()]
+
+        col_types = self._col_types or [None] * len(columns)
+        return [_column_container(col, t) for col, t in zip(columns, col_types)]
+
+    @is_open
+    def fetch_record_batches(self, batch_rows: int = api_globals._BATCH_ROWS):
+        '''Unofficial extension returning a generator of pyarrow
+        RecordBatches of up to batch_rows of the remaining rows of a query
+        result.  The Arrow schema is derived from the Drill column types.
+        Requires pyarrow, installable with the arrow extra.
+        '''
+        from . import _arrow  # pylint: disable=import-outside-toplevel
+
+        names = self.result_md.get('columns', [])
+        col_types = self._col_types or [None] * len(names)
+        schema = None
+
+        while True:
+            columns = self._fetch_column_lists(batch_rows, typecast=False)
+            if columns is None:
+                return
+            batch = _arrow.record_batch(columns, names, col_types, schema)
+            schema = batch.schema
+            yield batch
+
+    @is_open
+    def fetch_arrow_table(self):
+        '''Unofficial extension for fetching all (remaining) rows of a query
+        result as a pyarrow Table.  Requires pyarrow, installable with the
+        arrow extra.
+        '''
+        from . import _arrow  # pylint: disable=import-outside-toplevel
+
+        batches = list(self.fetch_record_batches())
+        if batches:
+            schema = batches[0].schema
+        else:
+            names = self.result_md.get('columns', [])
+            schema = _arrow.empty_schema(
+                names, self._col_types or [None] * len(names)
+            )
+
+        return _arrow.table(batches, schema)
+
+    def _frame(self, columns):
+        from . import _pandas  # pylint: disable=import-outside-toplevel
+
+        names = self.result_md.get('columns', [])
+        if columns is None:
+            columns = [[] for _ in names]
+
+        return _pandas.frame(
+            columns,
+            names,
+            self._col_types or [None] * len(names),
+            self._typecaster_list or [None] * len(names)
+        )
+
+    @is_open
+    def fetch_df(self):
+        '''Unofficial extension for fetching all (remaining) rows of a query
+        result as a pandas DataFrame.  Column dtypes are derived from the Drill
+        column types, e.g. DATE and TIMESTAMP become datetime64 and BIGINT with
+        nulls becomes the nullable Int64.  Requires pandas, installable with
+        the pandas extra.
+        '''
+        return self._frame(self._fetch_column_lists(-1, typecast=False))
+
+    @is_open
+    def iter_df(self, chunksize: int = api_globals._BATCH_ROWS):
+        '''Unofficial extension returning a generator of pandas DataFrames of
+        up to chunksize of the remaining rows of a query result, typed as for
+        fetch_df.  Only one chunk of rows is held in memory at a time.
+        '''
+        while True:
+            columns = self._fetch_column_lists(chunksize, typecast=False)
+            if columns is None:
+                return
+            yield self._frame(columns)
+
+    @is_open
+    def fetchall(self) -> List:
+        '''Fetch all (remaining) rows of a query result.'''
+        return self.fetchmany(-1)
+
+    def setinputsizes(self, *sizes):
+        '''Not supported.'''
+        logger.debug('setinputsizes is a no-op in this driver.')
+
+    def setoutputsize(self, size, column=0):
+        '''Not supported.'''
+        logger.debug('setoutputsize is a no-op in this driver.')
+
+    @is_open
+    def get_query_id(self) -> str:
+        """Unofficial convenience method for getting the Drill ID of the last query.
+        """
+        return self.result_md.get('queryId')
+
+    @is_open
+    def get_column_names(self) -> List:
+        """Unofficial convenience method for getting the column names."""
+        return [d[0] for d in self.description]
+
+    @is_open
+    def get_query_metadata(self) -> List:
+        """Unofficial convenience method for getting the column metadata."""
+        return [d[1] for d in self.description]
+
+    def get_default_plugin(self) -> str:
+        """Unofficial convenience method for getting the default storage plugin.
+        """
+        return self._default_storage_plugin
+
+    # Make this Cursor object iterable
+
+    def __next__(self):
+        # Rows are served from an iterator over the rest of the current batch
+        # so that the per row work is as small as possible.
+        if self._row_iter is not None:
+            row = next(self._row_iter, None)
+            if row is not None:
+                self._batch_pos += 1
+                self.rownumber += 1
+                return row
+
+        return self._next_row_iter()
+
+    @is_open
+    def _next_row_iter(self):
+        if self._batch_stream is None:
+            raise ProgrammingError(
+                'has no row data, have you executed a query that returns data?',
+                None
+            )
+
+        if self._batch_pos == self._batch_len and not self._next_batch():
+            self._row_iter = None
+            raise StopIteration
+
+        start = self._batch_pos
+        cols = self._batch if start == 0 else [col[start:] for col in self._batch]
+        self._row_iter = zip(*_typecast_columns(cols, self._typecaster_list))
+        if self.rownumber // api_globals._PROGRESS_LOG_N != \
+                (self.rownumber + self._batch_len - start) // api_globals._PROGRESS_LOG_N:
+            logger.info(f'streams rows from {self.rownumber}.')
+
+        return next(self)
+
+    def __iter__(self):
+        return self
+
+
+def _checked_options(options: dict) -> dict:
+    '''
+    Returns the given query payload options with an autoLimit as the string of digits which
+    Drill expects, raising ProgrammingError if it is not a non-negative integer or if a
+    defaultSchema is not a string.
+    '''
+    if not options:
+        return options
+
+    default_schema = options.get('defaultSchema')
+    if default_schema is not None and not isinstance(default_schema, str):
+        raise ProgrammingError(f'defaultSchema must be a string, not {default_schema!r}.', None)
+
+    auto_limit = options.get('autoLimit')
+    if auto_limit is None:
+        return options
+    if isinstance(auto_limit, bool) or not isinstance(auto_limit, (int, str)) or \
+            not re.fullmatch(r'[0-9]+', str(auto_limit)):
+        raise ProgrammingError(
+            f'autoLimit must be a non-negative integer, not {auto_limit!r}.', None
+        )
+
+    return dict(options, autoLimit=str(int(auto_limit)))
@@ -1,27 +1,34 @@
 # -*- coding: utf-8 -*-
 """
-This module provides the implementation of the Cursor object for interfacing with
-the Drill database. It adheres to the Python DB API 2.0 standard, enabling execution
-of SQL queries, retrieval of data, and management of cursor states.
-
-This module fetches and processes query results from Drill, supporting both
-metadata extraction and data streaming for enhanced query handling.
-
-Classes:
-- Cursor: Encapsulates the functionality for executing SQL statements, retrieving
-  query results, and maintaining database connection integrity.
+This module provides the Python DB API 2.0 interface to the Drill database:
+the connect function, the Connection object and the module globals, type
+objects and exceptions which the standard requires. The Cursor object is
+implemented in _cursor.
+
+Connection handles the sending of queries to the Drill REST API, spreading
+them across drillbits, retrying and hedging them, see _balancer, _retry and
+_hedging.
 """
 import logging
 import re
-from datetime import date, time, datetime
-from itertools import chain, islice
-from json import dumps
-from time import gmtime
+import threading
+from time import monotonic
 from typing import List
 
-from ijson import parse
-from ijson.common import ObjectBuilder
-from requests import Session, Response
+from requests import Session
+
+from ._balancer import get_balancer
+from ._cache import get_result_cache, normalize_sql
+from ._cursor import Cursor
+from ._hedging import post_hedged
+from ._parsing import ResponseStreamWrapper, _ijson_backend  # noqa: F401  # pylint: disable=unused-import
+from ._retry import _READ_ONLY_PATTERN, send_with_retries
+from ._transport import HTTPResponse, RequestsTransport, Transport, create_transport
+from ._types import (
+    BINARY, BOOL, DATE, DATETIME, FLOAT, INTERVAL, LONG, NUMBER, NUMERIC, ROWID, SMALLINT,
+    STRING, TIME, TIMESTAMP, INTEGER, Binary, Date, DateFromTicks, Time, TimeFromTicks,
+    Timestamp, TimestampFromTicks, _dates_from_ticks, _times_from_ticks, _timestamps_from_ticks
+)
 
 from . import api_globals
 from .api_exceptions import (
@@ -65,329 +72,26 @@ __all__ = [
 ]
 
 apilevel = '2.0'
-threadsafety = 3
+# Connections may be shared between threads, cursors may not
+threadsafety = 2
 paramstyle = 'qmark'
 default_storage_plugin = ''
 
 logger = logging.getLogger('drilldbapi')
 
-# Python DB API 2.0 classes
-
-
-class Cursor:
-
-    @staticmethod
-    def substitute_in_query(string_query, parameters):
-        logger.info(f'substitutes parameters in query {string_query}.')
-        query = string_query
-        try:
-            for param in parameters:
-                if isinstance(param, str):
-                    param = f"'{param}'"
-                else:
-                    param = str(param)
-
-                query = query.replace('?', param, 1)
-                logger.debug(f'set parameter value {param}')
-        except Exception as ex:
-            logger.error(f'query parameter substitution encountered {ex}.')
-            raise ProgrammingError(
-                'Could not substitute query parameter values',
-                None
-            ) from ex
-
-        return query
-
-    def __init__(self, conn):
-
-        self.arraysize: int = 1
-        self.description: tuple = None
-        self.connection = conn
-        self.rowcount: int = -1
-        self.rownumber: int = None
-        self.result_md = {}
-
-        self._is_open: bool = True
-        self._result_event_stream = self._row_stream = None
-        self._typecaster_list: list = None
-
-    def is_open(func):
-        """Decorator for methods which require a connection"""
-
-        def func_wrapper(self, *args, **kwargs):
-            if self._is_open is False:
-                raise CursorClosedException(
-                    f'Cannot call {func} with a closed cursor.'
-                )
-            elif self.connection._connected is False:
-                raise ConnectionClosedException(
-                    f'Cannot call {func} with a closed connection.'
-                )
-            else:
-                return func(self, *args, **kwargs)
-
-        return func_wrapper
-
-    def _gen_description(self, col_types):
-        blank = [None] * len(self.result_md['columns'])
-        dbapi_col_types = [DBAPITypeObject(col_type) for col_type in col_types]
-
-        self.description = tuple(
-            zip(
-                self.result_md['columns'],  # name
-                dbapi_col_types or blank,  # type_code
-                blank,  # display_size
-                blank,  # internal_size
-                blank,  # precision
-                blank,  # scale
-                blank   # null_ok
-            )
-        )
-
-    def _report_query_state(self):
-        md = self.result_md
-        query_state = md.get('queryState', None)
-        exception = md.get(
-                    'exception',
-                    'No exception returned.'
-                )
-        error_message = md.get(
-            'errorMessage',
-            'No error message is returned (which most likely means that ' \
-            'drill.exec.http.rest.errors.verbose is set to false.)'
-        )
-        stack_trace = md.get('stackTrace', 'No stack trace returned.')
-
-        logger.info(
-            f'received final query state {query_state}.'
-        )
-
-        if query_state != 'COMPLETED':
-            logger.warning(exception)
-            logger.warning(error_message)
-            logger.warning(stack_trace)
-
-            raise DatabaseError(
-                f'Final Drill query state is {query_state}. {error_message}',
-                None
-            )
-
-    def _outer_parsing_loop(self) -> bool:
-        '''Internal method to process the outermost query result JSON structure.
-
-        This loop will parse result JSON, recording metadata as it goes, until
-        it either encounters row data or the end of the result stream.  If row
-        data is encountered then parsing is halted in order that it can be driven
-        in a streaming fashion by the user making calls to the fetchN() methods.
-
-        Since there is also result metadata found _after_ row data, the fetchN()
-        methods should start this loop again once they've encountered the end of
-        the row data.
-
-        Returns True iff row data is encountered in the result.
-        '''
-        try:
-            while True:
-                prefix, event, value = next(self._result_event_stream)
-                logger.debug(f'ijson parsed {prefix}, {event}, {value}')
-
-                if event != 'map_key':
-                    continue
-
-                if value == 'rows':
-                    # discard the array node itself
-                    next(self._result_event_stream)
-
-                    self._row_stream = _items_once(
-                        self._result_event_stream, 'rows.item'
-                    )
-                    # stop here so that row parsing can be driven by user calls
-                    # to fetchN
-                    return True
-                else:
-                    # save the parsed object to the result metadata dict
-                    self.result_md[value] = next(
-                        _items_once(self._result_event_stream, value)
-                    )
-        except StopIteration:
-            logger.info(
-                'reached the end of the result stream, parsing complete.'
-            )
-
-        self._report_query_state()
-        return False
-
-    @is_open
-    def getdesc(self):
-        return self.description
-
-    @is_open
-    def close(self):
-        self._is_open = False
-        if self._row_stream is not None:
-            self._row_stream.close()
-            self._row_stream = None
-            logger.debug('closed row data stream.')
-        else:
-            logger.debug('had no row data stream to close.')
-
-    @is_open
-    def execute(self, operation, parameters=()):
-        if self._row_stream:
-            logger.warning(
-                'will close the existing row data stream.'
-            )
-            self._row_stream.close()
-
-        self.rowcount = -1
-        self.rownumber = 0
-
-        matchObj = re.match(r'^SHOW FILES FROM\s(.+)',
-                            operation, re.IGNORECASE)
-        if matchObj:
-            self._default_storage_plugin = matchObj.group(1)
-            logger.info(
-                'sets the default storage plugin to '
-                f'{self._default_storage_plugin}'
-            )
-
-        resp = self.connection.submit_query(
-            self.substitute_in_query(operation, parameters)
-        )
-
-        if resp.status_code != 200:
-            err_msg = resp.json().get('errorMessage', None)
-            raise ProgrammingError(err_msg, resp.status_code)
-
-        self._result_event_stream = parse(RequestsStreamWrapper(resp))
-        row_data_present = self._outer_parsing_loop()
-        # The leading result metadata has now been parsed.
-
-        logger.info(
-            f'received Drill query ID {self.result_md.get("queryId", None)}.'
-        )
-
-        if not row_data_present:
-            return
-
-        cols = self.result_md['columns']
-        # Column metadata could be trailing or entirely absent
-        if 'metadata' in self.result_md:
-            md = self.result_md['metadata']
-            # strip size information from column types e.g. VARCHAR(10)
-            basic_coltypes = [re.sub(r'\(.*\)', '', m) for m in md]
-            self._gen_description(basic_coltypes)
-
-            self._typecaster_list = [
-                self.connection.python_typecasters.get(col, lambda v: v) for
-                col in basic_coltypes
-            ]
-        else:
-            self._gen_description(None)
-            logger.warning(
-                'encountered data before metadata, typecasting during '
-                'streaming by this module will not take place.  Upgrade '
-                'to Drill >= 1.19 or apply your own typecasting.'
-            )
-
-        logger.info(f'opened a row data stream of {len(cols)} columns.')
-
-    @is_open
-    def executemany(self, operation, seq_of_parameters):
-        for parameters in seq_of_parameters:
-            logger.debug(f'executes with parameters {parameters}.')
-            self.execute(operation, parameters)
-
-    @is_open
-    def fetchone(self):
-        res = self.fetchmany(1)
-        return next(iter(res), None)
-
-    @is_open
-    def fetchmany(self, size: int = None):
-        '''Fetch the next set of rows of a query result.
-
-        The number of rows to fetch per call is specified by the size
-        parameter. If it is not given, the cursor's arraysize determines the
-        number of rows to be fetched. If size is negative then all remaining
-        rows are fetched.
-        '''
-        if self._row_stream is None:
-            raise ProgrammingError(
-                'has no row data, have you executed a query that returns data?',
-                None
-            )
-
-        fetch_until = self.rownumber + (size or self.arraysize)
-        results = []
-
-        try:
-            while self.rownumber != fetch_until:
-                row_dict = next(self._row_stream)
-                # values ordered according to self.result_md['columns']
-                row = [row_dict[col] for col in self.result_md['columns']]
-
-                if self._typecaster_list is not None:
-                    row = (f(v) for f, v in zip(self._typecaster_list, row))
-
-                results.append(tuple(row))
-                self.rownumber += 1
-
-                if self.rownumber % api_globals._PROGRESS_LOG_N == 0:
-                    logger.info(f'streamed {self.rownumber} rows.')
-
-        except StopIteration:
-            self.rowcount = self.rownumber
-            logger.info(
-                f'reached the end of the row data after {self.rownumber}'
-                ' records.'
-            )
-            # restart the outer parsing loop to collect trailing metadata
-            self._outer_parsing_loop()
-
-        return results
-
-    @is_open
-    def fetchall(self) -> List:
-        '''Fetch all (remaining) rows of a query result.'''
-        return self.fetchmany(-1)
-
-    def setinputsizes(self, *sizes):
-        '''Not supported.'''
-        logger.debug('setinputsizes is a no-op in this driver.')
-
-    def setoutputsize(self, size, column=0):
-        '''Not supported.'''
-        logger.debug('setoutputsize is a no-op in this driver.')
-
-    @is_open
-    def get_query_id(self) -> str:
-        """Unofficial convenience method for getting the Drill ID of the last query.
-        """
-        return self._query_id
-
-    @is_open
-    def get_column_names(self) -> List:
-        """Unofficial convenience method for getting the column names."""
-        return [d[0] for d in self.description]
-
-    @is_open
-    def get_query_metadata(self) -> List:
-        """Unofficial convenience method for getting the column metadata."""
-        return [d[1] for d in self.description]
-
-    def get_default_plugin(self) -> str:
-        """Unofficial convenience method for getting the default storage plugin.
-        """
-        return self._default_storage_plugin
-
-    # Make this Cursor object iterable
-
-    def __next__(self):
-        return self.fetchone()
+# Drill versions by base URL, queried once per process and shared by connections
+_server_versions = {}
+_server_versions_lock = threading.Lock()
+# Drillbit URLs discovered from sys.drillbits by seed URL, with their expiry times
+_discovered_drillbits = {}
+_discovered_drillbits_lock = threading.Lock()
 
-    def __iter__(self):
-        return self
+# USE statements and the parts of the schema they name, quoted or not
+_USE_PATTERN = re.compile(r'^\s*USE\s+(.+?)[\s;]*$', re.IGNORECASE | re.DOTALL)
+_SCHEMA_PART_PATTERN = re.compile(r'`([^`]+)`|([^.`\s]+)')
+# Statements which set or reset session options
+_SESSION_OPTION_PATTERN = re.compile(r'^\s*(ALTER\s+SESSION\s+)?(SET|RESET)\b', re.IGNORECASE)
+_RESET_ALL_PATTERN = re.compile(r'\bRESET\s+ALL[\s;]*$', re.IGNORECASE)
 
 
 class Connection:
@@ -396,26 +100,113 @@ class Connection:
                  port: int,
                  proto: str,
                  impersonation_target: str,
-                 session: Session,
-                 stream_results: bool = True):
-        if session is None:
-            raise ProgrammingError('A Requests session is required.', None)
+                 transport: Transport,
+                 stream_results: bool = True,
+                 *,
+                 chunk_size: int = api_globals._CHUNK_SIZE,
+                 prefetch: int = 0,
+                 whole_body_bytes: int = api_globals._WHOLE_BODY_BYTES,
+                 numbers: str = 'decimal',
+                 default_schema: str = None,
+                 hosts: List[str] = None,
+                 discover: bool = False,
+                 balance: str = 'round_robin',
+                 credentials: tuple = None,
+                 hedge_percentile: float = 0,
+                 retries: int = api_globals._RETRIES,
+                 retry_backoff: float = api_globals._RETRY_BACKOFF_S,
+                 result_cache_bytes: int = 0,
+                 result_cache_ttl: float = api_globals._CACHE_TTL_S,
+                 result_cache_dir: str = None,
+                 result_cache_dir_bytes: int = api_globals._CACHE_DIR_BYTES,
+                 result_cache_validate: bool = False,
+                 result_cache_probe_ttl: float = api_globals._CACHE_PROBE_TTL_S,
+                 single_flight: bool = False):
+        if transport is None:
+            raise ProgrammingError('An HTTP transport is required.', None)
+        if isinstance(transport, Session):
+            # Connections used to be constructed over a Requests session
+            transport = RequestsTransport(transport)
+        if numbers not in ('float', 'decimal', 'auto'):
+            raise ProgrammingError(
+                f'Unknown numbers mode {numbers}, use float, decimal or auto.',
+                None
+            )
+        if not transport.blocking and (prefetch or hedge_percentile):
+            # both send or read on threads of their own
+            raise NotSupportedError(
+                'Prefetching and hedging are not supported by async connections.',
+                None
+            )
 
         self._base_url = f'{proto}{host}:{port}'
-        self._session = session
+        self._transport = transport
         self._connected = True
+        self._lock = transport.lock()
         self._impersonation_target = impersonation_target
         self._stream_results = stream_results
-
-        logger.debug('queries Drill\'s version number...')
-        resp = self.submit_query(
-            'select min(version) version from sys.drillbits'
+        self._chunk_size = chunk_size
+        self._prefetch = prefetch
+        self._whole_body_bytes = whole_body_bytes
+        self._numbers = numbers
+        # the schema sent with each query, Drill >= 1.18 setting the
+        # session's schema to it
+        self._default_schema = None
+        # the schema named by the connection, as defaultSchema or by USE,
+        # against which unqualified table names are resolved
+        self._schema = default_schema
+        # the session options set by the connection, in order, which may
+        # change the results of later queries
+        self._session_options = ()
+        # the user name and password to log in to each drillbit with, if any
+        self._credentials = credentials
+        # drillbits logged in to, connect() having logged in to the first
+        self._logged_in = {self._base_url} if credentials else set()
+        # read-only queries are hedged after this percentile of response
+        # header latencies, 0 disables hedging
+        self._hedge_percentile = hedge_percentile
+        # read-only queries failing transiently are retried this many times
+        self._retries = retries
+        self._retry_backoff = retry_backoff
+        # read-only query results, shared with other connections, None if off
+        self.result_cache = None
+        if result_cache_bytes or result_cache_dir:
+            self.result_cache = get_result_cache(
+                self._base_url, result_cache_bytes, result_cache_ttl,
+                result_cache_dir, result_cache_dir_bytes
+            )
+        # whether cached results are checked against the files they read,
+        # whose listings are cached for the probe TTL
+        self._validate_cache = result_cache_validate
+        self._probe_ttl = result_cache_probe_ttl
+        # whether identical read-only queries in flight in this process are shared
+        self._single_flight = single_flight
+
+        static_urls = [_drillbit_url(proto, h, port) for h in hosts or ()]
+        self._balancer = get_balancer(
+            list(dict.fromkeys([self._base_url] + static_urls)), balance
         )
-        self.drill_version = resp.json()['rows'][0]['version']
+
+        self.drill_version = self._server_version()
         logger.info(f'has connected to Drill version {self.drill_version}.')
 
+        if default_schema is not None:
+            if self.drill_version < '1.18':
+                # the defaultSchema query parameter is not supported
+                self.submit_query(f'USE {default_schema}')
+            else:
+                self._default_schema = default_schema
+
+        if discover:
+            # the drillbit in the URL is kept, should sys.drillbits report
+            # names or ports which are not reachable from this client
+            urls = [self._base_url] + self._discover_drillbits(proto) + static_urls
+            self._balancer = get_balancer(list(dict.fromkeys(urls)), balance)
+        logger.debug(f'balances queries across {self._balancer.drillbits}.')
+
         if self.drill_version < '1.19':
             self.python_typecasters = {}
+            self.column_typecasters = {}
         else:
             # Starting in 1.19 the Drill REST API returns UNIX times
             self.python_typecasters = {
@@ -423,14 +214,71 @@ class Connection:
                 'TIME': TimeFromTicks,
                 'TIMESTAMP': TimestampFromTicks
             }
+            # Typecasters converting whole columns, these take precedence
+            self.column_typecasters = {
+                'DATE': _dates_from_ticks,
+                'TIME': _times_from_ticks,
+                'TIMESTAMP': _timestamps_from_ticks
+            }
             logger.debug('sets up typecasting functions for Drill >= 1.19.')
 
-    def submit_query(self, query: str, stream: bool = None):
+    def _server_version(self) -> str:
+        with _server_versions_lock:
+            version = _server_versions.get(self._base_url)
+        if version is not None:
+            logger.debug(f'uses the cached Drill version of {self._base_url}.')
+            return version
+
+        logger.debug('queries Drill\'s version number...')
+        resp = self.submit_query(
+            'select min(version) version from sys.drillbits',
+            stream=False
+        )
+        version = resp.json()['rows'][0]['version']
+        with _server_versions_lock:
+            _server_versions[self._base_url] = version
+
+        return version
+
+    def _discover_drillbits(self, proto: str) -> List[str]:
+        '''Internal method returning the URLs of the online drillbits.'''
+        with _discovered_drillbits_lock:
+            expiry, urls = _discovered_drillbits.get(self._base_url, (0, None))
+        if expiry > monotonic():
+            return urls
+
+        logger.debug('queries the drillbits of the cluster...')
+        resp = self.submit_query('select * from sys.drillbits', stream=False)
+        urls = [
+            f'{proto}{row["hostname"]}:{row["http_port"]}'
+            for row in resp.json().get('rows', [])
+            if row.get('state', 'ONLINE') == 'ONLINE'
+        ]
+        logger.info(f'discovered {len(urls)} online drillbits.')
+
+        with _discovered_drillbits_lock:
+            _discovered_drillbits[self._base_url] = (
+                monotonic() + api_globals._DISCOVERY_TTL_S, urls
+            )
+
+        return urls
+
+    def _log_in_to(self, base_url: str):
+        with self._lock:
+            if base_url not in self._logged_in:
+                _log_in(self._transport, base_url, *self._credentials)
+                self._logged_in.add(base_url)
+
+    def submit_query(self, query: str, stream: bool = None, options: dict = None):
         logger.debug(f'submits a query: {query}')
         payload = api_globals._PAYLOAD.copy()
         payload['userName'] = self._impersonation_target
 
-        # TODO: autoLimit, defaultSchema
+        if self._default_schema is not None:
+            payload['defaultSchema'] = self._default_schema
+        if options:
+            # e.g. autoLimit and defaultSchema
+            payload.update(options)
         payload['query'] = query
 
         # Use connection default if not specified
@@ -440,24 +288,96 @@ class Connection:
         logger.debug(f'sends an HTTP POST with payload (stream={stream})')
         logger.debug(payload)
 
-        resp = self._session.post(
-            f'{self._base_url}/query.json',
-            data=dumps(payload),
-            headers=api_globals._HEADER,
-            timeout=None,
-            stream=stream
-        )
-
-        logger.debug('received an HTTP response with body:')
-        logger.debug(resp.text)
+        read_only = _READ_ONLY_PATTERN.match(query) is not None
+        balancer = self._balancer
 
-        if resp.status_code == 200:
+        def send():
+            if self._hedge_percentile and len(balancer.drillbits) > 1 and read_only:
+                resp = post_hedged(
+                    balancer, self._hedge_percentile,
+                    lambda drillbit: self._post_query(balancer, drillbit, payload, stream),
+                    self.cancel_query
+                )
+            else:
+                resp = self._post_query(balancer, balancer.acquire(), payload, stream)
+            if not stream:
+                # Reading resp.text of a streamed response would consume it.
+                logger.debug('received an HTTP response with body:')
+                logger.debug(resp.text)
             return resp
 
-        raise DatabaseError(
-            resp.json().get('errorMessage', None),
-            resp.status_code
+        resp = send_with_retries(
+            send, balancer, self._retries if read_only else 0, self._retry_backoff,
+            self._transport.sleep
         )
+        self._track_session(query)
+        return resp
+
+    def _track_session(self, query: str):
+        '''Internal method to follow a statement which succeeded in changing
+        the session.  The schema of a USE statement becomes the connection's
+        schema, sent as the defaultSchema of later queries, which Drill >= 1.18
+        would otherwise set the session's schema back to.  Session options
+        are recorded so that results read under them are cached apart.
+        '''
+        if _SESSION_OPTION_PATTERN.match(query):
+            if _RESET_ALL_PATTERN.search(query):
+                self._session_options = ()
+            else:
+                self._session_options += (normalize_sql(query),)
+            return
+
+        match = _USE_PATTERN.match(query)
+        if match is None:
+            return
+
+        schema = '.'.join(a or b for a, b in _SCHEMA_PART_PATTERN.findall(match.group(1)))
+        logger.info(f'sets the default schema to {schema}.')
+        self._schema = schema
+        if self.drill_version >= '1.18':
+            self._default_schema = schema
+
+    def _post_query(self, balancer, drillbit, payload: dict, stream: bool) -> HTTPResponse:
+        '''Internal method to send a query to a drillbit acquired from the balancer.'''
+        start = monotonic()
+        try:
+            if self._credentials is not None:
+                self._log_in_to(drillbit.base_url)
+            resp = self._transport.post_json(
+                f'{drillbit.base_url}/query.json',
+                payload,
+                stream=stream
+            )
+        except OperationalError:
+            balancer.release(drillbit, reached=False)
+            raise
+        except BaseException:
+            balancer.release(drillbit)
+            raise
+
+        balancer.record_latency(monotonic() - start)
+        resp.drillbit = drillbit
+        # a drillbit shutting down or behind a proxy may be unavailable
+        reached = resp.status_code not in api_globals._RETRY_STATUSES
+        if resp.consumed:
+            balancer.release(drillbit, reached)
+        else:
+            # the query is outstanding until its results have been read
+            resp.add_close_callback(lambda: balancer.release(drillbit, reached))
+
+        return resp
+
+    def cancel_query(self, query_id: str, drillbit=None):
+        """Unofficial method for cancelling a running query on the server.
+        The drillbit is the query's foreman, by default the connection's host.
+        """
+        base_url = self._base_url if drillbit is None else drillbit.base_url
+        logger.info(f'cancels Drill query ID {query_id} on {base_url}.')
+        resp = self._transport.get(f'{base_url}/profiles/cancel/{query_id}')
+        logger.debug(f'received {resp.text.strip()}')
+
+        if resp.status_code != 200:
+            raise DatabaseError(resp.text, resp.status_code)
 
     # Decorator for methods which require connection
     def connected(func):
@@ -477,12 +397,16 @@ class Connection:
 
     @connected
     def close(self):
-        try:
-            self._session.close()
-            self._connected = False
-        except Exception as ex:
-            logger.warning(f'encountered {ex} when try to close connection.')
-            raise ConnectionClosedException('Failed to close connection') from ex
+        with self._lock:
+            if not self._connected:
+                # closed by another thread
+                return
+            try:
+                self._transport.close()
+                self._connected = False
+            except Exception as ex:
+                logger.warning(f'encountered {ex} when try to close connection.')
+                raise ConnectionClosedException('Failed to close connection') from ex
 
     @connected
     def commit(self):
@@ -503,7 +427,28 @@ def connect(host: str,
             drillpass: str = None,
             verify_ssl: bool = False,
             impersonation_target: str = None,
-            stream_results: bool = True
+            stream_results: bool = True,
+            *,
+            chunk_size: int = api_globals._CHUNK_SIZE,
+            prefetch: int = 0,
+            whole_body_bytes: int = api_globals._WHOLE_BODY_BYTES,
+            numbers: str = 'decimal',
+            transport: str = 'urllib3',
+            pool_maxsize: int = api_globals._POOL_MAXSIZE,
+            compression: bool = True,
+            hosts: str = None,
+            discover: bool = False,
+            balance: str = 'round_robin',
+            hedge_percentile: float = 0,
+            retries: int = api_globals._RETRIES,
+            retry_backoff: float = api_globals._RETRY_BACKOFF_S,
+            result_cache_bytes: int = 0,
+            result_cache_ttl: float = api_globals._CACHE_TTL_S,
+            result_cache_dir: str = None,
+            result_cache_dir_bytes: int = api_globals._CACHE_DIR_BYTES,
+            result_cache_validate: bool = False,
+            result_cache_probe_ttl: float = api_globals._CACHE_PROBE_TTL_S,
+            single_flight: bool = False
             ) -> Connection:
     """
     Establishes a connection with an Apache Drill server.
@@ -525,17 +470,68 @@ def connect(host: str,
     impersonation_target (str, optional): The impersonation target to use for the connection. If provided, operations
                                            will be performed as the specified user.
     stream_results (bool, optional): Flag to enable or disable streaming of query results. Defaults to True.
+    chunk_size (int, optional): The number of bytes read from the HTTP response per read when parsing results.
+                                Defaults to 64 KiB.
+    prefetch (int, optional): The number of row batches to read and parse ahead of the caller on a background
+                              thread. Defaults to 0, which disables prefetching.
+    whole_body_bytes (int, optional): Responses are read ahead by up to this many decoded bytes and, if they end
+                                      within them, parsed in one pass rather than incrementally. 0 disables
+                                      this. Defaults to 8 MiB.
+    numbers (str, optional): How JSON numbers with a fraction or exponent are decoded: 'decimal' as Decimal,
+                             'float' as float, or 'auto' as float for FLOAT4/FLOAT8 columns and as Decimal for
+                             DECIMAL/VARDECIMAL columns. Defaults to 'decimal'.
+    transport (str, optional): The HTTP client library used to talk to Drill: 'urllib3', 'requests' or 'httpx'.
+                               Defaults to 'urllib3'. A 'requests' Session sends one request at a time.
+    pool_maxsize (int, optional): The number of HTTP connections to Drill kept open for reuse by threads sharing
+                                  the connection. Defaults to 10.
+    compression (bool, optional): Whether to request gzip or deflate compressed query results, which are decompressed
+                                  as they are streamed. Defaults to True.
+    hosts (str, optional): Further drillbits, as a comma separated list of host[:port], to spread queries across.
+    discover (bool, optional): Whether to spread queries across the online drillbits listed in sys.drillbits.
+                               Defaults to False.
+    balance (str, optional): How the drillbit for each query is chosen: 'round_robin' or 'least_outstanding'
+                             queries. Defaults to 'round_robin'.
+    hedge_percentile (float, optional): Read-only queries which have not started to receive a response by this
+                                        percentile of recent response times are sent to a second drillbit too, and
+                                        the slower of the two cancelled. Defaults to 0, which disables hedging.
+    retries (int, optional): How many times a read-only query is retried after a transient failure, such as an
+                             unreachable drillbit or an HTTP 502, 503 or 504. Defaults to 2.
+    retry_backoff (float, optional): The base of the exponential backoff between retries, in seconds. The nth retry
+                                     waits a random time of up to retry_backoff * 2 ** (n - 1). Defaults to 0.1.
+    result_cache_bytes (int, optional): The memory, in bytes, of a cache of read-only query results shared by the
+                                        connections of this process to the same server. Defaults to 0, which
+                                        disables the cache.
+    result_cache_ttl (float, optional): The seconds for which results are cached. Defaults to 300.
+    result_cache_dir (str, optional): A directory in which to cache read-only query results too, shared by the
+                                      processes using it. Results not in memory are looked for there. Defaults to
+                                      None, which disables the disk cache.
+    result_cache_dir_bytes (int, optional): The size, in bytes, to which the files in result_cache_dir are limited.
+                                            Defaults to 1 GiB.
+    result_cache_validate (bool, optional): Whether a cached result is checked, before it is served, against the sizes
+                                            and modification times which SHOW FILES gives for the files and
+                                            directories the query reads, and discarded if they have changed.
+                                            Defaults to False.
+    result_cache_probe_ttl (float, optional): The seconds for which the SHOW FILES listings used to check cached
+                                              results are themselves cached. Defaults to 10.
+    single_flight (bool, optional): Whether a read-only query identical to one already in flight in this process, on
+                                    any connection with the same server, user, schema and options, shares its
+                                    result rather than being sent to Drill again. Defaults to False.
 
     Returns:
     Connection: An object representing the established connection to the Apache Drill server.
 
     Raises:
     DatabaseError: If the connection to the Apache Drill server could not be established or an error occurs with the server.
+    OperationalError: If the Apache Drill server could not be reached.
     AuthError: If authentication fails due to invalid username or password.
     """
-    session = Session()
-
-    session.verify = verify_ssl
+    verify_ssl = verify_ssl in [True, 'True', 'true']
+    transport = create_transport(
+        transport,
+        verify_ssl,
+        int(pool_maxsize),
+        compression in [True, 'True', 'true', '1']
+    )
     proto = 'https://' if use_ssl in [True, 'True', 'true'] else 'http://'
     base_url = f'{proto}{host}:{port}'
 
@@ -544,24 +540,47 @@ def connect(host: str,
         f'{impersonation_target}'
     )
 
-    if drilluser is None:
-        payload = api_globals._PAYLOAD.copy()
-        payload['userName'] = impersonation_target
+    # Anonymous connections are checked by the Connection's first query
+    credentials = None
+    if drilluser is not None:
+        credentials = (drilluser, drillpass)
+        _log_in(transport, base_url, *credentials)
+
+    if isinstance(hosts, str):
+        hosts = [h.strip() for h in hosts.split(',') if h.strip()]
+
+    return Connection(
+        host, port, proto, impersonation_target, transport, stream_results,
+        chunk_size=int(chunk_size),
+        prefetch=int(prefetch),
+        whole_body_bytes=int(whole_body_bytes),
+        numbers=numbers,
+        default_schema=db,
+        hosts=hosts,
+        discover=discover in [True, 'True', 'true', '1'],
+        balance=balance,
+        credentials=credentials,
+        hedge_percentile=float(hedge_percentile),
+        retries=int(retries),
+        retry_backoff=float(retry_backoff),
+        result_cache_bytes=int(result_cache_bytes),
+        result_cache_ttl=float(result_cache_ttl),
+        result_cache_dir=result_cache_dir,
+        result_cache_dir_bytes=int(result_cache_dir_bytes),
+        result_cache_validate=result_cache_validate in [True, 'True', 'true', '1'],
+        result_cache_probe_ttl=float(result_cache_probe_ttl),
+        single_flight=single_flight in [True, 'True', 'true', '1']
+    )
 
-        payload['query'] = 'show schemas'
-        response = session.post(
-            f'{base_url}/query.json',
-            data=dumps(payload),
-            headers=api_globals._HEADER
-        )
-    else:
-        payload = api_globals._LOGIN.copy()
-        payload['j_username'] = drilluser
-        payload['j_password'] = drillpass
-        response = session.post(
-            f'{base_url}/j_security_check',
-            data=payload
-        )
+
+def _log_in(transport: Transport, base_url: str, drilluser: str, drillpass: str):
+    payload = api_globals._LOGIN.copy()
+    payload['j_username'] = drilluser
+    payload['j_password'] = drillpass
+    response = transport.post_form(
+        f'{base_url}/j_security_check',
+        payload
+    )
 
     if response.status_code != 200:
         logger.error('was unable to connect to Drill.')
@@ -575,141 +594,9 @@ def connect(host: str,
         logger.error('failed to authenticate to Drill.')
         raise AuthError(str(raw_data), response.status_code)
 
-    conn = Connection(host, port, proto, impersonation_target, session, stream_results)
-    if db is not None:
-        conn.submit_query(f'USE {db}')
-
-    return conn
-
-
-class RequestsStreamWrapper:
-    """
-    A wrapper around a Requests response payload for converting
-    the returned generator into a file-like object.
-    """
-
-    def __init__(self, resp: Response):
-        self.data = chain.from_iterable(resp.iter_content())
-
-    def read(self, n):
-        return bytes(islice(self.data, None, n))
-
-
-def _items_once(event_stream, prefix):
-    '''
-    Generator dispatching native Python objects constructed from the ijson events under the next
-    occurrence of the given prefix.  It is similar similar to ijson.items except that it will
-    not consume the entire JSON stream looking for occurrences of prefix, but rather stop after
-    completing the current occurrence of prefix.  The need for this behaviour is what precluded
-    the use of ijson.items instead.
-    '''
-
-    try:
-        current, event, value = next(event_stream)
-    except StopIteration:
-        return  # see PEP-479
-
-    while current == prefix:
-        if event in ('start_map', 'start_array'):
-            object_depth = 1
-            builder = ObjectBuilder()
-            while object_depth:
-                try:
-                    builder.event(event, value)
-                    current, event, value = next(event_stream)
-                    if event in ('start_map', 'start_array'):
-                        object_depth += 1
-                    elif event in ('end_map', 'end_array'):
-                        object_depth -= 1
-                except StopIteration:
-                    return  # see PEP-479
-            del builder.containers[:]
-            yield builder.value
-        else:
-            yield value
-
-        try:
-            current, event, value = next(event_stream)
-        except StopIteration:
-            return  # see PEP-479
-
-    logger.debug(f'finished parsing one occurrence of {prefix}')
-
-
-class DBAPITypeObject:
-    def __init__(self, *values):
-        self.values = values
-
-    def __cmp__(self, other):
-        if other in self.values:
-            return 0
-        if other < self.values:
-            return 1
-        return -1
-
-    def __eq__(self, other):
-        return self.values == other.values
-
-    def __hash__(self):
-        return hash(repr(self))
-
-
-# Mandatory type objects defined by DB-API 2 specs.
-
-STRING = DBAPITypeObject('VARCHAR')
-BINARY = DBAPITypeObject('BINARY', 'VARBINARY')
-NUMBER = DBAPITypeObject('FLOAT4', 'FLOAT8', 'SMALLINT',
-                         'INT', 'BIGINT', 'DECIMAL')
-DATETIME = DBAPITypeObject('DATE', 'TIMESTAMP')
-ROWID = DBAPITypeObject()
-
-# Additional type objects (more specific):
-
-BOOL = DBAPITypeObject('BIT')
-SMALLINT = DBAPITypeObject('SMALLINT')
-INTEGER = DBAPITypeObject('INT')
-LONG = DBAPITypeObject('BIGINT')
-FLOAT = DBAPITypeObject('FLOAT4', 'FLOAT8')
-NUMERIC = DBAPITypeObject('VARDECIMAL')
-DATE = DBAPITypeObject('DATE')
-TIME = DBAPITypeObject('TIME')
-TIMESTAMP = DBAPITypeObject('TIMESTAMP')
-INTERVAL = DBAPITypeObject('INTERVALDAY', 'INTERVALYEAR')
-
-# Mandatory type helpers defined by DB-API 2 specs
-
-
-def Date(year, month, day):
-    """Construct an object holding a date value."""
-    return date(year, month, day)
-
-
-def Time(hour, minute=0, second=0, microsecond=0, tzinfo=None):
-    """Construct an object holding a time value."""
-    return time(hour, minute, second, microsecond, tzinfo)
-
-
-def Timestamp(year, month, day, hour=0, minute=0, second=0, microsecond=0,
-              tzinfo=None):
-    """Construct an object holding a time stamp value."""
-    return datetime(year, month, day, hour, minute, second, microsecond,
-                    tzinfo)
-
-
-def DateFromTicks(ticks):
-    """Construct an object holding a date value from the given Unix time ms."""
-    return Date(*gmtime(ticks/1000)[:3]) if ticks else None
-
-
-def TimeFromTicks(ticks):
-    """Construct an object holding a time value from the given Unix time ms."""
-    return Time(*gmtime(ticks/1000)[3:6]) if ticks else None
-
-
-def TimestampFromTicks(ticks):
-    """Construct an object holding a timestamp from the given Unix time ms."""
-    return Timestamp(*gmtime(ticks/1000)[:6]) if ticks else None
-
 
-class Binary(bytes):
-    """Construct an object capable of holding a binary (long) string value."""
+def _drillbit_url(proto: str, host: str, default_port: int) -> str:
+    '''Returns the base URL of a drillbit given as host[:port].'''
+    if ':' not in host:
+        host = f'{host}:{default_port}'
+    return f'{proto}{host}'
@@ -0,0 +1,302 @@
+# -*- coding: utf-8 -*-
+"""
+Single-flight execution of identical read-only queries, used by connections
+made with single_flight.
+
+A Cursor executing a query identical to one already in flight in this
+process joins that Flight instead of sending the query to Drill. The query
+of a Flight is run by a source cursor of its own, and every cursor executing
+it, the first included, reads the decoded batches of rows through a
+FlightConsumer. Whichever consumer needs a batch which has not been read
+yet reads it from the source, so no consumer waits for another to fetch.
+The flight's lock is not held while a batch is read from the source, so
+that cursors joining the flight, and consumers with batches kept for them,
+are not held up by the network. Consumers needing the batch being read wait
+for it on the lock's condition. Batches are kept until every consumer has read them, and a Flight can no
+longer be joined once one has been dropped. A consumer which falls too far
+behind the others, for example that of a cursor which is never fetched from
+or closed, is detached so as not to hold the whole result in memory, and
+raises OperationalError when next read. If every consumer is closed
+before the rows have all been read, the source is closed, which cancels the
+query in Drill.
+"""
+import logging
+import threading
+from typing import Callable
+
+from . import api_globals
+from .api_exceptions import OperationalError
+
+logger = logging.getLogger('drilldbapi')
+
+
+class Flight:
+    """A query in flight, shared by the cursors executing it."""
+
+    def __init__(self, key, lock):
+        self.key = key
+        # a condition variable, whose lock is held while the query is sent
+        # and notified when a batch has been read from the source
+        self.lock = lock
+        # the result metadata of the source, trailing metadata included once
+        # the rows have all been read
+        self.result_md: dict = None
+        self.decoded_numbers: str = None
+        self.has_rows = False
+        self.error: Exception = None
+        self.done = False
+        # whether every consumer left before the end of the rows
+        self.abandoned = False
+        self._read_batch: Callable[[], list] = None
+        # whether a consumer is reading a batch from the source
+        self._reading = False
+        self._close_source: Callable[[], None] = None
+        self._interrupt_source: Callable[[], None] = None
+        # batches not yet read by every consumer, from the index of the first
+        self._batches = []
+        self._first = 0
+        # the index of the next batch to be read by each consumer
+        self._positions = {}
+
+    def start(self, result_md: dict, decoded_numbers: str, read_batch: Callable[[], list],
+              close_source: Callable[[], None], interrupt_source: Callable[[], None]):
+        """
+        Records the query having been sent: the result metadata of the
+        source, how its numbers are decoded, a function returning the next
+        batch of rows or None after the last one, None if the result has no
+        rows, a function closing the source and one waking a read of the
+        source blocked in another thread. Must be called holding the lock.
+        """
+        self.result_md = result_md
+        self.decoded_numbers = decoded_numbers
+        self.has_rows = read_batch is not None
+        self._read_batch = read_batch
+        self._close_source = close_source
+        self._interrupt_source = interrupt_source
+        if not self.has_rows:
+            self._finish()
+
+    def fail(self, error: Exception):
+        """
+        Records the failure of the query, which every consumer raises. Must
+        be called holding the lock.
+        """
+        self.error = error
+        self._finish()
+
+    def join(self) -> 'FlightConsumer':
+        """
+        Returns a consumer of the rows of the flight, or None if it can no
+        longer be joined. Must be called holding the lock.
+        """
+        if self._first or self.abandoned or not (self.done or self.result_md is not None):
+            # rows have been dropped, or the query was never sent
+            return None
+
+        consumer = FlightConsumer(self, dict(self.result_md or {}))
+        self._positions[consumer] = 0
+        return consumer
+
+    def _next(self, consumer: 'FlightConsumer') -> list:
+        with self.lock:
+            known, batch = self._await_batch(consumer)
+            if known:
+                return batch
+            self._reading = True
+
+        try:
+            batch = self._read_batch()
+        except Exception as ex:
+            with self.lock:
+                self._reading = False
+                self.lock.notify_all()
+                self.fail(ex)
+            self._close()
+            raise
+
+        with self.lock:
+            self._reading = False
+            self.lock.notify_all()
+            if not self.abandoned:
+                return self._add(consumer, batch)
+
+        # every consumer left while the batch was read
+        self._close()
+        return None
+
+    def _await_batch(self, consumer: 'FlightConsumer') -> tuple:
+        """
+        Returns True and the next batch for the consumer, or None if there are
+        no more, once it is known, or False if the consumer is to read it from
+        the source. Must be called holding the lock.
+        """
+        while True:
+            if self.abandoned:
+                # closed by another thread while waiting
+                if self.error is not None:
+                    raise self.error
+                return True, None
+            i = self._position(consumer)
+            if i - self._first < len(self._batches):
+                return True, self._advance(consumer, i, self._batches[i - self._first])
+            if self.error is not None:
+                raise self.error
+            if self.done:
+                return True, None
+            if not self._reading:
+                return False, None
+            # another consumer is reading the next batch
+            self.lock.wait()
+
+    def _add(self, consumer: 'FlightConsumer', batch: list) -> list:
+        """Keeps a batch read by the consumer from the source. Must be called holding the lock."""
+        if batch is None:
+            self._finish()
+            return None
+        self._batches.append(batch)
+        if len(self._batches) > api_globals._FLIGHT_MAX_BATCHES:
+            self._detach_slowest()
+        if consumer not in self._positions:
+            # closed by another thread while the batch was read
+            return batch
+        return self._advance(consumer, self._positions[consumer], batch)
+
+    def _position(self, consumer: 'FlightConsumer') -> int:
+        i = self._positions.get(consumer)
+        if i is None:
+            raise OperationalError(
+                f'The cursor fell more than {api_globals._FLIGHT_MAX_BATCHES} '
+                'batches of rows behind the other cursors reading a shared '
+                'query, which dropped them.',
+                None
+            )
+        return i
+
+    def _advance(self, consumer: 'FlightConsumer', i: int, batch: list) -> list:
+        self._positions[consumer] = i + 1
+        self._trim()
+        return batch
+
+    def _leave(self, consumer: 'FlightConsumer'):
+        with self.lock:
+            if self._positions.pop(consumer, None) is None:
+                return
+            if self._positions or self.done:
+                self._trim()
+                return
+
+            # the last consumer left before reading all of the rows
+            logger.info('closes a shared query which no cursor is reading any more.')
+            self.abandoned = True
+            self._finish()
+            reading = self._reading
+
+        if reading:
+            # the consumer reading from the source closes it once woken
+            self._interrupt_source()
+        else:
+            self._close()
+
+    def _close(self):
+        try:
+            self._close_source()
+        except Exception as ex:  # pylint: disable=broad-except
+            logger.warning(f'failed to close a shared query: {ex}')
+
+    def _detach_slowest(self):
+        # consumers which have not read the oldest batch kept would otherwise
+        # hold every later batch
+        for consumer, position in list(self._positions.items()):
+            if position == self._first:
+                logger.warning(
+                    'detaches a cursor which fell too far behind the others '
+                    'reading a shared query.'
+                )
+                del self._positions[consumer]
+
+    def _trim(self):
+        if not self._positions:
+            self._first += len(self._batches)
+            self._batches.clear()
+            return
+
+        drop = min(self._positions.values()) - self._first
+        if drop > 0:
+            del self._batches[:drop]
+            self._first += drop
+
+    def _finish(self):
+        self.done = True
+        _unregister(self)
+
+
+class FlightConsumer:
+    """
+    An iterator over the batches of rows of a Flight for one cursor, which
+    leaves the flight when exhausted or closed. Its result metadata is
+    completed with the trailing metadata of the source at the end.
+    """
+
+    def __init__(self, flight: Flight, result_md: dict):
+        self._flight = flight
+        self.result_md = result_md
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> list:
+        flight = self._flight
+        if flight is None:
+            raise StopIteration
+        batch = flight._next(self)
+        if batch is None:
+            self.result_md.update(flight.result_md)
+            self.close()
+            raise StopIteration
+        return batch
+
+    def close(self):
+        if self._flight is not None:
+            flight, self._flight = self._flight, None
+            flight._leave(self)
+
+
+# Flights which may be joined, by the key of their query
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+def get_flight(key, condition_factory: Callable):
+    """
+    Returns the flight of the query with the given key and a consumer of it,
+    waiting for its query to have been sent, or a new flight and None if
+    there is none to join. Flights are locked by a condition variable made
+    by condition_factory. A new flight is returned with its lock held, to
+    be released once its query has been sent and the flight started or
+    failed.
+    """
+    while True:
+        with _flights_lock:
+            flight = _flights.get(key)
+        if flight is None:
+            flight = Flight(key, condition_factory())
+            flight.lock.acquire()
+            with _flights_lock:
+                if key not in _flights:
+                    _flights[key] = flight
+                    return flight, None
+            # another cursor registered a flight first
+            flight.lock.release()
+            continue
+
+        with flight.lock:
+            consumer = flight.join()
+        if consumer is not None:
+            return flight, consumer
+        _unregister(flight)
+
+
+def _unregister(flight: Flight):
+    with _flights_lock:
+        if _flights.get(flight.key) is flight:
+            del _flights[flight.key]
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+Hedging of read-only queries, used by connections made with a
+hedge_percentile.
+
+A query which has not started to receive a response by the given
+percentile of the balancer's recent response header latencies is sent to a
+second drillbit too. Whichever response starts first is used and the query
+of the other attempt is cancelled once it has started to respond, which is
+when its query ID is known.
+"""
+import logging
+import re
+import threading
+from queue import Empty, Queue
+from typing import Callable
+
+from . import api_globals
+from ._balancer import Balancer, Drillbit
+from ._transport import HTTPResponse
+
+logger = logging.getLogger('drilldbapi')
+
+_QUERY_ID_PATTERN = re.compile(rb'"queryId"\s*:\s*"([^"]+)"')
+
+
+def post_hedged(balancer: Balancer, percentile: float,
+                post: Callable[[Drillbit], HTTPResponse],
+                cancel_query: Callable[[str, Drillbit], None]) -> HTTPResponse:
+    '''
+    Sends a query, by calling post with a drillbit acquired from the balancer, and, if it has
+    not started to respond by the hedging delay, to a second drillbit too. The first response
+    is returned and the query that sent the other is cancelled by calling cancel_query with
+    its ID and foreman. The attempts are listed in the response's attempts.
+    '''
+    outcomes = Queue()
+    attempts = []
+
+    def send(drillbit):
+        attempt = {'drillbit': drillbit.base_url, 'outcome': 'pending'}
+        attempts.append(attempt)
+
+        def post_attempt():
+            try:
+                outcomes.put((attempt, post(drillbit), None))
+            except Exception as ex:  # pylint: disable=broad-except
+                outcomes.put((attempt, None, ex))
+
+        threading.Thread(target=post_attempt, name='drill-hedge', daemon=True).start()
+
+    first = balancer.acquire()
+    send(first)
+    pending = 1
+    delay = balancer.hedge_delay(percentile)
+    try:
+        outcome = outcomes.get(timeout=delay)
+    except Empty:
+        second = balancer.acquire(exclude=first)
+        if second is not None:
+            logger.info(f'hedges a query on {second.base_url} after {delay:.3f} s.')
+            send(second)
+            pending += 1
+        outcome = outcomes.get()
+
+    error = None
+    while True:
+        attempt, resp, ex = outcome
+        pending -= 1
+        if resp is not None:
+            break
+        attempt['outcome'] = 'failed'
+        error = error or ex
+        if not pending:
+            raise error
+        outcome = outcomes.get()
+
+    attempt['outcome'] = 'chosen'
+    if pending:
+        for other in attempts:
+            if other['outcome'] == 'pending':
+                other['outcome'] = 'cancelled'
+        threading.Thread(
+            target=_cancel_hedge, args=(outcomes, cancel_query),
+            name='drill-hedge-cancel', daemon=True
+        ).start()
+
+    resp.attempts = attempts
+    return resp
+
+
+def _cancel_hedge(outcomes: Queue, cancel_query: Callable[[str, Drillbit], None]):
+    '''
+    Cancels the query of a hedged attempt which was not chosen, once it has started to
+    respond.
+    '''
+    attempt, resp, _ = outcomes.get()
+    if resp is None:
+        attempt['outcome'] = 'failed'
+        return
+
+    try:
+        head = resp.content if resp.consumed else resp.stream.read(api_globals._CHUNK_SIZE)
+        resp.close()
+        match = _QUERY_ID_PATTERN.search(head)
+        if match is None:
+            logger.warning('cannot cancel a hedged query without its ID.')
+            return
+        attempt['queryId'] = match.group(1).decode()
+        if not resp.consumed:
+            cancel_query(attempt['queryId'], resp.drillbit)
+    except Exception as ex:  # pylint: disable=broad-except
+        logger.warning(f'failed to cancel a hedged query: {ex}')
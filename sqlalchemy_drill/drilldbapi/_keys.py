@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+The keys by which query results are cached and queries in flight are
+shared, and the signatures of the files a query reads by which cached
+results are validated.
+
+A key identifies what a query reads, as whom and in which state of the
+connection's session: its normalized SQL, user, impersonation target,
+schema, session options, number decoding and query options. A signature
+lists the sizes and modification times which SHOW FILES gives for the
+files and directories of the tables the query names.
+"""
+import logging
+from typing import List
+
+from ._cache import normalize_sql, table_references
+from .api_exceptions import Error
+
+logger = logging.getLogger('drilldbapi')
+
+
+def cache_key(conn, query: str, options: dict = None) -> tuple:
+    '''Returns the result cache key of a query sent by the connection.'''
+    return (
+        normalize_sql(query),
+        conn._credentials[0] if conn._credentials else None,
+        conn._impersonation_target,
+        conn._schema,
+        conn._session_options,
+        conn._numbers,
+        tuple(sorted((options or {}).items())),
+    )
+
+
+def file_signature(conn, query: str, options: dict = None) -> tuple:
+    '''
+    Returns the sizes and modification times of the files and directories read by a query
+    sent by the connection. Tables which cannot be listed by SHOW FILES, such as views or
+    tables outside of file system plugins, are left out. Unqualified tables are resolved
+    against the schema that the query is sent with, that of its options or else the
+    connection's.
+    '''
+    default_schema = (options or {}).get('defaultSchema') or conn._schema
+    signature = []
+    for parts in table_references(query):
+        schema, path = parts[:-1], parts[-1].strip('/')
+        if not schema:
+            if not default_schema:
+                continue
+            schema = default_schema.split('.')
+
+        parent, _, name = path.rpartition('/')
+        listing = _listing(conn, schema, parent)
+        if listing is None:
+            continue
+        entry = listing.get(name)
+        if entry is not None and entry[0]:
+            # a directory, whose files are listed too
+            files = _listing(conn, schema, path)
+            entry = (entry, tuple(sorted(files.items())) if files else files)
+        signature.append(('.'.join(parts), entry))
+
+    return tuple(signature)
+
+
+def _listing(conn, schema: List[str], path: str) -> dict:
+    '''
+    Returns the (is directory, length, modification time) of each entry of a directory by
+    name, from SHOW FILES, or None if it cannot be listed. Listings are cached briefly by
+    the connection's result cache.
+    '''
+    target = '.'.join(f'`{p}`' for p in schema + ([path] if path else []))
+    key = (
+        conn._credentials[0] if conn._credentials else None,
+        conn._impersonation_target,
+        target,
+    )
+    return conn.result_cache.listing(
+        key, conn._probe_ttl, lambda: _show_files(conn, target)
+    )
+
+
+def _show_files(conn, target: str) -> dict:
+    cursor = conn.cursor()
+    cursor.use_cache = False
+    try:
+        cursor.execute(f'SHOW FILES IN {target}')
+        names = cursor.get_column_names()
+        rows = cursor.fetchall()
+    except Error as ex:
+        logger.debug(f'could not list {target}: {ex}')
+        return None
+    finally:
+        cursor.close()
+
+    name, is_dir, length, mtime = (
+        names.index(c) for c in ('name', 'isDirectory', 'length', 'modificationTime')
+    )
+    return {
+        row[name]: (bool(row[is_dir]), row[length], str(row[mtime]))
+        for row in rows
+    }
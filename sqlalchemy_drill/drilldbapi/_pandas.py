@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+Builds pandas DataFrames from the row data batches decoded by the Cursor,
+using column dtypes derived from the Drill column types. This module is only
+imported on demand because pandas is an optional dependency, installable with
+the pandas extra.
+"""
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+_NAT = np.iinfo(np.int64).min
+
+
+def _ticks_array(values: list) -> np.ndarray:
+    """Returns Unix times in ms, None for nulls, as a datetime64[ms] array."""
+    return np.array(
+        [_NAT if v is None else v for v in values], dtype=np.int64
+    ).view('datetime64[ms]')
+
+
+def _first_value(values: list):
+    return next((v for v in values if v is not None), None)
+
+
+def _datetime_array(values: list) -> np.ndarray:
+    """
+    Returns dates or timestamps as a datetime64[ms] array, from Unix times in
+    ms or from the ISO 8601 strings which Drill < 1.19 sends.
+    """
+    if isinstance(_first_value(values), str):
+        return pd.to_datetime(values, format='ISO8601').to_numpy().astype('datetime64[ms]')
+    return _ticks_array(values)
+
+
+def _int_array(values: list, numpy_dtype: str, nullable_dtype: str):
+    if None in values:
+        return pd.array(values, dtype=nullable_dtype)
+    return np.array(values, dtype=numpy_dtype)
+
+
+def _float_array(values: list, dtype: str) -> np.ndarray:
+    # nulls become NaN
+    return np.array(values, dtype=dtype)
+
+
+def _bool_array(values: list):
+    if isinstance(_first_value(values), str):
+        values = [None if v is None else v == 'true' for v in values]
+    if None in values:
+        return pd.array(values, dtype='boolean')
+    return np.array(values, dtype=bool)
+
+
+# Converters of raw values to arrays of a fixed dtype, by Drill column type.
+# Integer columns with nulls use the nullable integer dtypes.
+_CONVERTERS = {
+    'TINYINT': partial(_int_array, numpy_dtype='int8', nullable_dtype='Int8'),
+    'SMALLINT': partial(_int_array, numpy_dtype='int16', nullable_dtype='Int16'),
+    'INT': partial(_int_array, numpy_dtype='int32', nullable_dtype='Int32'),
+    'BIGINT': partial(_int_array, numpy_dtype='int64', nullable_dtype='Int64'),
+    'FLOAT4': partial(_float_array, dtype='float32'),
+    'FLOAT8': partial(_float_array, dtype='float64'),
+    'BIT': _bool_array,
+    'DATE': _datetime_array,
+    'TIMESTAMP': _datetime_array,
+}
+
+
+def column_values(values: list, col_type: str = None, typecaster=None):
+    """
+    Returns the raw (not typecast) values of a column of the given Drill type
+    in a form with a fixed dtype where one is known, otherwise typecast by the
+    given column typecaster. The strings which Drill < 1.19 sends for the
+    values of every column are parsed where the dtype requires it.
+    """
+    convert = _CONVERTERS.get(col_type)
+    if convert is not None:
+        return convert(values)
+    if typecaster is not None:
+        return typecaster(values)
+    return values
+
+
+def frame(columns: list, names: list, col_types: list, typecasters: list) -> pd.DataFrame:
+    """Returns a DataFrame of the given columns of raw values."""
+    return pd.DataFrame({
+        name: column_values(col, t, cast)
+        for name, col, t, cast in zip(names, columns, col_types, typecasters)
+    }, columns=names)
@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+"""
+Decoding of the JSON query results of the Drill REST API.
+
+Results are either decoded in one pass or parsed incrementally with ijson,
+reading the response body through a ResponseStreamWrapper. The rows array
+of an incrementally parsed result is decoded into batches of columns by
+_column_batches, without building an object per row.
+"""
+import io
+import logging
+import re
+from decimal import Decimal
+from json import loads
+
+import ijson
+from ijson.common import ObjectBuilder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from . import api_globals
+from ._transport import HTTPResponse
+
+logger = logging.getLogger('drilldbapi')
+
+_METADATA_PATTERN = re.compile(rb'"metadata"\s*:\s*(\[[^\]]*\])')
+
+
+def _load_ijson_backend():
+    """Returns the first ijson backend in api_globals._IJSON_BACKENDS that can be loaded."""
+    for name in api_globals._IJSON_BACKENDS:
+        try:
+            backend = ijson.get_backend(name)
+        except ImportError:
+            logger.debug(f'could not load the ijson {name} backend.')
+            continue
+
+        if name == 'python':
+            logger.warning(
+                'falls back to the pure Python ijson backend, install the '
+                'yajl2 C library for much faster result parsing.'
+            )
+        logger.debug(f'parses JSON using the ijson {name} backend.')
+        return backend
+
+    raise ImportError('No ijson backend could be loaded.')
+
+
+_ijson_backend = _load_ijson_backend()
+
+
+class ResponseStreamWrapper(io.RawIOBase):
+    """
+    A file-like reader over the decoded body stream of an HTTP response.
+
+    Data is pulled from the socket in reads of up to chunk_size bytes which
+    are handed on to the caller (ijson) whole, rather than byte by byte.
+    Responses whose content has already been consumed, e.g. when streaming
+    was disabled, are served from the buffered content instead.
+    """
+
+    def __init__(self, resp: HTTPResponse, chunk_size: int = api_globals._CHUNK_SIZE):
+        super().__init__()
+        self.chunk_size = chunk_size
+        self.bytes_read = 0
+        # bytes read from the source ahead of the caller, served from _peeked_pos on
+        self._peeked = b''
+        self._peeked_pos = 0
+
+        if resp.consumed:
+            self._source = io.BytesIO(resp.content)
+        else:
+            self._source = resp.stream
+
+    def readable(self):
+        return True
+
+    def peek(self) -> bytes:
+        """
+        Returns up to chunk_size bytes from the start of the stream, or all that read_ahead
+        read, without consuming them.
+        """
+        if not self._peeked and not self.bytes_read:
+            self._peeked = self._source.read(self.chunk_size)
+            self.bytes_read += len(self._peeked)
+        return self._peeked[self._peeked_pos:]
+
+    def read_ahead(self, limit: int) -> bool:
+        """
+        Reads the start of the stream, in reads of chunk_size bytes until it ends or more
+        than limit bytes have been read, without consuming it. Returns whether the stream
+        ended within the limit, in which case peek() returns all of it.
+        """
+        chunks = [self.peek()]
+        size = len(chunks[0])
+        ended = False
+        while size <= limit:
+            data = self._source.read(self.chunk_size)
+            if not data:
+                ended = True
+                break
+            chunks.append(data)
+            size += len(data)
+            self.bytes_read += len(data)
+
+        self._peeked = b''.join(chunks)
+        self._peeked_pos = 0
+        return ended
+
+    def _read_peeked(self, n: int) -> bytes:
+        pos = self._peeked_pos
+        data = self._peeked[pos:pos + n]
+        self._peeked_pos += len(data)
+        if self._peeked_pos == len(self._peeked):
+            self._peeked = b''
+            self._peeked_pos = 0
+        return data
+
+    def readinto(self, b) -> int:
+        if self._peeked:
+            data = self._read_peeked(len(b))
+            b[:len(data)] = data
+            return len(data)
+
+        n = self._source.readinto(b)
+        self.bytes_read += n
+        return n
+
+    def read(self, n=-1) -> bytes:
+        if self._peeked:
+            if n is None or n < 0:
+                data = self._read_peeked(len(self._peeked))
+                return data + self.read()
+            return self._read_peeked(n)
+
+        if n is None or n < 0:
+            data = self._source.read()
+        else:
+            data = self._source.read(min(n, self.chunk_size))
+        self.bytes_read += len(data)
+        return data
+
+
+def _items_once(event_stream, prefix):
+    '''
+    Generator dispatching native Python objects constructed from the ijson events under the next
+    occurrence of the given prefix.  It is similar similar to ijson.items except that it will
+    not consume the entire JSON stream looking for occurrences of prefix, but rather stop after
+    completing the current occurrence of prefix.  The need for this behaviour is what precluded
+    the use of ijson.items instead.
+    '''
+
+    try:
+        current, event, value = next(event_stream)
+    except StopIteration:
+        return  # see PEP-479
+
+    while current == prefix:
+        if event in ('start_map', 'start_array'):
+            object_depth = 1
+            builder = ObjectBuilder()
+            while object_depth:
+                try:
+                    builder.event(event, value)
+                    current, event, value = next(event_stream)
+                    if event in ('start_map', 'start_array'):
+                        object_depth += 1
+                    elif event in ('end_map', 'end_array'):
+                        object_depth -= 1
+                except StopIteration:
+                    return  # see PEP-479
+            del builder.containers[:]
+            yield builder.value
+        else:
+            yield value
+
+        try:
+            current, event, value = next(event_stream)
+        except StopIteration:
+            return  # see PEP-479
+
+    logger.debug(f'finished parsing one occurrence of {prefix}')
+
+
+def _build_value(event_stream, event, value):
+    '''
+    Returns the native Python object for a JSON value that starts with the given event,
+    consuming the remaining events of nested maps and arrays from the event stream.
+    '''
+    if event not in ('start_map', 'start_array'):
+        return value
+
+    object_depth = 1
+    builder = ObjectBuilder()
+    builder.event(event, value)
+    while object_depth:
+        _, event, value = next(event_stream)
+        if event in ('start_map', 'start_array'):
+            object_depth += 1
+        elif event in ('end_map', 'end_array'):
+            object_depth -= 1
+        builder.event(event, value)
+
+    return builder.value
+
+
+def _column_batches(event_stream, columns, batch_rows: int = api_globals._BATCH_ROWS):
+    '''
+    Generator dispatching batches of up to batch_rows rows from the rows array, the start_array
+    event of which must already have been consumed.  Each batch is a list of columns in the
+    order of the given column names, and each column a list of values.  Values are written
+    straight to their position in their column without building an intermediate object per
+    row.  Stops after consuming the end_array event of the rows array.
+    '''
+    col_index = {col: i for i, col in enumerate(columns)}
+    n_cols = len(columns)
+    batch = [[None] * batch_rows for _ in range(n_cols)]
+    r = -1
+
+    try:
+        for _, event, value in event_stream:
+            if event == 'map_key':
+                col = value
+                _, event, value = next(event_stream)
+                if event in ('start_map', 'start_array'):
+                    value = _build_value(event_stream, event, value)
+
+                i = col_index.get(col)
+                if i is None:
+                    logger.warning(f'discards a value for unknown column {col}.')
+                    continue
+
+                batch[i][r] = value
+            elif event == 'start_map':
+                r += 1
+            elif event == 'end_map':
+                if r + 1 == batch_rows:
+                    yield batch
+                    batch = [[None] * batch_rows for _ in range(n_cols)]
+                    r = -1
+            elif event == 'end_array':
+                break
+    except StopIteration:
+        return  # see PEP-479
+
+    if r >= 0:
+        yield [col[:r + 1] for col in batch]
+
+    logger.debug('finished parsing the row data.')
+
+
+
+def _loads(content: bytes, numbers: str):
+    '''Decodes a JSON document with non-integers decoded as Decimal or as float.'''
+    if numbers == 'decimal':
+        return loads(content, parse_float=Decimal)
+
+    if orjson is not None:
+        try:
+            return orjson.loads(content)
+        except orjson.JSONDecodeError as ex:
+            # e.g. integers beyond 64 bits
+            logger.debug(f'falls back to json after orjson failed with {ex}.')
+
+    return loads(content)
+
+
+
+def _leading_metadata(head: bytes):
+    '''
+    Returns the column types from the metadata array in the given start of a query result if
+    it precedes any row data, otherwise None.
+    '''
+    match = _METADATA_PATTERN.search(head)
+    if match is None:
+        return None
+
+    rows_at = head.find(b'"rows"')
+    if rows_at != -1 and rows_at < match.start():
+        return None
+
+    try:
+        return loads(match.group(1))
+    except ValueError:
+        return None
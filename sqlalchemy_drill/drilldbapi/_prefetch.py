@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+Prefetching of row data batches, used by cursors with a prefetch of more
+than 0 batches.
+"""
+import logging
+import threading
+from queue import Empty, Full, Queue
+
+from . import api_globals
+
+logger = logging.getLogger('drilldbapi')
+
+
+class RowPrefetcher:
+    """
+    Drives a stream of row data batches on a background thread, handing them
+    over to the consuming thread through a bounded queue. The producer blocks
+    when max_batches are waiting, and any exception it encounters is re-raised
+    in the consumer.
+    """
+
+    _END = object()
+
+    def __init__(self, batch_stream, max_batches: int):
+        self._batch_stream = batch_stream
+        self._queue = Queue(maxsize=max_batches)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._produce, name='drilldbapi-prefetch', daemon=True
+        )
+        self._thread.start()
+        logger.debug(f'started prefetching up to {max_batches} row batches.')
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=api_globals._PREFETCH_POLL_S)
+                return
+            except Full:
+                continue
+
+    def _produce(self):
+        try:
+            for batch in self._batch_stream:
+                if self._stop.is_set():
+                    break
+                self._put(batch)
+            self._put(self._END)
+        except Exception as ex:  # pylint: disable=broad-except
+            logger.debug(f'prefetch thread encountered {ex}.')
+            self._put(ex)
+
+    def batches(self):
+        """Generator dispatching the prefetched batches in order."""
+        while True:
+            item = self._queue.get()
+            if item is self._END:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    def close(self):
+        """
+        Stops the producer thread, waiting for it to finish its current batch.
+        A producer blocked reading the response must first be woken by
+        interrupting the response.
+        """
+        self._stop.set()
+        while True:
+            try:
+                self._queue.get_nowait()
+            except Empty:
+                break
+
+        self._thread.join(api_globals._PREFETCH_JOIN_TIMEOUT_S)
+        if self._thread.is_alive():
+            logger.warning('prefetch thread did not stop, abandoning it.')
+        else:
+            logger.debug('stopped prefetching.')
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+Retries of read-only queries which failed transiently.
+
+A query fails transiently if its drillbit could not be reached, responded
+with one of api_globals._RETRY_STATUSES, or reported an error such as that
+of a drillbit shutting down. Read-only queries, which may safely be run
+twice, are retried after a backoff with full jitter, while the balancer's
+retry budget allows and its circuit breaker is closed.
+"""
+import logging
+import random
+import re
+from typing import Callable
+
+from . import api_globals
+from ._balancer import Balancer
+from ._transport import HTTPResponse
+from .api_exceptions import DatabaseError, Error, OperationalError
+
+logger = logging.getLogger('drilldbapi')
+
+# Queries which may safely be run twice, as retried and hedged queries are
+_READ_ONLY_PATTERN = re.compile(
+    r'^[\s(]*(select|with|values|show|describe|desc|explain)\b', re.IGNORECASE
+)
+
+# Drill errors of queries which failed through no fault of their own, e.g.
+# because a drillbit shut down or lost contact with the foreman
+_TRANSIENT_ERROR_PATTERN = re.compile(
+    r'CONNECTION ERROR|Drillbit down|shutting down|ForemanException|'
+    r'ForemanSetupException|Foreman .* (lost|died)',
+    re.IGNORECASE
+)
+
+
+def send_with_retries(send: Callable[[], HTTPResponse], balancer: Balancer, retries: int,
+                      backoff: float, sleep: Callable[[float], None]) -> HTTPResponse:
+    '''
+    Sends a query by calling send until it returns a response with status 200, which is
+    returned, retrying up to retries times after transient failures. The nth retry sleeps
+    for a random time of up to backoff * 2 ** (n - 1) seconds. Other failures, and the last
+    transient one, are raised as DatabaseError or OperationalError.
+    '''
+    retry = 0
+    while True:
+        try:
+            resp = send()
+        except OperationalError as ex:
+            error = ex
+        else:
+            if resp.status_code == 200:
+                balancer.record_outcome(True)
+                return resp
+
+            try:
+                error = DatabaseError(_error_message(resp), resp.status_code)
+            finally:
+                resp.close()
+            if not _is_transient(error):
+                raise error
+
+        if balancer.circuit_open():
+            # fail fast rather than retry while Drill is unreachable
+            raise error
+        balancer.record_outcome(False)
+        if retry >= retries or not balancer.allows_retry():
+            raise error
+
+        # full jitter keeps clients which failed together from retrying together
+        delay = random.uniform(
+            0, min(backoff * 2 ** retry, api_globals._RETRY_BACKOFF_MAX_S)
+        )
+        retry += 1
+        logger.warning(
+            f'retries a query in {delay:.3f} s ({retry} of {retries}) '
+            f'after: {error.message}'
+        )
+        sleep(delay)
+
+
+def _error_message(resp: HTTPResponse) -> str:
+    '''Returns the error message of a failed query's response.'''
+    try:
+        return resp.json().get('errorMessage', None)
+    except ValueError:
+        # e.g. an HTML error page from a proxy
+        return resp.text.strip()[:200] or None
+
+
+def _is_transient(error: Error) -> bool:
+    '''Returns whether a query which raised the error may succeed if retried.'''
+    if isinstance(error, OperationalError):
+        return True
+    if error.httperror in api_globals._RETRY_STATUSES:
+        return True
+    return bool(error.message) and _TRANSIENT_ERROR_PATTERN.search(error.message) is not None
@@ -0,0 +1,739 @@
+# -*- coding: utf-8 -*-
+"""
+HTTP transports beneath the Connection.
+
+A transport POSTs queries and login forms to a drillbit and returns an
+HTTPResponse, which exposes the body as a decoded, file-like stream so that
+the Cursor does not depend on any one HTTP client library. Transports are
+safe to use from several threads at once and keep up to pool_maxsize
+connections to the drillbit open for reuse.
+
+Streamed query results are requested with gzip or deflate content encoding
+unless compression is disabled, and are decompressed incrementally as they
+are read, see _BodyReader.
+
+- Urllib3Transport: a urllib3 PoolManager used directly, the default. It
+  avoids the per request overhead of requests' hooks, cookie jar merging and
+  header building, and keeps its own cookies under a lock.
+- RequestsTransport: a requests Session. Sessions are not documented to be
+  thread-safe, so its requests are sent one at a time.
+- HttpxTransport: an httpx Client, using HTTP/2 if the h2 package is
+  installed so that concurrent queries can share one TLS connection.
+- AsyncHttpxTransport: an httpx AsyncClient, for connections used from
+  asyncio, see _async.
+"""
+import abc
+import asyncio
+import functools
+import io
+import logging
+import socket
+import threading
+import time
+import zlib
+from http.cookies import SimpleCookie
+from json import dumps, loads
+from urllib.parse import urlencode, urljoin, urlsplit
+
+import urllib3
+import requests
+from requests import Response, Session
+from requests.adapters import HTTPAdapter
+from sqlalchemy.util import await_only
+
+from . import api_globals
+from .api_exceptions import DatabaseError, NotSupportedError, OperationalError, ProgrammingError
+
+logger = logging.getLogger('drilldbapi')
+
+# zlib wbits of the content encodings decompressed by _BodyReader
+_WBITS = {
+    'gzip': 16 + zlib.MAX_WBITS,
+    'x-gzip': 16 + zlib.MAX_WBITS,
+    'deflate': zlib.MAX_WBITS,
+}
+
+
+class _BodyReader(io.RawIOBase):
+    """
+    A file-like reader over the raw bytes of a response body, decompressing
+    them incrementally if they are gzip or deflate encoded. Counts the bytes
+    received and the bytes decoded from them.
+    """
+
+    def __init__(self, raw, wbits: int = None):
+        super().__init__()
+        self._raw = raw
+        self._wbits = wbits
+        self._decompressor = None if wbits is None else zlib.decompressobj(wbits)
+        self._pending = memoryview(b'')
+        self.bytes_received = 0
+        self.bytes_decoded = 0
+
+    def readable(self):
+        return True
+
+    def _decompress(self, data: bytes) -> bytes:
+        try:
+            return self._decompressor.decompress(data)
+        except zlib.error as ex:
+            if self._wbits == zlib.MAX_WBITS and self.bytes_received == len(data):
+                # deflate is often sent without the zlib header
+                self._wbits = -zlib.MAX_WBITS
+                self._decompressor = zlib.decompressobj(self._wbits)
+                return self._decompress(data)
+            raise DatabaseError(f'Could not decompress the response: {ex}', None) from ex
+
+    def readinto(self, b) -> int:
+        if not b:
+            # e.g. ijson's zero length read, which must not be taken for EOF
+            return 0
+
+        if self._wbits is None:
+            n = self._raw.readinto(b) or 0
+            self.bytes_received += n
+            self.bytes_decoded += n
+            return n
+
+        while not self._pending:
+            if self._decompressor is None:
+                return 0
+
+            data = self._raw.read(len(b))
+            self.bytes_received += len(data)
+            if data:
+                self._pending = memoryview(self._decompress(data))
+            else:
+                self._pending = memoryview(self._decompressor.flush())
+                if not self._decompressor.eof:
+                    raise DatabaseError('The compressed response ended early.', None)
+                self._decompressor = None
+
+        n = min(len(b), len(self._pending))
+        b[:n] = self._pending[:n]
+        self._pending = self._pending[n:]
+        self.bytes_decoded += n
+        return n
+
+
+class HTTPResponse:
+    """
+    The parts of an HTTP response used by the Connection and Cursor, common to
+    all transports. The body is either available as a decoded stream to be
+    read incrementally or, if it has already been read, as content. Transports
+    pass streams of the raw, possibly compressed, body, or the decoded content
+    together with the number of bytes received for it if they know it.
+    """
+
+    def __init__(self, status_code: int, headers, *, stream=None,
+                 content: bytes = None, bytes_received: int = None,
+                 close=None, interrupt=None):
+        self.status_code = status_code
+        self.headers = headers
+        # the drillbit which sent the response, set by the Connection
+        self.drillbit = None
+        # the attempts of a hedged query, set by the Connection
+        self.attempts = None
+        self._content = content
+        self._bytes_received = bytes_received
+        self._close = close
+        self._interrupt = interrupt
+        self._close_callbacks = []
+
+        if stream is not None:
+            encoding = headers.get('Content-Encoding', 'identity').lower()
+            if encoding != 'identity' and encoding not in _WBITS:
+                self.close()
+                raise NotSupportedError(
+                    f'Unsupported response content encoding {encoding}.', None
+                )
+            stream = _BodyReader(stream, _WBITS.get(encoding))
+        self.stream = stream
+
+    @property
+    def bytes_received(self) -> int:
+        """
+        The number of bytes of the body received so far, before decoding, or
+        None if it is not known. That of a compressed body which was decoded by
+        the HTTP client library without a Content-Length is not.
+        """
+        if self.stream is not None:
+            return self.stream.bytes_received
+        if self._bytes_received is not None:
+            return self._bytes_received
+        if 'Content-Length' in self.headers:
+            return int(self.headers['Content-Length'])
+        if self.headers.get('Content-Encoding', 'identity').lower() == 'identity':
+            return len(self._content)
+        return None
+
+    @property
+    def bytes_decoded(self) -> int:
+        """The number of bytes of the body decoded so far."""
+        if self.stream is not None:
+            return self.stream.bytes_decoded
+        return len(self._content)
+
+    @property
+    def consumed(self) -> bool:
+        """Whether the body has already been read into content."""
+        return self._content is not None
+
+    @property
+    def content(self) -> bytes:
+        if self._content is None:
+            self._content = self.stream.read()
+            self.close()
+        return self._content
+
+    @property
+    def text(self) -> str:
+        return self.content.decode('utf-8', errors='replace')
+
+    def json(self):
+        return loads(self.content)
+
+    def interrupt(self):
+        """
+        Shuts down the connection of a response which is still open, so that
+        a read of the body blocked in another thread returns at once instead
+        of waiting for the drillbit to send more. Closing the response does
+        not wake such a read. The response must still be closed.
+        """
+        if self._interrupt is None or self._close is None:
+            return
+        try:
+            self._interrupt()
+        except OSError as ex:
+            logger.debug(f'failed to interrupt a response: {ex}')
+
+    def add_close_callback(self, callback):
+        """Registers a function to be called once the response is closed."""
+        self._close_callbacks.append(callback)
+
+    def close(self):
+        """
+        Releases the underlying connection. The connection is returned to its
+        pool if the body was read to the end, otherwise it is closed, aborting
+        the transfer of the rest of the body.
+        """
+        if self._close is not None:
+            self._close()
+            self._close = None
+
+        callbacks, self._close_callbacks = self._close_callbacks, []
+        for callback in callbacks:
+            callback()
+
+
+def _json_headers(compression: bool) -> dict:
+    return {
+        **api_globals._HEADER,
+        'Accept-Encoding': api_globals._ACCEPT_ENCODING if compression else 'identity'
+    }
+
+
+def _raises_operational_error(method):
+    """
+    Decorates a transport method to raise OperationalError when the drillbit
+    cannot be reached, in place of the HTTP client library's own exceptions.
+    """
+
+    @functools.wraps(method)
+    def wrapper(self, url, *args, **kwargs):
+        try:
+            return method(self, url, *args, **kwargs)
+        except self.connection_errors as ex:
+            raise OperationalError(f'Could not reach {url}: {ex}', None) from ex
+
+    return wrapper
+
+
+class Transport(abc.ABC):
+    """
+    Base class of the HTTP transports beneath a Connection. Methods raise
+    OperationalError if the drillbit cannot be reached.
+    """
+
+    # the HTTP client library's exceptions for failing to reach a server
+    connection_errors = ()
+    # whether requests block the calling thread, rather than being awaited
+    # on an event loop, and so may be sent from threads of their own
+    blocking = True
+
+    @abc.abstractmethod
+    def post_json(self, url: str, payload: dict, stream: bool = False) -> HTTPResponse:
+        """POSTs a JSON payload, leaving the body unread if stream is True."""
+
+    @abc.abstractmethod
+    def post_form(self, url: str, fields: dict) -> HTTPResponse:
+        """POSTs a form, following redirects."""
+
+    @abc.abstractmethod
+    def get(self, url: str) -> HTTPResponse:
+        """GETs a URL, following redirects."""
+
+    @abc.abstractmethod
+    def close(self):
+        """Closes the connections kept open for reuse."""
+
+    def sleep(self, seconds: float):
+        """Waits for the given time without sending any requests."""
+        time.sleep(seconds)
+
+    def lock(self):
+        """Returns a lock which may be held while requests are sent."""
+        return threading.Lock()
+
+    def condition(self):
+        """Returns a condition variable whose lock may be held while requests are sent."""
+        return threading.Condition()
+
+
+def wrap_requests_response(resp: Response) -> HTTPResponse:
+    """Returns an HTTPResponse over a requests Response."""
+    if resp.raw is None or resp._content_consumed:
+        return HTTPResponse(resp.status_code, resp.headers, content=resp.content)
+
+    # The body is decoded by the HTTPResponse rather than by urllib3
+    resp.raw.decode_content = False
+    return HTTPResponse(
+        resp.status_code, resp.headers, stream=resp.raw, close=resp.close,
+        interrupt=getattr(resp.raw, 'shutdown', None)
+    )
+
+
+class RequestsTransport(Transport):
+    """
+    A transport using a requests Session. Requests does not promise that a
+    Session, whose cookie jar and adapters every request reads and updates,
+    may be used from several threads at once, so requests are sent one at a
+    time under a lock, which is held until the response headers have been
+    received. Streamed bodies are read without it.
+    """
+
+    connection_errors = (requests.ConnectionError, requests.Timeout)
+
+    def __init__(self, session: Session = None, verify_ssl: bool = False,
+                 pool_maxsize: int = api_globals._POOL_MAXSIZE,
+                 compression: bool = True):
+        self._json_headers = _json_headers(compression)
+        if session is None:
+            session = Session()
+            session.verify = verify_ssl
+            adapter = HTTPAdapter(pool_maxsize=pool_maxsize)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        self.session = session
+        self._session_lock = threading.Lock()
+
+    @_raises_operational_error
+    def post_json(self, url, payload, stream=False):
+        with self._session_lock:
+            resp = self.session.post(
+                url,
+                data=dumps(payload),
+                headers=self._json_headers,
+                timeout=None,
+                stream=stream
+            )
+        return wrap_requests_response(resp)
+
+    @_raises_operational_error
+    def post_form(self, url, fields):
+        with self._session_lock:
+            resp = self.session.post(url, data=fields)
+        return wrap_requests_response(resp)
+
+    @_raises_operational_error
+    def get(self, url):
+        with self._session_lock:
+            resp = self.session.get(url)
+        return wrap_requests_response(resp)
+
+    def close(self):
+        with self._session_lock:
+            self.session.close()
+
+
+def _release_urllib3(resp: urllib3.HTTPResponse):
+    # A connection with an unread body cannot be reused
+    if not resp.closed:
+        resp.close()
+    resp.release_conn()
+
+
+class Urllib3Transport(Transport):
+    """
+    A transport using a urllib3 PoolManager directly. Cookies, such as the
+    session cookie set by a form login, are kept by the transport itself for
+    each host and port.
+    """
+
+    connection_errors = (
+        urllib3.exceptions.MaxRetryError,
+        urllib3.exceptions.ProtocolError,
+        urllib3.exceptions.TimeoutError,
+    )
+
+    def __init__(self, verify_ssl: bool = False,
+                 pool_manager: urllib3.PoolManager = None,
+                 pool_maxsize: int = api_globals._POOL_MAXSIZE,
+                 compression: bool = True):
+        if pool_manager is None:
+            pool_manager = urllib3.PoolManager(
+                maxsize=pool_maxsize,
+                cert_reqs='CERT_REQUIRED' if verify_ssl else 'CERT_NONE'
+            )
+        self._pool = pool_manager
+        self._cookies = {}
+        self._cookie_lock = threading.Lock()
+        self._json_headers = _json_headers(compression)
+
+    def _headers(self, url: str, headers: dict) -> dict:
+        with self._cookie_lock:
+            cookies = self._cookies.get(urlsplit(url).netloc)
+            if not cookies:
+                return headers
+            cookie = '; '.join(f'{k}={v}' for k, v in cookies.items())
+
+        return {**headers, 'Cookie': cookie}
+
+    def _save_cookies(self, url: str, resp: urllib3.HTTPResponse):
+        for header in resp.headers.getlist('Set-Cookie'):
+            with self._cookie_lock:
+                cookies = self._cookies.setdefault(urlsplit(url).netloc, {})
+                for name, morsel in SimpleCookie(header).items():
+                    cookies[name] = morsel.value
+
+    def _request(self, method: str, url: str, body, headers: dict,
+                 stream: bool) -> HTTPResponse:
+        for _ in range(api_globals._MAX_REDIRECTS + 1):
+            resp = self._pool.request(
+                method,
+                url,
+                body=body,
+                headers=self._headers(url, headers),
+                preload_content=not stream,
+                # streamed bodies are decoded by the HTTPResponse
+                decode_content=not stream,
+                redirect=False,
+                timeout=None
+            )
+            self._save_cookies(url, resp)
+
+            location = resp.get_redirect_location()
+            if not location:
+                break
+
+            logger.debug(f'follows a redirect to {location}.')
+            resp.drain_conn()
+            resp.release_conn()
+            url = urljoin(url, location)
+            if resp.status in (301, 302, 303):
+                method, body, headers = 'GET', None, {}
+
+        if stream:
+            return HTTPResponse(
+                resp.status, resp.headers, stream=resp,
+                close=lambda: _release_urllib3(resp),
+                # urllib3 >= 2.3
+                interrupt=getattr(resp, 'shutdown', None)
+            )
+
+        return HTTPResponse(
+            resp.status, resp.headers, content=resp.data, bytes_received=resp.tell()
+        )
+
+    @_raises_operational_error
+    def post_json(self, url, payload, stream=False):
+        return self._request(
+            'POST', url, dumps(payload).encode(), self._json_headers, stream
+        )
+
+    @_raises_operational_error
+    def post_form(self, url, fields):
+        return self._request(
+            'POST',
+            url,
+            urlencode(fields).encode(),
+            {'Content-Type': 'application/x-www-form-urlencoded'},
+            False
+        )
+
+    @_raises_operational_error
+    def get(self, url):
+        return self._request('GET', url, None, {}, False)
+
+    def close(self):
+        self._pool.clear()
+
+
+class _ChunkReader(io.RawIOBase):
+    """A file-like reader over an iterator of byte chunks."""
+
+    def __init__(self, chunks):
+        super().__init__()
+        self._chunks = chunks
+        self._pending = memoryview(b'')
+
+    def readable(self):
+        return True
+
+    def readinto(self, b) -> int:
+        while not self._pending:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return 0
+            self._pending = memoryview(chunk)
+
+        n = min(len(b), len(self._pending))
+        b[:n] = self._pending[:n]
+        self._pending = self._pending[n:]
+        return n
+
+
+def _httpx_interrupt(resp):
+    """
+    Returns a function shutting down the socket of an httpx response, or None
+    if the response is multiplexed over HTTP/2 with others sharing the socket.
+    """
+    stream = resp.extensions.get('network_stream')
+    if resp.http_version != 'HTTP/1.1' or stream is None:
+        return None
+    sock = stream.get_extra_info('socket')
+    if sock is None:
+        return None
+    return lambda: sock.shutdown(socket.SHUT_RDWR)
+
+
+class HttpxTransport(Transport):
+    """
+    A transport using an httpx Client, with HTTP/2 if the h2 package is
+    installed. httpx is an optional dependency, installable with the httpx
+    extra.
+    """
+
+    def __init__(self, verify_ssl: bool = False, client=None,
+                 pool_maxsize: int = api_globals._POOL_MAXSIZE,
+                 compression: bool = True):
+        import httpx  # pylint: disable=import-outside-toplevel
+
+        self._json_headers = _json_headers(compression)
+        self.connection_errors = (httpx.TransportError,)
+        if client is None:
+            limits = httpx.Limits(
+                max_connections=pool_maxsize,
+                max_keepalive_connections=pool_maxsize
+            )
+            try:
+                client = httpx.Client(
+                    verify=verify_ssl, http2=True, limits=limits, timeout=None
+                )
+            except ImportError:
+                logger.info('uses HTTP/1.1 because the h2 package is not installed.')
+                client = httpx.Client(verify=verify_ssl, limits=limits, timeout=None)
+        self._client = client
+
+    @_raises_operational_error
+    def post_json(self, url, payload, stream=False):
+        req = self._client.build_request(
+            'POST', url, content=dumps(payload).encode(), headers=self._json_headers
+        )
+        resp = self._client.send(req, stream=stream)
+
+        if stream:
+            return HTTPResponse(
+                resp.status_code, resp.headers,
+                stream=_ChunkReader(resp.iter_raw()), close=resp.close,
+                interrupt=_httpx_interrupt(resp)
+            )
+
+        return HTTPResponse(
+            resp.status_code, resp.headers, content=resp.content,
+            bytes_received=resp.num_bytes_downloaded
+        )
+
+    @_raises_operational_error
+    def post_form(self, url, fields):
+        resp = self._client.post(url, data=fields, follow_redirects=True)
+        return HTTPResponse(
+            resp.status_code, resp.headers, content=resp.content,
+            bytes_received=resp.num_bytes_downloaded
+        )
+
+    @_raises_operational_error
+    def get(self, url):
+        resp = self._client.get(url, follow_redirects=True)
+        return HTTPResponse(
+            resp.status_code, resp.headers, content=resp.content,
+            bytes_received=resp.num_bytes_downloaded
+        )
+
+    def close(self):
+        self._client.close()
+
+
+class _AwaitedChunks:
+    """An iterator over the chunks of an async iterator, awaiting each one."""
+
+    def __init__(self, chunks):
+        self._chunks = chunks
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> bytes:
+        try:
+            return await_only(self._chunks.__anext__())
+        except StopAsyncIteration:
+            raise StopIteration from None
+
+
+class _AwaitedLock:
+    """
+    A lock for code run in greenlets on an event loop, which waits for the
+    lock by awaiting it rather than by blocking the loop's thread.
+    """
+
+    def __init__(self):
+        self._lock = asyncio.Lock()
+
+    def acquire(self):
+        await_only(self._lock.acquire())
+
+    def release(self):
+        self._lock.release()
+
+    def __enter__(self):
+        self.acquire()
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+class _AwaitedCondition(_AwaitedLock):
+    """
+    A condition variable for code run in greenlets on an event loop, which
+    also waits to be notified by awaiting rather than blocking.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._condition = asyncio.Condition(self._lock)
+
+    def wait(self):
+        await_only(self._condition.wait())
+
+    def notify_all(self):
+        self._condition.notify_all()
+
+
+class AsyncHttpxTransport(Transport):
+    """
+    A transport using an httpx AsyncClient. Its methods are blocking in form
+    but must be called in a greenlet spawned by SQLAlchemy's greenlet_spawn,
+    where they await the client, returning control to the event loop while
+    requests are in flight and while response bodies are streamed. httpx is
+    an optional dependency, installable with the asyncio extra.
+    """
+
+    blocking = False
+
+    def __init__(self, verify_ssl: bool = False, client=None,
+                 pool_maxsize: int = api_globals._POOL_MAXSIZE,
+                 compression: bool = True):
+        import httpx  # pylint: disable=import-outside-toplevel
+
+        self._json_headers = _json_headers(compression)
+        self.connection_errors = (httpx.TransportError,)
+        if client is None:
+            limits = httpx.Limits(
+                max_connections=pool_maxsize,
+                max_keepalive_connections=pool_maxsize
+            )
+            try:
+                client = httpx.AsyncClient(
+                    verify=verify_ssl, http2=True, limits=limits, timeout=None
+                )
+            except ImportError:
+                logger.info('uses HTTP/1.1 because the h2 package is not installed.')
+                client = httpx.AsyncClient(verify=verify_ssl, limits=limits, timeout=None)
+        self._client = client
+
+    @_raises_operational_error
+    def post_json(self, url, payload, stream=False):
+        req = self._client.build_request(
+            'POST', url, content=dumps(payload).encode(), headers=self._json_headers
+        )
+        resp = await_only(self._client.send(req, stream=stream))
+
+        if stream:
+            return HTTPResponse(
+                resp.status_code, resp.headers,
+                stream=_ChunkReader(_AwaitedChunks(resp.aiter_raw())),
+                close=lambda: await_only(resp.aclose())
+            )
+
+        return HTTPResponse(
+            resp.status_code, resp.headers, content=resp.content,
+            bytes_received=resp.num_bytes_downloaded
+        )
+
+    @_raises_operational_error
+    def post_form(self, url, fields):
+        resp = await_only(self._client.post(url, data=fields, follow_redirects=True))
+        return HTTPResponse(
+            resp.status_code, resp.headers, content=resp.content,
+            bytes_received=resp.num_bytes_downloaded
+        )
+
+    @_raises_operational_error
+    def get(self, url):
+        resp = await_only(self._client.get(url, follow_redirects=True))
+        return HTTPResponse(
+            resp.status_code, resp.headers, content=resp.content,
+            bytes_received=resp.num_bytes_downloaded
+        )
+
+    def close(self):
+        await_only(self._client.aclose())
+
+    def sleep(self, seconds: float):
+        await_only(asyncio.sleep(seconds))
+
+    def lock(self):
+        return _AwaitedLock()
+
+    def condition(self):
+        return _AwaitedCondition()
+
+
+_TRANSPORTS = {
+    'requests': RequestsTransport,
+    'urllib3': Urllib3Transport,
+    'httpx': HttpxTransport,
+    # used by async connections, see _async
+    'httpx_async': AsyncHttpxTransport,
+}
+
+
+def create_transport(name: str, verify_ssl: bool = False,
+                     pool_maxsize: int = api_globals._POOL_MAXSIZE,
+                     compression: bool = True) -> Transport:
+    """
+    Returns a new transport of the given name: requests, urllib3, httpx or
+    httpx_async.
+    """
+    try:
+        transport_cls = _TRANSPORTS[name]
+    except KeyError as ex:
+        raise ProgrammingError(
+            f'Unknown transport {name}, use one of {", ".join(_TRANSPORTS)}.',
+            None
+        ) from ex
+
+    logger.debug(f'uses the {name} HTTP transport.')
+    return transport_cls(
+        verify_ssl=verify_ssl, pool_maxsize=pool_maxsize, compression=compression
+    )
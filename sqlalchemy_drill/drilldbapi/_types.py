@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""
+The DB-API type objects and constructors, and the typecasting of the columns
+of row data batches.
+
+Typecasters are applied to a whole column at a time. Those of the Unix times
+in ms in which Drill >= 1.19 returns DATE, TIME and TIMESTAMP values use
+NumPy datetime64 arithmetic for longer columns if NumPy is installed.
+"""
+from array import array
+from datetime import date, time, datetime, timedelta
+from functools import lru_cache
+from time import gmtime
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from . import api_globals
+
+
+class DBAPITypeObject:
+    def __init__(self, *values):
+        self.values = values
+
+    def __cmp__(self, other):
+        if other in self.values:
+            return 0
+        if other < self.values:
+            return 1
+        return -1
+
+    def __eq__(self, other):
+        return self.values == other.values
+
+    def __hash__(self):
+        return hash(repr(self))
+
+
+# Mandatory type objects defined by DB-API 2 specs.
+
+STRING = DBAPITypeObject('VARCHAR')
+BINARY = DBAPITypeObject('BINARY', 'VARBINARY')
+NUMBER = DBAPITypeObject('FLOAT4', 'FLOAT8', 'SMALLINT',
+                         'INT', 'BIGINT', 'DECIMAL')
+DATETIME = DBAPITypeObject('DATE', 'TIMESTAMP')
+ROWID = DBAPITypeObject()
+
+# Additional type objects (more specific):
+
+BOOL = DBAPITypeObject('BIT')
+SMALLINT = DBAPITypeObject('SMALLINT')
+INTEGER = DBAPITypeObject('INT')
+LONG = DBAPITypeObject('BIGINT')
+FLOAT = DBAPITypeObject('FLOAT4', 'FLOAT8')
+NUMERIC = DBAPITypeObject('VARDECIMAL')
+DATE = DBAPITypeObject('DATE')
+TIME = DBAPITypeObject('TIME')
+TIMESTAMP = DBAPITypeObject('TIMESTAMP')
+INTERVAL = DBAPITypeObject('INTERVALDAY', 'INTERVALYEAR')
+
+_FLOAT_TYPES = ('FLOAT4', 'FLOAT8')
+_DECIMAL_TYPES = ('DECIMAL', 'VARDECIMAL')
+
+# array.array typecodes for the fixed width numeric types
+
+_ARRAY_TYPECODES = {
+    'TINYINT': 'b',
+    'SMALLINT': 'h',
+    'INT': 'i',
+    'BIGINT': 'q',
+    'FLOAT4': 'f',
+    'FLOAT8': 'd',
+}
+
+def _typecast_columns(columns, typecasters):
+    '''Returns the given columns with the column typecaster for each column applied.'''
+    if typecasters is None:
+        return columns
+
+    return [
+        col if cast is None else cast(col)
+        for col, cast in zip(columns, typecasters)
+    ]
+
+
+def _floats_from_numbers(values: list) -> list:
+    '''Converts a column of numbers to floats.'''
+    return [None if v is None else float(v) for v in values]
+
+
+def _per_value(typecaster):
+    '''Returns a column typecaster applying the given typecaster to each value of a column.'''
+    if typecaster is None:
+        return None
+
+    def column_typecaster(values):
+        return [typecaster(v) for v in values]
+
+    return column_typecaster
+
+
+def _column_container(values: list, col_type: str = None):
+    '''
+    Returns the values of a column as an array.array if they are of a fixed width numeric type
+    and free of nulls, otherwise returns them unchanged.
+    '''
+    typecode = _ARRAY_TYPECODES.get(col_type)
+    if typecode is None:
+        return values
+
+    try:
+        return array(typecode, values)
+    except (TypeError, OverflowError):
+        # nulls are not representable in an array
+        return values
+
+
+# Mandatory type helpers defined by DB-API 2 specs
+
+
+def Date(year, month, day):
+    """Construct an object holding a date value."""
+    return date(year, month, day)
+
+
+def Time(hour, minute=0, second=0, microsecond=0, tzinfo=None):
+    """Construct an object holding a time value."""
+    return time(hour, minute, second, microsecond, tzinfo)
+
+
+def Timestamp(year, month, day, hour=0, minute=0, second=0, microsecond=0,
+              tzinfo=None):
+    """Construct an object holding a time stamp value."""
+    return datetime(year, month, day, hour, minute, second, microsecond,
+                    tzinfo)
+
+
+def DateFromTicks(ticks):
+    """Construct an object holding a date value from the given Unix time ms."""
+    return Date(*gmtime(ticks/1000)[:3]) if ticks else None
+
+
+def TimeFromTicks(ticks):
+    """Construct an object holding a time value from the given Unix time ms."""
+    return Time(*gmtime(ticks/1000)[3:6]) if ticks else None
+
+
+def TimestampFromTicks(ticks):
+    """Construct an object holding a timestamp from the given Unix time ms."""
+    return Timestamp(*gmtime(ticks/1000)[:6]) if ticks else None
+
+
+# Column typecasters for Unix times in ms.  These convert a whole column at a
+# time, using NumPy datetime64 arithmetic for longer columns if it is available.
+
+_EPOCH = datetime(1970, 1, 1)
+_EPOCH_ORDINAL = _EPOCH.toordinal()
+_MS_PER_DAY = 86_400_000
+
+
+def _ticks_datetime64(values):
+    if None in values:
+        values = [-2**63 if v is None else v for v in values]  # NaT
+    return np.array(values, dtype=np.int64).view('datetime64[ms]')
+
+
+def _use_numpy(values) -> bool:
+    return np is not None and len(values) >= api_globals._NUMPY_MIN_VALUES
+
+
+@lru_cache(maxsize=api_globals._DATE_CACHE_SIZE)
+def _date_from_day(day: int) -> date:
+    return date.fromordinal(_EPOCH_ORDINAL + day)
+
+
+def _dates_from_ticks(values: list) -> list:
+    """Converts a column of Unix times in ms to dates."""
+    if _use_numpy(values):
+        return _ticks_datetime64(values).astype('datetime64[D]').tolist()
+
+    return [None if v is None else _date_from_day(v // _MS_PER_DAY) for v in values]
+
+
+def _times_from_ticks(values: list) -> list:
+    """Converts a column of Unix times in ms to times of day."""
+    result = []
+    for v in values:
+        if v is None:
+            result.append(None)
+            continue
+        s, ms = divmod(v % _MS_PER_DAY, 1000)
+        m, s = divmod(s, 60)
+        h, m = divmod(m, 60)
+        result.append(time(h, m, s, ms * 1000))
+
+    return result
+
+
+def _timestamps_from_ticks(values: list) -> list:
+    """Converts a column of Unix times in ms to timestamps."""
+    if _use_numpy(values):
+        return _ticks_datetime64(values).tolist()
+
+    return [None if v is None else _EPOCH + timedelta(milliseconds=v) for v in values]
+
+
+class Binary(bytes):
+    """Construct an object capable of holding a binary (long) string value."""
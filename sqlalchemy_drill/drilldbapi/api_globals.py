@@ -5,3 +5,59 @@ _HEADER = {'Content-Type': 'application/json'}
 _PAYLOAD = {'queryType': 'SQL', 'query': None}
 _LOGIN = {'j_username': None, 'j_password': None}
 _PROGRESS_LOG_N = 10_000
+_CHUNK_SIZE = 64 * 1024
+# ijson backends in order of preference
+_IJSON_BACKENDS = ('yajl2_c', 'yajl2_cffi', 'yajl2', 'python')
+_BATCH_ROWS = 1_000
+_PREFETCH_POLL_S = 0.1
+_PREFETCH_JOIN_TIMEOUT_S = 10
+_WHOLE_BODY_BYTES = 8 * 1024 * 1024
+# Shortest column converted using NumPy rather than value by value
+_NUMPY_MIN_VALUES = 64
+_DATE_CACHE_SIZE = 4096
+_MAX_REDIRECTS = 10
+# Content encodings requested for streamed query results
+_ACCEPT_ENCODING = 'gzip, deflate'
+# HTTP connections kept open per drillbit by a transport
+_POOL_MAXSIZE = 10
+# Ejection of unreachable drillbits, doubling with each consecutive failure
+_EJECT_S = 5
+_EJECT_MAX_S = 300
+# Lifetime of the drillbits discovered from sys.drillbits
+_DISCOVERY_TTL_S = 300
+# Hedging delays are percentiles of the latest response header latencies
+_LATENCY_SAMPLES = 256
+_HEDGE_MIN_SAMPLES = 20
+_HEDGE_INITIAL_DELAY_S = 1.0
+_HEDGE_MIN_DELAY_S = 0.01
+# Retries of transient failures, backing off exponentially with jitter
+_RETRIES = 2
+_RETRY_BACKOFF_S = 0.1
+_RETRY_BACKOFF_MAX_S = 5
+# HTTP statuses of drillbits or proxies which are temporarily unavailable
+_RETRY_STATUSES = (502, 503, 504)
+# Retry budget per balancer: a failure costs a token, a success refunds a
+# tenth and retries stop while half the tokens are spent
+_RETRY_TOKENS = 10
+_RETRY_TOKEN_RATIO = 0.1
+# Consecutive failures to reach a drillbit after which queries fail fast
+_BREAKER_FAILURES = 3
+# HTTP connections kept open per drillbit by an async connection, which may
+# have many more queries in flight than a blocking one
+_ASYNC_POOL_MAXSIZE = 100
+# Result cache entries expire after this time, and may take at most this
+# fraction of the cache
+_CACHE_TTL_S = 300
+_CACHE_MAX_ENTRY_FRACTION = 0.25
+# Result cache directories: their default size, the zlib level of their
+# files and the temporary files of writers, deleted if left for this long
+_CACHE_DIR_BYTES = 1024 * 1024 * 1024
+_CACHE_FILE_COMPRESSION = 1
+_CACHE_TMP_PREFIX = '.tmp-'
+_CACHE_TMP_MAX_AGE_S = 3600
+# The seconds for which the SHOW FILES listings validating cached results
+# are cached
+_CACHE_PROBE_TTL_S = 10
+# Batches of rows a single-flight query keeps for its slowest cursors, which
+# are detached beyond this
+_FLIGHT_MAX_BATCHES = 100
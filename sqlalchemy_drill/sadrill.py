@@ -23,9 +23,12 @@
 from __future__ import absolute_import
 from __future__ import unicode_literals
 import logging
+from collections import deque
 from urllib.parse import unquote
 
 from sqlalchemy import pool
+from sqlalchemy.engine import default
+from sqlalchemy.engine.interfaces import AdaptedConnection
 
 from .base import DrillDialect, DrillIdentifierPreparer, DrillCompiler_sadrill
 
@@ -38,7 +41,8 @@ class DrillDialect_sadrill(DrillDialect):
     driver = 'rest'
     preparer = DrillIdentifierPreparer
     statement_compiler = DrillCompiler_sadrill
-    poolclass = pool.SingletonThreadPool
+    # DB-API connections are thread-safe, so need not be pinned to a thread
+    poolclass = pool.QueuePool
     supports_alter = False
     supports_pk_autoincrement = False
     supports_default_values = False
@@ -97,6 +101,7 @@ class DrillDialect_sadrill(DrillDialect):
 
             qargs.update(url.query)
             qargs['db'] = db
+            self._pop_dialect_args(qargs)
 
             # Convert stream_results to boolean if present
             if 'stream_results' in qargs:
@@ -112,3 +117,208 @@ class DrillDialect_sadrill(DrillDialect):
             raise ex
 
         return [], qargs
+
+    @staticmethod
+    def _query_options(cursor, context):
+        """
+        Applies the drill_prefetch and drill_cache execution options to the
+        cursor and returns the query payload options set by the
+        drill_auto_limit and drill_default_schema execution options.
+        """
+        if context is None:
+            return None
+
+        execution_options = context.execution_options
+        prefetch = execution_options.get('drill_prefetch')
+        if prefetch is not None:
+            cursor.prefetch = int(prefetch)
+        use_cache = execution_options.get('drill_cache')
+        if use_cache is not None:
+            cursor.use_cache = bool(use_cache)
+
+        options = {}
+        auto_limit = execution_options.get('drill_auto_limit')
+        if auto_limit is not None:
+            # checked by the cursor
+            options['autoLimit'] = auto_limit
+        default_schema = execution_options.get('drill_default_schema')
+        if default_schema is not None:
+            options['defaultSchema'] = default_schema
+
+        return options or None
+
+    def is_disconnect(self, e, connection, cursor):
+        """
+        Drill being unreachable, a closed DB-API connection and a rejected
+        session, e.g. after a drillbit restarted, all invalidate pooled
+        connections so that they are replaced by new ones, which log in again.
+        """
+        dbapi = self.import_dbapi()
+        if isinstance(e, (dbapi.OperationalError, dbapi.ConnectionClosedException)):
+            return True
+        if isinstance(e, dbapi.Error):
+            return e.httperror in (401, 403)
+        return False
+
+    def do_execute(self, cursor, statement, parameters, context=None):
+        self._invalidate_metadata(statement)
+        cursor.execute(statement, parameters, self._query_options(cursor, context))
+
+    def do_execute_no_params(self, cursor, statement, context=None):
+        self._invalidate_metadata(statement)
+        cursor.execute(statement, options=self._query_options(cursor, context))
+
+    def do_executemany(self, cursor, statement, parameters, context=None):
+        self._invalidate_metadata(statement)
+        cursor.executemany(statement, parameters, self._query_options(cursor, context))
+
+
+class _AsyncAdaptedCursor:
+    """
+    A DB-API cursor of the drill+async dialect. Unless it is server side, it
+    reads the whole result when executing, in SQLAlchemy's greenlet, so that
+    the rows of a buffered result can be fetched outside of a greenlet.
+    Server side cursors, used by AsyncConnection.stream(), read rows from
+    Drill as they are fetched.
+    """
+
+    def __init__(self, cursor, server_side: bool = False):
+        self._cursor = cursor
+        self.server_side = server_side
+        self._rows = deque()
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self) -> int:
+        return self._cursor.rowcount
+
+    @property
+    def arraysize(self) -> int:
+        return self._cursor.arraysize
+
+    @arraysize.setter
+    def arraysize(self, size: int):
+        self._cursor.arraysize = size
+
+    @property
+    def prefetch(self) -> int:
+        return self._cursor.prefetch
+
+    @prefetch.setter
+    def prefetch(self, batches: int):
+        self._cursor.prefetch = batches
+
+    @property
+    def use_cache(self) -> bool:
+        return self._cursor.use_cache
+
+    @use_cache.setter
+    def use_cache(self, use: bool):
+        self._cursor.use_cache = use
+
+    def execute(self, operation, parameters=(), options: dict = None):
+        self._rows.clear()
+        self._cursor.execute(operation, parameters, options)
+        if not self.server_side and self._cursor.description:
+            self._rows.extend(self._cursor.fetchall())
+
+    def executemany(self, operation, seq_of_parameters, options: dict = None):
+        for parameters in seq_of_parameters:
+            self.execute(operation, parameters, options)
+
+    def fetchone(self):
+        if self.server_side:
+            return self._cursor.fetchone()
+        return self._rows.popleft() if self._rows else None
+
+    def fetchmany(self, size: int = None):
+        if self.server_side:
+            return self._cursor.fetchmany(size)
+        size = size or self.arraysize
+        return [self._rows.popleft() for _ in range(min(size, len(self._rows)))]
+
+    def fetchall(self):
+        if self.server_side:
+            return self._cursor.fetchall()
+        rows = list(self._rows)
+        self._rows.clear()
+        return rows
+
+    def close(self):
+        self._rows.clear()
+        self._cursor.close()
+
+    async def _async_soft_close(self):
+        # buffered results have already been read and their response closed
+        pass
+
+
+class _AsyncAdaptedConnection(AdaptedConnection):
+    """
+    A DB-API connection of the drill+async dialect, wrapping a Connection over
+    an async transport. Its driver connection is an AsyncConnection.
+    """
+
+    __slots__ = ('_sync_connection',)
+
+    def __init__(self, connection):
+        from .drilldbapi import AsyncConnection  # pylint: disable=import-outside-toplevel
+        self._sync_connection = connection
+        self._connection = AsyncConnection(connection)
+
+    def cursor(self, server_side: bool = False) -> _AsyncAdaptedCursor:
+        return _AsyncAdaptedCursor(self._sync_connection.cursor(), server_side)
+
+    def commit(self):
+        self._sync_connection.commit()
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self._sync_connection.close()
+
+
+class DrillExecutionContext_async(default.DefaultExecutionContext):
+    def create_server_side_cursor(self):
+        return self._dbapi_connection.cursor(server_side=True)
+
+
+class DrillDialect_async(DrillDialect_sadrill):
+    """
+    The sadrill dialect for asyncio, used by create_async_engine with URLs
+    starting drill+async://. Its DB-API connections send queries with an
+    httpx AsyncClient, awaited from SQLAlchemy's greenlets.
+    """
+    driver = 'async'
+    is_async = True
+    poolclass = pool.AsyncAdaptedQueuePool
+    supports_server_side_cursors = True
+    execution_ctx_cls = DrillExecutionContext_async
+
+    def create_connect_args(self, url, **kwargs):
+        dbapi = self.import_dbapi()
+        args, qargs = super().create_connect_args(url, **kwargs)
+        for name in ('transport', 'prefetch', 'hedge_percentile'):
+            if qargs.get(name) not in (None, 0, '0'):
+                raise dbapi.NotSupportedError(
+                    f'The {name} parameter is not supported by drill+async.', None
+                )
+        qargs['transport'] = 'httpx_async'
+        qargs.setdefault('pool_maxsize', dbapi.api_globals._ASYNC_POOL_MAXSIZE)
+
+        return args, qargs
+
+    @classmethod
+    def import_dbapi(cls):
+        import sqlalchemy_drill.drilldbapi as module  # pylint: disable=import-outside-toplevel
+        return module
+
+    def connect(self, *cargs, **cparams):
+        return _AsyncAdaptedConnection(super().connect(*cargs, **cparams))
+
+    def get_driver_connection(self, connection):
+        return connection.driver_connection
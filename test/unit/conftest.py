@@ -0,0 +1,65 @@
+# This is the MIT license: http://www.opensource.org/licenses/mit-license.php
+#
+# Copyright (c) 2005-2012 the SQLAlchemy authors and contributors <see AUTHORS file>.
+# SQLAlchemy is a trademark of Michael Bayer.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify, merge,
+# publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons
+# to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+# PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE
+# FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import pytest
+
+from sqlalchemy_drill.drilldbapi import _balancer, _cache, _drilldbapi, _flight
+
+from .fakes import DrillServer, FakeDrill, FakeTransport
+
+
+@pytest.fixture(autouse=True)
+def process_registries():
+    """
+    Empties the registries which the connections of a process share, e.g. of
+    Drill versions and balancers, so that each test starts afresh.
+    """
+    registries = (
+        _drilldbapi._server_versions, _drilldbapi._discovered_drillbits,
+        _balancer._balancers, _cache._caches, _flight._flights,
+    )
+    for registry in registries:
+        registry.clear()
+    yield
+    for registry in registries:
+        registry.clear()
+
+
+@pytest.fixture
+def drill():
+    drill = FakeDrill()
+    drill.add_table(
+        'dfs.tmp.sales', ['id', 'region', 'amount'], ['BIGINT', 'VARCHAR', 'FLOAT8'],
+        [[i, 'north' if i % 2 else 'south', i + 0.5] for i in range(2500)]
+    )
+    return drill
+
+
+@pytest.fixture
+def transport(drill):
+    return FakeTransport(drill)
+
+
+@pytest.fixture
+def server(drill):
+    """A drillbit answering over HTTP on a local port as the fake Drill would."""
+    server = DrillServer(drill)
+    yield server
+    server.close()
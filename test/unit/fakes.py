@@ -0,0 +1,371 @@
+# This is the MIT license: http://www.opensource.org/licenses/mit-license.php
+#
+# Copyright (c) 2005-2012 the SQLAlchemy authors and contributors <see AUTHORS file>.
+# SQLAlchemy is a trademark of Michael Bayer.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify, merge,
+# publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons
+# to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+# PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE
+# FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+"""
+An in-process stand-in for the REST API of a Drill cluster and an HTTP
+transport which sends queries to it, for unit tests which need no Drill
+server, and a local HTTP server answering as it would, for tests of the
+real transports. Only the queries used by the tests are understood.
+"""
+import gzip
+import io
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from sqlalchemy_drill.drilldbapi import Connection
+from sqlalchemy_drill.drilldbapi._transport import HTTPResponse, Transport
+from sqlalchemy_drill.drilldbapi.api_exceptions import OperationalError
+
+BASE_URL = 'http://drill:8047'
+
+
+class FakeDrill:
+    """
+    The state of a fake Drill cluster: its tables, its drillbits and the
+    requests it has received. Unqualified table names are resolved against
+    the schema of the session, which a USE statement or the defaultSchema of
+    a query payload sets, as in Drill.
+    """
+
+    def __init__(self, version: str = '1.21.0'):
+        self.version = version
+        # (columns, column types, rows as lists) by qualified table name
+        self.tables = {}
+        # SHOW FILES entries, (name, is directory, length, mtime), by target
+        self.files = {}
+        # rows of sys.drillbits, (hostname, http_port, state)
+        self.drillbits = []
+        # (base URL, payload) of every query received
+        self.requests = []
+        self.cancelled = []
+        # base URLs which cannot be reached and their delays before responding
+        self.down = set()
+        self.delays = {}
+        # (status, error message) of the next failures to return
+        self.failures = []
+        # whether streamed bodies are sent with a Content-Length, as Drill
+        # < 1.19 sends them after buffering the whole result
+        self.content_length = version < '1.19'
+        # the bytes of streamed bodies sent before the drillbit stalls, if any
+        self.stall_after = None
+        # functions returning a (status, document or body bytes) for queries
+        # matching a pattern
+        self.handlers = []
+        self.schema = None
+        self._query_ids = 0
+        self._lock = threading.Lock()
+
+    def add_table(self, name: str, columns: list, types: list, rows: list):
+        self.tables[name] = (columns, types, rows)
+
+    def queries(self, pattern: str = '') -> list:
+        """Returns the queries received which match the given pattern."""
+        return [
+            p['query'] for _, p in self.requests
+            if re.search(pattern, p['query'], re.IGNORECASE)
+        ]
+
+    def result(self, columns: list, types: list, rows: list) -> dict:
+        """Returns the document of a completed query's result."""
+        with self._lock:
+            self._query_ids += 1
+            query_id = f'query-{self._query_ids}'
+
+        doc = {'queryId': query_id, 'columns': columns}
+        records = [dict(zip(columns, row)) for row in rows]
+        if self.version < '1.19':
+            # metadata followed the rows before Drill 1.19
+            doc['rows'] = records
+            doc['metadata'] = types
+        else:
+            doc['metadata'] = types
+            doc['rows'] = records
+        doc['queryState'] = 'COMPLETED'
+        return doc
+
+    def respond(self, base_url: str, payload: dict):
+        """Returns the status and JSON document of the response to a query."""
+        with self._lock:
+            self.requests.append((base_url, payload))
+            failure = self.failures.pop(0) if self.failures else None
+        if failure is not None:
+            return failure[0], {'errorMessage': failure[1]}
+
+        if payload.get('defaultSchema'):
+            self.schema = payload['defaultSchema']
+        query = payload['query'].strip().rstrip(';')
+
+        for pattern, handler in self.handlers:
+            if re.fullmatch(pattern, query, re.IGNORECASE | re.DOTALL):
+                return handler(payload)
+
+        if query == 'select min(version) version from sys.drillbits':
+            return 200, self.result(['version'], ['VARCHAR'], [[self.version]])
+        if query == 'select * from sys.drillbits':
+            return 200, self.result(
+                ['hostname', 'http_port', 'state'], ['VARCHAR', 'INT', 'VARCHAR'],
+                [list(d) for d in self.drillbits]
+            )
+
+        match = re.fullmatch(r'USE\s+(.+)', query, re.IGNORECASE)
+        if match:
+            schema = match.group(1).replace('`', '')
+            if not any(t.startswith(schema + '.') for t in self.tables):
+                return 500, {'errorMessage': f'VALIDATION ERROR: Schema [{schema}] is not valid'}
+            self.schema = schema
+            return 200, self.result(
+                ['ok', 'summary'], ['BIT', 'VARCHAR'],
+                [[True, f'Default schema changed to [{schema}]']]
+            )
+
+        if re.match(r'(ALTER\s+SESSION|SET|RESET)\b', query, re.IGNORECASE):
+            return 200, self.result(['ok', 'summary'], ['BIT', 'VARCHAR'], [[True, 'set']])
+
+        match = re.fullmatch(r'SHOW FILES IN (.+)', query, re.IGNORECASE)
+        if match:
+            target = match.group(1).replace('`', '')
+            if target not in self.files:
+                return 500, {'errorMessage': f'VALIDATION ERROR: Schema [{target}] is not valid'}
+            return 200, self.result(
+                ['name', 'isDirectory', 'isFile', 'length', 'modificationTime'],
+                ['VARCHAR', 'BIT', 'BIT', 'BIGINT', 'TIMESTAMP'],
+                [[n, d, not d, size, mtime] for n, d, size, mtime in self.files[target]]
+            )
+
+        match = re.fullmatch(r'select \* from (\S+)', query, re.IGNORECASE)
+        if match:
+            name = match.group(1).replace('`', '')
+            if name not in self.tables and self.schema:
+                name = f'{self.schema}.{name}'
+            if name in self.tables:
+                return 200, self.result(*self.tables[name])
+            return 500, {'errorMessage': f'VALIDATION ERROR: Object \'{name}\' not found'}
+
+        return 500, {'errorMessage': f'PARSE ERROR: cannot run {query}'}
+
+
+class StalledStream(io.RawIOBase):
+    """
+    A response body of which only the first bytes arrive, after which reads
+    block until the connection is interrupted.
+    """
+
+    def __init__(self, head: bytes):
+        super().__init__()
+        self._head = io.BytesIO(head)
+        self._interrupted = threading.Event()
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        n = self._head.readinto(b)
+        if n:
+            return n
+        self._interrupted.wait(60)
+        raise OSError('the connection was shut down')
+
+    def interrupt(self):
+        self._interrupted.set()
+
+
+class FakeTransport(Transport):
+    """
+    A transport sending queries to a FakeDrill. Streamed results are sent
+    without a Content-Length unless the FakeDrill's content_length is set,
+    so that they are parsed incrementally.
+    """
+
+    def __init__(self, drill: FakeDrill):
+        self.drill = drill
+        # the responses with a body which have not been closed
+        self.open_responses = 0
+        self.closed = False
+        self._lock = threading.Lock()
+
+    def _response(self, status: int, body: bytes, stream: bool) -> HTTPResponse:
+        headers = {'Content-Type': 'application/json'}
+        if not stream or self.drill.content_length:
+            headers['Content-Length'] = str(len(body))
+        if not stream:
+            return HTTPResponse(status, headers, content=body)
+
+        with self._lock:
+            self.open_responses += 1
+        if self.drill.stall_after is not None:
+            stream = StalledStream(body[:self.drill.stall_after])
+            return HTTPResponse(
+                status, headers, stream=stream, close=self._close_response,
+                interrupt=stream.interrupt
+            )
+        return HTTPResponse(
+            status, headers, stream=io.BytesIO(body), close=self._close_response
+        )
+
+    def _close_response(self):
+        with self._lock:
+            self.open_responses -= 1
+
+    def _reach(self, url: str) -> str:
+        base_url = url[:url.index('/', len('http://'))]
+        if base_url in self.drill.down:
+            raise OperationalError(f'Could not reach {url}: connection refused', None)
+        delay = self.drill.delays.get(base_url)
+        if delay:
+            self.sleep(delay)
+        return base_url
+
+    def post_json(self, url, payload, stream=False):
+        base_url = self._reach(url)
+        status, doc = self.drill.respond(base_url, dict(payload))
+        body = doc if isinstance(doc, bytes) else json.dumps(doc).encode()
+        return self._response(status, body, stream and status == 200)
+
+    def post_form(self, url, fields):
+        self._reach(url)
+        return HTTPResponse(200, {}, content=b'')
+
+    def get(self, url):
+        self._reach(url)
+        query_id = url.rsplit('/', 1)[-1]
+        self.drill.cancelled.append(query_id)
+        return HTTPResponse(200, {}, content=b'{ "result" : "success" }')
+
+    def close(self):
+        self.closed = True
+
+
+SESSION_COOKIE = 'JSESSIONID=s3cr3t'
+
+
+class _DrillHandler(BaseHTTPRequestHandler):
+    """Answers logins, queries and cancellations as a drillbit would."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.open_connections += 1
+
+    def finish(self):
+        super().finish()
+        with self.server.lock:
+            self.server.open_connections -= 1
+
+    def log_message(self, *args):
+        pass
+
+    def _receive(self) -> bytes:
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        with self.server.lock:
+            self.server.received.append((self.command, self.path, self.headers.get('Cookie')))
+        return body
+
+    def _respond(self, status: int, body: bytes = b'', headers=()):
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._receive()
+        if self.path.startswith('/profiles/cancel/'):
+            self.server.drill.cancelled.append(self.path.rsplit('/', 1)[-1])
+        self._respond(200, b'{ "result" : "success" }')
+
+    def do_POST(self):
+        body = self._receive()
+        if self.path == '/j_security_check':
+            self._respond(303, headers=[
+                ('Location', '/'), ('Set-Cookie', f'{SESSION_COOKIE}; Path=/')
+            ])
+            return
+
+        status, doc = self.server.drill.respond(self.server.base_url, json.loads(body))
+        body = doc if isinstance(doc, bytes) else json.dumps(doc).encode()
+        if status != 200:
+            self._respond(status, body, [('Content-Type', 'application/json')])
+            return
+        self._stream(body)
+
+    def _stream(self, body: bytes):
+        gzipped = 'gzip' in self.headers.get('Accept-Encoding', '')
+        if gzipped:
+            body = gzip.compress(body)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Transfer-Encoding', 'chunked')
+        if gzipped:
+            self.send_header('Content-Encoding', 'gzip')
+        self.end_headers()
+        try:
+            for i in range(0, len(body), 1024):
+                chunk = body[i:i + 1024]
+                self.wfile.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+            self.wfile.write(b'0\r\n\r\n')
+        except OSError:
+            # the client closed the response early
+            self.close_connection = True
+
+
+class DrillServer(ThreadingHTTPServer):
+    """
+    A drillbit on a local port answering as a FakeDrill would, which logs
+    users in with a session cookie and streams results in chunks, gzip
+    encoded if accepted. It records the method, path and Cookie header of
+    each request received and counts its open connections.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, drill: FakeDrill):
+        super().__init__(('127.0.0.1', 0), _DrillHandler)
+        self.drill = drill
+        self.host, self.port = self.server_address
+        self.base_url = f'http://{self.host}:{self.port}'
+        self.lock = threading.Lock()
+        self.received = []
+        self.open_connections = 0
+        threading.Thread(target=self.serve_forever, args=(0.05,), daemon=True).start()
+
+    def close(self):
+        self.shutdown()
+        self.server_close()
+
+
+def connect(drill: FakeDrill, transport: Transport = None, **kwargs) -> Connection:
+    """Returns an anonymous connection to the fake Drill at BASE_URL."""
+    if transport is None:
+        transport = FakeTransport(drill)
+    return Connection('drill', 8047, 'http://', None, transport, **kwargs)
+
+
+def wait_for(condition, timeout: float = 5.0):
+    """Waits for a condition to become true, failing the test if it does not."""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.01)
@@ -0,0 +1,110 @@
+# This is the MIT license: http://www.opensource.org/licenses/mit-license.php
+#
+# Copyright (c) 2005-2012 the SQLAlchemy authors and contributors <see AUTHORS file>.
+# SQLAlchemy is a trademark of Michael Bayer.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify, merge,
+# publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons
+# to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+# PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE
+# FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+from datetime import date, datetime, time
+
+import pytest
+
+from .fakes import FakeDrill, connect
+
+pa = pytest.importorskip('pyarrow')
+
+_COLUMNS = ['id', 'ok', 'day', 'at', 'clock', 'score', 'name']
+_TYPES = ['BIGINT', 'BIT', 'DATE', 'TIMESTAMP', 'TIME', 'FLOAT8', 'VARCHAR']
+_SCHEMA = pa.schema([
+    ('id', pa.int64()), ('ok', pa.bool_()), ('day', pa.date32()),
+    ('at', pa.timestamp('ms')), ('clock', pa.time32('ms')),
+    ('score', pa.float64()), ('name', pa.string()),
+])
+_EXPECTED = {
+    'id': [1, None],
+    'ok': [True, False],
+    'day': [date(2021, 6, 1), None],
+    'at': [datetime(2021, 6, 1, 12, 30, 45, 123000), datetime(2021, 6, 1, 12, 30)],
+    'clock': [time(12, 30, 45, 500000), time(0, 0)],
+    'score': [1.5, None],
+    'name': ['a', None],
+}
+
+
+def _events_drill(version: str, rows: list) -> FakeDrill:
+    drill = FakeDrill(version)
+    drill.add_table('dfs.tmp.events', _COLUMNS, _TYPES, rows)
+    return drill
+
+
+def _table(drill, **kwargs):
+    cursor = connect(drill, **kwargs).cursor()
+    cursor.execute('select * from dfs.tmp.events')
+    return cursor.fetch_arrow_table()
+
+
+def test_columns_are_typed_by_drill_type():
+    drill = _events_drill('1.21.0', [
+        [1, True, 1622505600000, 1622550645123, 45045500, 1.5, 'a'],
+        [None, False, None, 1622550600000, 0, None, None],
+    ])
+
+    table = _table(drill, numbers='float')
+
+    assert table.schema == _SCHEMA
+    assert table.to_pydict() == _EXPECTED
+
+
+def test_strings_from_drill_before_1_19_are_parsed():
+    # Drill < 1.19 sends every value as a string
+    drill = _events_drill('1.17.0', [
+        ['1', 'true', '2021-06-01', '2021-06-01T12:30:45.123', '12:30:45.500', '1.5', 'a'],
+        [None, 'false', None, '2021-06-01T12:30', '00:00', None, None],
+    ])
+
+    table = _table(drill)
+
+    assert table.schema == _SCHEMA
+    assert table.to_pydict() == _EXPECTED
+
+
+def test_decimal_floats_are_converted(drill):
+    cursor = connect(drill).cursor()
+    cursor.execute('select * from dfs.tmp.sales')
+
+    table = cursor.fetch_arrow_table()
+
+    assert table.schema.field('amount').type == pa.float64()
+    assert table.column('amount')[1].as_py() == 1.5
+
+
+def test_record_batches_share_the_first_batch_schema(drill):
+    cursor = connect(drill).cursor()
+    cursor.execute('select * from dfs.tmp.sales')
+
+    batches = list(cursor.fetch_record_batches(1000))
+
+    assert [b.num_rows for b in batches] == [1000, 1000, 500]
+    assert len({b.schema for b in batches}) == 1
+
+
+def test_results_without_rows_have_a_schema():
+    drill = _events_drill('1.21.0', [])
+
+    table = _table(drill)
+
+    assert table.num_rows == 0
+    assert table.schema.names == _COLUMNS
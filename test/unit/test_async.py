@@ -0,0 +1,201 @@
+# This is the MIT license: http://www.opensource.org/licenses/mit-license.php
+#
+# Copyright (c) 2005-2012 the SQLAlchemy authors and contributors <see AUTHORS file>.
+# SQLAlchemy is a trademark of Michael Bayer.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify, merge,
+# publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons
+# to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+# PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE
+# FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import asyncio
+import json
+import time
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.dialects import registry
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.util import greenlet_spawn
+
+from sqlalchemy_drill.drilldbapi import DatabaseError, NotSupportedError, _transport, async_connect
+from sqlalchemy_drill.drilldbapi._async import AsyncConnection
+from sqlalchemy_drill.drilldbapi._drilldbapi import Connection
+from sqlalchemy_drill.drilldbapi._transport import AsyncHttpxTransport
+
+httpx = pytest.importorskip('httpx')
+pytest.importorskip('greenlet')
+
+QUERY = 'select * from dfs.tmp.sales'
+
+
+class _Body(httpx.AsyncByteStream):
+    """A response body streamed in chunks, as from the network."""
+
+    def __init__(self, body: bytes):
+        self._body = body
+
+    async def __aiter__(self):
+        for i in range(0, len(self._body), 4096):
+            yield self._body[i:i + 4096]
+
+
+def _mock_transport(drill):
+    """Returns an httpx transport which answers as the fake Drill would."""
+    async def handle(request):
+        base_url = f'{request.url.scheme}://{request.url.host}:{request.url.port}'
+        await asyncio.sleep(drill.delays.get(base_url, 0))
+        path = request.url.path
+        if path == '/query.json':
+            status, doc = drill.respond(base_url, json.loads(request.content))
+            return httpx.Response(
+                status, headers={'Content-Type': 'application/json'},
+                stream=_Body(json.dumps(doc).encode())
+            )
+        if path.startswith('/profiles/cancel/'):
+            drill.cancelled.append(path.rsplit('/', 1)[-1])
+        return httpx.Response(200, json={'result': 'success'})
+
+    return httpx.MockTransport(handle)
+
+
+async def _connect(drill, **kwargs) -> AsyncConnection:
+    client = httpx.AsyncClient(transport=_mock_transport(drill))
+    transport = AsyncHttpxTransport(client=client)
+    return AsyncConnection(await greenlet_spawn(
+        Connection, 'drill', 8047, 'http://', None, transport, **kwargs
+    ))
+
+
+def test_fetch_rows(drill):
+    async def fetch():
+        async with await _connect(drill) as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(QUERY)
+                first = await cursor.fetchone()
+                some = await cursor.fetchmany(10)
+                rest = [row async for row in cursor]
+                return first, some, rest, cursor.rowcount
+
+    first, some, rest, rowcount = asyncio.run(fetch())
+
+    assert first == (0, 'south', 0.5)
+    assert len(some) == 10 and some[0][0] == 1
+    assert len(rest) == 2489 and rest[-1][0] == 2499
+    assert rowcount == 2500
+
+
+def test_queries_wait_concurrently(drill):
+    drill.delays['http://drill:8047'] = 0.2
+
+    async def run_all():
+        conn = await _connect(drill)
+
+        async def run():
+            cursor = conn.cursor()
+            await cursor.execute(QUERY)
+            return len(await cursor.fetchall())
+
+        start = time.monotonic()
+        counts = await asyncio.gather(*(run() for _ in range(10)))
+        elapsed = time.monotonic() - start
+        await conn.close()
+        return counts, elapsed
+
+    counts, elapsed = asyncio.run(run_all())
+
+    assert counts == [2500] * 10
+    # ten queries of 0.2 s each, which would take 2 s one after the other
+    assert elapsed < 1.0
+
+
+def test_query_errors_are_raised(drill):
+    async def fail():
+        conn = await _connect(drill)
+        await conn.cursor().execute('selec 1')
+
+    with pytest.raises(DatabaseError, match='PARSE ERROR'):
+        asyncio.run(fail())
+
+
+def test_cancel_query(drill):
+    async def cancel():
+        conn = await _connect(drill)
+        await conn.cancel_query('query-7')
+
+    asyncio.run(cancel())
+
+    assert drill.cancelled == ['query-7']
+
+
+@pytest.mark.parametrize('kwargs', [{'prefetch': 2}, {'hedge_percentile': 95}])
+def test_blocking_features_are_not_supported(kwargs):
+    with pytest.raises(NotSupportedError):
+        asyncio.run(async_connect('drill', **kwargs))
+
+
+@pytest.fixture
+def async_engine(drill, monkeypatch):
+    """An engine of the drill+async dialect whose connections talk to the fake Drill."""
+    registry.register('drill.async', 'sqlalchemy_drill.sadrill', 'DrillDialect_async')
+    monkeypatch.setitem(
+        _transport._TRANSPORTS, 'httpx_async',
+        lambda **kwargs: AsyncHttpxTransport(
+            client=httpx.AsyncClient(transport=_mock_transport(drill))
+        )
+    )
+    return create_async_engine('drill+async://drill:8047/dfs/tmp')
+
+
+def test_engine_executes_queries(async_engine):
+    async def fetch():
+        async with async_engine.connect() as conn:
+            result = await conn.execute(text(QUERY))
+            rows = result.fetchall()
+        await async_engine.dispose()
+        return rows
+
+    rows = asyncio.run(fetch())
+
+    assert len(rows) == 2500
+    assert tuple(rows[1]) == (1, 'north', 1.5)
+
+
+def test_engine_streams_results(async_engine):
+    async def stream():
+        async with async_engine.connect() as conn:
+            result = await conn.stream(text(QUERY))
+            first = await result.fetchmany(10)
+            rest = [row async for row in result]
+        await async_engine.dispose()
+        return first, rest
+
+    first, rest = asyncio.run(stream())
+
+    assert [row[0] for row in first + rest] == list(range(2500))
+
+
+def test_closing_a_stream_early_cancels_the_query(drill, async_engine):
+    # the results are small enough to be read whole unless that is disabled
+    async_engine = create_async_engine('drill+async://drill:8047/dfs/tmp?whole_body_bytes=0')
+
+    async def stream():
+        async with async_engine.connect() as conn:
+            result = await conn.stream(text(QUERY))
+            await result.fetchmany(10)
+            await result.close()
+        await async_engine.dispose()
+
+    asyncio.run(stream())
+
+    assert len(drill.cancelled) == 1 and drill.cancelled[0].startswith('query-')
@@ -0,0 +1,145 @@
+# This is the MIT license: http://www.opensource.org/licenses/mit-license.php
+#
+# Copyright (c) 2005-2012 the SQLAlchemy authors and contributors <see AUTHORS file>.
+# SQLAlchemy is a trademark of Michael Bayer.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify, merge,
+# publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons
+# to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+# PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE
+# FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+from collections import Counter
+
+import pytest
+
+from sqlalchemy_drill.drilldbapi import OperationalError, ProgrammingError
+from sqlalchemy_drill.drilldbapi._balancer import Balancer, get_balancer
+
+from .fakes import BASE_URL, connect
+
+
+def _base_urls(conn):
+    return [d.base_url for d in conn._balancer.drillbits]
+
+
+def _run(conn, n, query='select * from dfs.tmp.sales'):
+    for _ in range(n):
+        cursor = conn.cursor()
+        cursor.execute(query)
+        cursor.fetchall()
+
+
+def _foremen(drill, query='select * from dfs.tmp.sales'):
+    return Counter(url for url, payload in drill.requests if payload['query'] == query)
+
+
+def test_hosts_are_balanced_by_round_robin(drill, transport):
+    conn = connect(drill, transport, hosts=['node1', 'node2'])
+
+    _run(conn, 6)
+
+    assert _base_urls(conn) == [BASE_URL, 'http://node1:8047', 'http://node2:8047']
+    assert list(_foremen(drill).values()) == [2, 2, 2]
+
+
+def test_discovery_keeps_the_drillbit_of_the_url(drill, transport):
+    drill.drillbits = [
+        ('node1', 8047, 'ONLINE'), ('node2', 8047, 'SHUTDOWN'), ('drill', 8047, 'ONLINE')
+    ]
+
+    conn = connect(drill, transport, discover=True, hosts=['node3'])
+
+    assert _base_urls(conn) == [BASE_URL, 'http://node1:8047', 'http://node3:8047']
+
+
+def test_discovery_of_unreachable_drillbits(drill, transport):
+    # names which resolve inside the cluster, but not on the client
+    drill.drillbits = [('10.0.0.1', 8047, 'ONLINE'), ('10.0.0.2', 8047, 'ONLINE')]
+    drill.down = {'http://10.0.0.1:8047', 'http://10.0.0.2:8047'}
+
+    conn = connect(drill, transport, discover=True, retry_backoff=0)
+    _run(conn, 3)
+
+    assert _foremen(drill) == {BASE_URL: 3}
+
+
+def test_discovered_drillbits_are_cached(drill, transport):
+    drill.drillbits = [('node1', 8047, 'ONLINE')]
+
+    connect(drill, transport, discover=True)
+    conn = connect(drill, transport, discover=True)
+
+    assert len(drill.queries(r'\* from sys.drillbits')) == 1
+    assert _base_urls(conn) == [BASE_URL, 'http://node1:8047']
+
+
+def test_unreachable_drillbit_is_ejected(drill, transport):
+    drill.down = {'http://node1:8047'}
+    conn = connect(drill, transport, hosts=['node1'], retry_backoff=0)
+
+    _run(conn, 4)
+
+    node1 = conn._balancer.drillbits[1]
+    assert _foremen(drill) == {BASE_URL: 4}
+    assert node1.failures == 1 and node1.ejected_until > 0
+
+
+def test_ejected_drillbit_is_readmitted(drill, transport, monkeypatch):
+    monkeypatch.setattr('sqlalchemy_drill.drilldbapi.api_globals._EJECT_S', 0)
+    drill.down = {'http://node1:8047'}
+    conn = connect(drill, transport, hosts=['node1'], retry_backoff=0)
+    _run(conn, 2)
+
+    drill.down.clear()
+    _run(conn, 4)
+
+    assert conn._balancer.drillbits[1].failures == 0
+    assert _foremen(drill)['http://node1:8047'] > 0
+
+
+def test_writes_are_not_retried_on_another_drillbit(drill, transport):
+    conn = connect(drill, transport, hosts=['node1'])
+    drill.down = {'http://node1:8047'}
+    conn._balancer._next = 1
+
+    with pytest.raises(OperationalError):
+        conn.cursor().execute('create table dfs.tmp.t as select 1 from (values(1))')
+
+
+def test_least_outstanding_prefers_idle_drillbits():
+    balancer = Balancer(['http://a', 'http://b', 'http://c'], 'least_outstanding')
+
+    held = [balancer.acquire() for _ in range(3)]
+    balancer.release(held[1])
+
+    assert len({d.base_url for d in held}) == 3
+    assert balancer.acquire() is held[1]
+
+
+def test_all_drillbits_ejected_opens_the_circuit():
+    balancer = Balancer(['http://a'])
+    for _ in range(3):
+        balancer.release(balancer.acquire(), reached=False)
+
+    assert balancer.circuit_open()
+    with pytest.raises(OperationalError):
+        balancer.acquire()
+
+
+def test_balancers_are_shared_by_drillbits_and_policy():
+    urls = ['http://a', 'http://b']
+
+    assert get_balancer(urls) is get_balancer(list(urls))
+    assert get_balancer(urls) is not get_balancer(urls, 'least_outstanding')
+    with pytest.raises(ProgrammingError):
+        get_balancer(urls, 'random')
@@ -0,0 +1,148 @@
+# This is the MIT license: http://www.opensource.org/licenses/mit-license.php
+#
+# Copyright (c) 2005-2012 the SQLAlchemy authors and contributors <see AUTHORS file>.
+# SQLAlchemy is a trademark of Michael Bayer.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify, merge,
+# publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons
+# to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+# PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE
+# FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import gzip
+import io
+import zlib
+
+import pytest
+
+from sqlalchemy_drill.drilldbapi import DatabaseError, NotSupportedError
+from sqlalchemy_drill.drilldbapi._transport import HTTPResponse
+
+_BODY = b'{"rows": [' + b', '.join(b'{"id": %d}' % i for i in range(2000)) + b']}'
+
+
+def _raw_deflate(data: bytes) -> bytes:
+    compressor = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+_ENCODED = {
+    'gzip': gzip.compress(_BODY),
+    'x-gzip': gzip.compress(_BODY),
+    # deflate is meant to be zlib wrapped, but is often sent raw
+    'deflate': zlib.compress(_BODY),
+    'raw deflate': _raw_deflate(_BODY),
+}
+
+
+def _response(encoding: str, body: bytes) -> HTTPResponse:
+    headers = {} if encoding == 'identity' else {'Content-Encoding': encoding.split()[-1]}
+    return HTTPResponse(200, headers, stream=io.BytesIO(body))
+
+
+@pytest.mark.parametrize('encoding', sorted(_ENCODED))
+def test_compressed_bodies_are_decoded(encoding):
+    resp = _response(encoding, _ENCODED[encoding])
+
+    assert resp.content == _BODY
+    assert resp.bytes_received == len(_ENCODED[encoding])
+    assert resp.bytes_decoded == len(_BODY)
+
+
+@pytest.mark.parametrize('encoding', sorted(_ENCODED))
+def test_compressed_bodies_are_decoded_in_small_reads(encoding):
+    resp = _response(encoding, _ENCODED[encoding])
+
+    chunks = list(iter(lambda: resp.stream.read(100), b''))
+
+    assert max(len(c) for c in chunks) <= 100
+    assert b''.join(chunks) == _BODY
+    assert resp.bytes_decoded == len(_BODY)
+
+
+def test_counters_grow_as_the_body_is_read():
+    resp = _response('gzip', _ENCODED['gzip'])
+
+    data = resp.stream.read(10)
+
+    assert 0 < resp.bytes_received < len(_ENCODED['gzip'])
+    assert resp.bytes_decoded == len(data) > 0
+
+
+def test_identity_bodies_are_counted_once():
+    resp = _response('identity', _BODY)
+
+    assert resp.content == _BODY
+    assert resp.bytes_received == resp.bytes_decoded == len(_BODY)
+
+
+def test_zero_length_reads_are_not_eof():
+    resp = _response('gzip', _ENCODED['gzip'])
+
+    assert resp.stream.readinto(bytearray(0)) == 0
+    assert resp.stream.read() == _BODY
+
+
+@pytest.mark.parametrize('encoding', sorted(_ENCODED))
+def test_truncated_bodies_raise(encoding):
+    encoded = _ENCODED[encoding]
+    resp = _response(encoding, encoded[:len(encoded) // 2])
+
+    with pytest.raises(DatabaseError, match='ended early'):
+        resp.stream.read()
+
+
+def test_corrupt_bodies_raise():
+    resp = _response('gzip', b'not gzip at all')
+
+    with pytest.raises(DatabaseError, match='decompress'):
+        resp.stream.read()
+
+
+def test_unsupported_encodings_are_rejected():
+    closed = []
+
+    with pytest.raises(NotSupportedError):
+        HTTPResponse(
+            200, {'Content-Encoding': 'br'}, stream=io.BytesIO(b''),
+            close=lambda: closed.append(True)
+        )
+    assert closed == [True]
+
+
+def test_content_received_decoded_counts_the_transferred_bytes():
+    resp = HTTPResponse(
+        200, {'Content-Encoding': 'gzip'}, content=_BODY, bytes_received=123
+    )
+
+    assert resp.bytes_received == 123
+    assert resp.bytes_decoded == len(_BODY)
+
+
+def test_content_with_a_content_length_counts_it():
+    headers = {'Content-Encoding': 'gzip', 'Content-Length': '321'}
+    resp = HTTPResponse(200, headers, content=_BODY)
+
+    assert resp.bytes_received == 321
+
+
+def test_compressed_chunked_content_has_no_known_size():
+    resp = HTTPResponse(200, {'Content-Encoding': 'gzip'}, content=_BODY)
+
+    assert resp.bytes_received is None
+    assert resp.bytes_decoded == len(_BODY)
+
+
+def test_identity_chunked_content_counts_its_length():
+    resp = HTTPResponse(200, {}, content=_BODY)
+
+    assert resp.bytes_received == resp.bytes_decoded == len(_BODY)
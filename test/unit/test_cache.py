@@ -0,0 +1,164 @@
+# This is the MIT license: http://www.opensource.org/licenses/mit-license.php
+#
+# Copyright (c) 2005-2012 the SQLAlchemy authors and contributors <see AUTHORS file>.
+# SQLAlchemy is a trademark of Michael Bayer.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify, merge,
+# publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons
+# to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+# PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE
+# FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import pytest
+
+from sqlalchemy_drill.drilldbapi._cache import CachedResult, ResultCache, normalize_sql
+
+from .fakes import connect
+
+QUERY = 'select * from dfs.tmp.sales'
+
+
+@pytest.fixture
+def schemas(drill):
+    for schema in ('a', 'b'):
+        drill.add_table(f'dfs.{schema}.t', ['schema'], ['VARCHAR'], [[schema]])
+
+
+@pytest.fixture
+def conn(drill, transport):
+    return connect(drill, transport, result_cache_bytes=2 ** 24)
+
+
+def _execute(conn, query=QUERY):
+    cursor = conn.cursor()
+    cursor.execute(query)
+    return cursor.fetchall(), cursor.result_md.get('cached', False)
+
+
+def test_results_are_cached(drill, conn):
+    rows, cached = _execute(conn)
+    again, cached_again = _execute(conn, QUERY.replace(' ', '\n  '))
+
+    assert not cached and cached_again
+    assert again == rows and len(rows) == 2500
+    assert len(drill.queries('sales')) == 1
+    assert conn.result_cache.stats()['hits'] == 1
+
+
+def test_use_changes_the_key(drill, conn, schemas):
+    _execute(conn, 'USE dfs.a')
+    assert _execute(conn, 'select * from t') == ([('a',)], False)
+
+    _execute(conn, 'USE dfs.b')
+    assert _execute(conn, 'select * from t') == ([('b',)], False)
+
+    _execute(conn, 'USE dfs.a')
+    assert _execute(conn, 'select * from t') == ([('a',)], True)
+
+
+def test_use_overrides_the_default_schema(drill, transport, schemas):
+    conn = connect(drill, transport, result_cache_bytes=2 ** 24, default_schema='dfs.a')
+    assert _execute(conn, 'select * from t') == ([('a',)], False)
+
+    _execute(conn, 'USE dfs.b')
+
+    assert _execute(conn, 'select * from t') == ([('b',)], False)
+
+
+@pytest.mark.parametrize('statement', [
+    'ALTER SESSION SET `planner.slice_target` = 1',
+    'set `store.format` = \'json\'',
+    'RESET `planner.slice_target`',
+])
+def test_session_options_change_the_key(drill, conn, statement):
+    _execute(conn)
+
+    _execute(conn, statement)
+    assert not _execute(conn)[1]
+    assert _execute(conn)[1]
+
+    _execute(conn, 'ALTER SESSION RESET ALL')
+    assert _execute(conn)[1]
+    assert len(drill.queries('sales')) == 2
+
+
+def test_partly_read_results_are_not_cached(drill, conn):
+    cursor = conn.cursor()
+    cursor.execute(QUERY)
+    cursor.fetchmany(10)
+    cursor.close()
+
+    assert not _execute(conn)[1]
+
+
+def test_cache_can_be_bypassed(drill, conn):
+    _execute(conn)
+    cursor = conn.cursor()
+    cursor.use_cache = False
+    cursor.execute(QUERY)
+    cursor.fetchall()
+
+    assert 'cached' not in cursor.result_md
+    assert len(drill.queries('sales')) == 2
+
+
+def test_writes_are_not_cached(drill, conn):
+    drill.handlers.append((
+        r'create table .*',
+        lambda payload: (200, drill.result(['ok'], ['BOOLEAN'], [[True]]))
+    ))
+    query = 'create table dfs.tmp.t as select * from dfs.tmp.sales'
+
+    _execute(conn, query)
+
+    assert _execute(conn, query) == ([(True,)], False)
+
+
+def _entry(size):
+    return CachedResult({'columns': ['x']}, 'decimal', [[[1]]], size)
+
+
+def test_least_recently_used_results_are_evicted():
+    cache = ResultCache(max_bytes=400, ttl_s=60)
+    for key in 'abcd':
+        cache.put(key, _entry(100))
+    cache.get('a')
+
+    cache.put('e', _entry(100))
+
+    assert cache.get('b') is None
+    assert all(cache.get(k) is not None for k in 'acde')
+    stats = cache.stats()
+    assert (stats['evictions'], stats['entries'], stats['bytes']) == (1, 4, 400)
+
+
+def test_large_results_are_not_cached():
+    cache = ResultCache(max_bytes=400, ttl_s=60)
+
+    cache.put('a', _entry(101))
+
+    assert cache.get('a') is None
+
+
+def test_results_expire(monkeypatch):
+    cache = ResultCache(max_bytes=400, ttl_s=60)
+    cache.put('a', _entry(100))
+
+    clock = cache.get('a').expires
+    monkeypatch.setattr('sqlalchemy_drill.drilldbapi._cache.time.monotonic', lambda: clock)
+
+    assert cache.get('a') is None
+    assert cache.stats()['expirations'] == 1
+
+
+def test_normalize_sql_keeps_quoted_whitespace():
+    assert normalize_sql("select  'a  b'\n from   t ") == "select 'a  b' from t"
@@ -0,0 +1,112 @@
+# This is the MIT license: http://www.opensource.org/licenses/mit-license.php
+#
+# Copyright (c) 2005-2012 the SQLAlchemy authors and contributors <see AUTHORS file>.
+# SQLAlchemy is a trademark of Michael Bayer.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify, merge,
+# publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons
+# to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+# PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE
+# FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import pytest
+
+from .fakes import connect
+
+
+@pytest.fixture
+def schemas(drill):
+    for schema in ('a', 'b'):
+        drill.add_table(f'dfs.{schema}.t', ['schema'], ['VARCHAR'], [[schema]])
+        drill.files[f'dfs.{schema}'] = [('t', False, 10, 1000)]
+    drill.files['dfs.tmp'] = [('sales', True, 0, 1000)]
+    drill.files['dfs.tmp.sales'] = [('0_0_0.parquet', False, 100, 1000)]
+
+
+def _connect(drill, transport, **kwargs):
+    return connect(
+        drill, transport, result_cache_bytes=2 ** 24, result_cache_validate=True,
+        result_cache_probe_ttl=0, **kwargs
+    )
+
+
+def _execute(conn, query='select * from t', options=None):
+    cursor = conn.cursor()
+    cursor.execute(query, options=options)
+    return cursor.fetchall(), cursor.result_md.get('cached', False)
+
+
+def _touch(drill, target, name):
+    drill.files[target] = [
+        (n, is_dir, length + 1, mtime + 1) if n == name else (n, is_dir, length, mtime)
+        for n, is_dir, length, mtime in drill.files[target]
+    ]
+
+
+def test_unchanged_files_validate_the_result(drill, transport, schemas):
+    conn = _connect(drill, transport, default_schema='dfs.a')
+    _execute(conn)
+
+    assert _execute(conn) == ([('a',)], True)
+    assert drill.queries('SHOW FILES') == ['SHOW FILES IN `dfs`.`a`'] * 2
+
+
+def test_changed_files_invalidate_the_result(drill, transport, schemas):
+    conn = _connect(drill, transport, default_schema='dfs.a')
+    _execute(conn)
+
+    _touch(drill, 'dfs.a', 't')
+
+    assert _execute(conn) == ([('a',)], False)
+    assert conn.result_cache.stats()['invalidations'] == 1
+    assert _execute(conn)[1]
+
+
+def test_files_of_directories_are_listed(drill, transport, schemas):
+    conn = _connect(drill, transport)
+    query = 'select * from dfs.tmp.sales'
+    _execute(conn, query)
+
+    drill.files['dfs.tmp.sales'].append(('1_0_0.parquet', False, 100, 2000))
+
+    assert not _execute(conn, query)[1]
+
+
+def test_default_schema_option_resolves_tables(drill, transport, schemas):
+    conn = _connect(drill, transport, default_schema='dfs.a')
+    options = {'defaultSchema': 'dfs.b'}
+    assert _execute(conn, options=options) == ([('b',)], False)
+
+    _touch(drill, 'dfs.b', 't')
+
+    assert _execute(conn, options=options) == ([('b',)], False)
+    assert 'SHOW FILES IN `dfs`.`b`' in drill.queries('SHOW FILES')
+
+
+def test_use_resolves_tables(drill, transport, schemas):
+    conn = _connect(drill, transport, default_schema='dfs.a')
+    _execute(conn, 'USE dfs.b')
+    _execute(conn)
+
+    _touch(drill, 'dfs.b', 't')
+
+    assert _execute(conn) == ([('b',)], False)
+    assert 'SHOW FILES IN `dfs`.`a`' not in drill.queries('SHOW FILES')
+
+
+def test_tables_which_cannot_be_listed_are_left_out(drill, transport, schemas):
+    drill.add_table('cp.employee.json', ['id'], ['BIGINT'], [[1]])
+    conn = _connect(drill, transport)
+    query = 'select * from cp.`employee.json`'
+    _execute(conn, query)
+
+    assert _execute(conn, query) == ([(1,)], True)
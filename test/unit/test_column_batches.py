@@ -0,0 +1,82 @@
+# This is the MIT license: http://www.opensource.org/licenses/mit-license.php
+#
+# Copyright (c) 2005-2012 the SQLAlchemy authors and contributors <see AUTHORS file>.
+# SQLAlchemy is a trademark of Michael Bayer.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify, merge,
+# publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons
+# to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+# PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE
+# FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+from sqlalchemy_drill.drilldbapi._parsing import _column_batches, _ijson_backend
+
+
+def _batches(rows_json: bytes, columns, batch_rows=3):
+    events = _ijson_backend.parse(b'{"rows": ' + rows_json + b', "queryState": "COMPLETED"}')
+    for _, event, value in events:
+        if event == 'start_array':
+            break
+
+    batches = list(_column_batches(events, columns, batch_rows))
+    # the trailing metadata is left to be parsed
+    assert next(events)[1:] == ('map_key', 'queryState')
+    return batches
+
+
+def test_rows_are_decoded_into_columns():
+    batches = _batches(b'[{"a": 1, "b": "x"}, {"a": 2, "b": "y"}]', ['a', 'b'])
+
+    assert batches == [[[1, 2], ['x', 'y']]]
+
+
+def test_batches_are_cut_at_batch_rows():
+    rows = b'[' + b', '.join(b'{"a": %d}' % i for i in range(7)) + b']'
+
+    batches = _batches(rows, ['a'])
+
+    assert batches == [[[0, 1, 2]], [[3, 4, 5]], [[6]]]
+
+
+def test_rows_filling_the_last_batch_exactly():
+    rows = b'[' + b', '.join(b'{"a": %d}' % i for i in range(6)) + b']'
+
+    assert _batches(rows, ['a']) == [[[0, 1, 2]], [[3, 4, 5]]]
+
+
+def test_nested_map_and_array_values():
+    rows = b'[{"m": {"k": [1, {"n": null}]}, "l": [[1, 2], []], "a": 1}]'
+
+    batches = _batches(rows, ['m', 'l', 'a'])
+
+    assert batches == [[[{'k': [1, {'n': None}]}], [[[1, 2], []]], [1]]]
+
+
+def test_columns_missing_from_a_row_are_null():
+    batches = _batches(b'[{"a": 1}, {"b": "y"}]', ['a', 'b'])
+
+    assert batches == [[[1, None], [None, 'y']]]
+
+
+def test_values_of_unknown_columns_are_discarded(caplog):
+    batches = _batches(b'[{"a": 1, "c": {"x": [1]}, "b": 2}]', ['a', 'b'])
+
+    assert batches == [[[1], [2]]]
+    assert 'unknown column c' in caplog.text
+
+
+def test_no_rows():
+    assert _batches(b'[]', ['a']) == []
+
+
+def test_empty_rows_are_rows_of_nulls():
+    assert _batches(b'[{}, {}]', ['a']) == [[[None, None]]]
@@ -0,0 +1,98 @@
+# This is the MIT license: http://www.opensource.org/licenses/mit-license.php
+#
+# Copyright (c) 2005-2012 the SQLAlchemy authors and contributors <see AUTHORS file>.
+# SQLAlchemy is a trademark of Michael Bayer.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify, merge,
+# publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons
+# to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+# PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE
+# FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import pytest
+
+from sqlalchemy_drill import drilldbapi
+from sqlalchemy_drill.drilldbapi import Connection, DatabaseError
+
+from .fakes import FakeDrill, connect
+
+
+@pytest.fixture
+def schemas(drill):
+    for schema in ('a', 'b'):
+        drill.add_table(f'dfs.{schema}.t', ['schema'], ['VARCHAR'], [[schema]])
+
+
+def _select(conn, query='select * from t'):
+    cursor = conn.cursor()
+    cursor.execute(query)
+    return cursor.fetchall()
+
+
+def test_default_schema_is_sent_with_each_query(drill, transport, schemas):
+    conn = connect(drill, transport, default_schema='dfs.a')
+
+    assert _select(conn) == [('a',)]
+    assert drill.requests[-1][1]['defaultSchema'] == 'dfs.a'
+
+
+def test_use_replaces_the_default_schema(drill, transport, schemas):
+    conn = connect(drill, transport, default_schema='dfs.a')
+
+    _select(conn, 'USE dfs.b')
+
+    assert _select(conn) == [('b',)]
+    assert drill.requests[-1][1]['defaultSchema'] == 'dfs.b'
+    assert conn._schema == 'dfs.b'
+
+
+def test_use_of_quoted_identifiers(drill, transport, schemas):
+    conn = connect(drill, transport)
+
+    _select(conn, 'use `dfs`.`b`;')
+
+    assert _select(conn) == [('b',)]
+    assert drill.requests[-1][1]['defaultSchema'] == 'dfs.b'
+
+
+def test_failed_use_keeps_the_default_schema(drill, transport, schemas):
+    conn = connect(drill, transport, default_schema='dfs.a')
+
+    with pytest.raises(DatabaseError):
+        _select(conn, 'USE dfs.missing')
+
+    assert _select(conn) == [('a',)]
+    assert conn._schema == 'dfs.a'
+
+
+def test_drill_without_default_schema_parameter_uses_use():
+    old_drill = FakeDrill('1.17.0')
+    for schema in ('a', 'b'):
+        old_drill.add_table(f'dfs.{schema}.t', ['schema'], ['VARCHAR'], [[schema]])
+    conn = connect(old_drill, default_schema='dfs.a')
+
+    assert old_drill.queries('USE') == ['USE dfs.a']
+    _select(conn, 'USE dfs.b')
+
+    assert _select(conn) == [('b',)]
+    assert conn._schema == 'dfs.b'
+    assert all('defaultSchema' not in payload for _, payload in old_drill.requests)
+
+
+def test_tuning_parameters_are_keyword_only(drill, transport):
+    with pytest.raises(TypeError):
+        Connection('drill', 8047, 'http://', None, transport, True, 1024)
+    with pytest.raises(TypeError):
+        drilldbapi.connect('drill', 8047, None, False, None, None, False, None, True, 1024)
+
+    conn = Connection('drill', 8047, 'http://', None, transport, True, chunk_size=1024)
+    assert conn._chunk_size == 1024
@@ -0,0 +1,259 @@
+# This is the MIT license: http://www.opensource.org/licenses/mit-license.php
+#
+# Copyright (c) 2005-2012 the SQLAlchemy authors and contributors <see AUTHORS file>.
+# SQLAlchemy is a trademark of Michael Bayer.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify, merge,
+# publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons
+# to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+# PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE
+# FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import mmap
+import os
+import pickle
+import stat
+import time
+import zlib
+from array import array
+from collections import OrderedDict
+from decimal import Decimal
+
+import pytest
+
+from sqlalchemy_drill.drilldbapi import _cache, api_globals
+from sqlalchemy_drill.drilldbapi._cache import CachedResult, DiskResultCache
+
+from .fakes import connect
+
+QUERY = 'select * from dfs.tmp.sales'
+
+
+def _entry(n=3):
+    batches = [[array('q', range(n)), ['x'] * n, [Decimal('1.5'), None, 2.5][:n]]]
+    return CachedResult({'columns': ['i', 's', 'd']}, 'decimal', batches, 100)
+
+
+def _batches(entry):
+    return [[list(column) for column in batch] for batch in entry.batches]
+
+
+def _execute(conn, query=QUERY):
+    cursor = conn.cursor()
+    cursor.execute(query)
+    return cursor.fetchall(), cursor.result_md.get('cached', False)
+
+
+def test_results_are_read_back_from_a_memory_map(tmp_path):
+    cache = DiskResultCache(str(tmp_path), 2 ** 20, 60)
+
+    cache.put('key', _entry())
+    entry = cache.get('key')
+
+    assert isinstance(entry.batches, _cache.MappedBatches)
+    batches = _batches(entry)
+    assert batches == _batches(_entry())
+    assert batches[0][0] == [0, 1, 2]
+    assert entry.result_md == {'columns': ['i', 's', 'd']}
+    assert cache.stats()['hits'] == 1
+    # the map is closed once the batches have been read
+    assert entry.batches._mapped.closed
+
+
+def test_maps_are_closed_when_reading_is_abandoned(tmp_path):
+    cache = DiskResultCache(str(tmp_path), 2 ** 20, 60)
+    cache.put('key', CachedResult({}, 'decimal', _entry().batches * 2, 100))
+    batches = cache.get('key').batches
+
+    reading = iter(batches)
+    next(reading)
+    reading.close()
+
+    assert batches._mapped.closed
+
+
+@pytest.fixture
+def maps(monkeypatch):
+    """The memory maps opened by the disk cache."""
+    opened = []
+
+    class RecordedMap(mmap.mmap):
+        def __new__(cls, *args, **kwargs):
+            mapped = super().__new__(cls, *args, **kwargs)
+            opened.append(mapped)
+            return mapped
+
+    monkeypatch.setattr(mmap, 'mmap', RecordedMap)
+    return opened
+
+
+@pytest.mark.parametrize('ttl', [0, 60])
+def test_maps_of_misses_are_closed(tmp_path, maps, ttl):
+    cache = DiskResultCache(str(tmp_path), 2 ** 20, ttl)
+    cache.put('key', _entry())
+    if ttl:
+        with open(cache._path('key'), 'r+b') as f:
+            f.write(b'garbage')
+
+    assert cache.get('key') is None
+    assert len(maps) == 1 and maps[0].closed
+
+
+def test_hits_are_promoted_to_memory(tmp_path, maps):
+    disk = DiskResultCache(str(tmp_path), 2 ** 20, 60)
+    disk.put('key', _entry())
+    cache = _cache.ResultCache(2 ** 20, 60, disk)
+
+    first, second = cache.get('key'), cache.get('key')
+
+    assert second is first and isinstance(first.batches, list)
+    assert _batches(first) == _batches(_entry())
+    assert len(maps) == 1 and maps[0].closed
+    stats = cache.stats()
+    assert (stats['hits'], stats['entries'], stats['bytes']) == (2, 1, 100)
+    assert stats['disk']['hits'] == 1
+
+
+def test_hits_too_large_for_memory_are_not_promoted(tmp_path):
+    disk = DiskResultCache(str(tmp_path), 2 ** 20, 60)
+    disk.put('key', _entry())
+    cache = _cache.ResultCache(100, 60, disk)
+
+    assert isinstance(cache.get('key').batches, _cache.MappedBatches)
+    assert cache.stats()['entries'] == 0
+
+
+def test_promoted_hits_expire_with_their_file(tmp_path, monkeypatch):
+    disk = DiskResultCache(str(tmp_path), 2 ** 20, 60)
+    disk.put('key', _entry())
+    cache = _cache.ResultCache(2 ** 20, 3600, disk)
+    cache.get('key')
+
+    later = time.monotonic() + 61
+    monkeypatch.setattr(_cache.time, 'monotonic', lambda: later)
+    disk.discard('key')
+
+    assert cache.get('key') is None
+    assert cache.stats()['expirations'] == 1
+
+
+def test_unreadable_batches_are_not_promoted(tmp_path):
+    disk = DiskResultCache(str(tmp_path), 2 ** 20, 60)
+    disk.put('key', CachedResult({}, 'decimal', [[OrderedDict(a=1)]], 100))
+    cache = _cache.ResultCache(2 ** 20, 60, disk)
+
+    assert cache.get('key') is None
+    assert cache.stats()['entries'] == 0
+    assert not os.path.exists(disk._path('key'))
+
+
+def test_directory_is_private(tmp_path):
+    directory = tmp_path / 'results'
+
+    DiskResultCache(str(directory), 2 ** 20, 60)
+
+    assert stat.S_IMODE(os.stat(directory).st_mode) == 0o700
+
+
+def test_instances_share_the_directory(tmp_path):
+    DiskResultCache(str(tmp_path), 2 ** 20, 60, 'http://a').put('key', _entry())
+
+    assert DiskResultCache(str(tmp_path), 2 ** 20, 60, 'http://a').get('key') is not None
+    # the results of another server are kept apart
+    assert DiskResultCache(str(tmp_path), 2 ** 20, 60, 'http://b').get('key') is None
+
+
+def test_connections_of_other_processes_share_results(drill, transport, tmp_path):
+    conn = connect(drill, transport, result_cache_dir=str(tmp_path))
+    rows, _ = _execute(conn)
+
+    # another process has its own registry of caches
+    _cache._caches.clear()
+    other = connect(drill, transport, result_cache_dir=str(tmp_path))
+
+    assert _execute(other) == (rows, True)
+    assert len(drill.queries('sales')) == 1
+
+
+@pytest.mark.parametrize('content', [b'', b'garbage', None])
+def test_unreadable_files_are_misses(tmp_path, content):
+    cache = DiskResultCache(str(tmp_path), 2 ** 20, 60)
+    cache.put('key', _entry())
+    path = cache._path('key')
+    if content is None:
+        # truncated within the header
+        with open(path, 'rb') as f:
+            content = f.read()[:20]
+    with open(path, 'wb') as f:
+        f.write(content)
+
+    assert cache.get('key') is None
+    assert not os.path.exists(path) or content == b''
+    assert cache.stats()['misses'] == 1
+
+
+def test_pickles_may_only_hold_plain_values():
+    assert _cache._loads(_cache._dumps([Decimal('1.5'), None, 'x'])) == [Decimal('1.5'), None, 'x']
+
+    data = zlib.compress(pickle.dumps(OrderedDict()))
+    with pytest.raises(pickle.UnpicklingError):
+        _cache._loads(data)
+
+
+def test_files_referring_to_other_classes_are_rejected(tmp_path):
+    cache = DiskResultCache(str(tmp_path), 2 ** 20, 60)
+    cache.put('header', CachedResult(OrderedDict(), 'decimal', [], 100))
+    cache.put('column', CachedResult({}, 'decimal', [[OrderedDict(a=1)]], 100))
+
+    assert cache.get('header') is None
+    # columns are unpickled as they are fetched
+    with pytest.raises(pickle.UnpicklingError):
+        list(cache.get('column').batches)
+
+
+def test_results_expire(tmp_path):
+    cache = DiskResultCache(str(tmp_path), 2 ** 20, 0)
+    cache.put('key', _entry())
+
+    assert cache.get('key') is None
+    assert cache.stats()['expirations'] == 1
+    assert cache.stats()['entries'] == 0
+
+
+def test_least_recently_used_files_are_evicted(tmp_path):
+    cache = DiskResultCache(str(tmp_path), 2 ** 20, 60)
+    for i, key in enumerate('abc'):
+        cache.put(key, _entry())
+        os.utime(cache._path(key), (time.time() - 100 + i, time.time() - 100 + i))
+    cache.get('a')
+    size = os.path.getsize(cache._path('a'))
+
+    # room for three files, whose compressed headers differ slightly in size
+    cache.max_bytes = 3 * size + size // 2
+    cache.put('d', _entry())
+
+    assert cache.get('b') is None
+    assert all(cache.get(k) is not None for k in 'acd')
+    assert cache.stats()['evictions'] == 1
+
+
+def test_stale_temporary_files_are_removed(tmp_path):
+    stale = tmp_path / (api_globals._CACHE_TMP_PREFIX + 'dead')
+    fresh = tmp_path / (api_globals._CACHE_TMP_PREFIX + 'writing')
+    for path in (stale, fresh):
+        path.write_bytes(b'partial')
+    old = time.time() - api_globals._CACHE_TMP_MAX_AGE_S - 1
+    os.utime(stale, (old, old))
+
+    DiskResultCache(str(tmp_path), 2 ** 20, 60).put('key', _entry())
+
+    assert not stale.exists() and fresh.exists()
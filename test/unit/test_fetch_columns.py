@@ -0,0 +1,115 @@
+# This is the MIT license: http://www.opensource.org/licenses/mit-license.php
+#
+# Copyright (c) 2005-2012 the SQLAlchemy authors and contributors <see AUTHORS file>.
+# SQLAlchemy is a trademark of Michael Bayer.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify, merge,
+# publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons
+# to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+# PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE
+# FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+from array import array
+
+import pytest
+
+from sqlalchemy_drill.drilldbapi import ProgrammingError
+
+from .fakes import connect
+
+
+@pytest.fixture
+def cursor(drill):
+    cursor = connect(drill, numbers='float').cursor()
+    cursor.execute('select * from dfs.tmp.sales')
+    return cursor
+
+
+def test_columns_are_in_description_order(cursor):
+    ids, regions, amounts = cursor.fetch_columns(3)
+
+    assert [d[0] for d in cursor.description] == ['id', 'region', 'amount']
+    assert ids == array('q', [0, 1, 2])
+    assert regions == ['south', 'north', 'south']
+    assert amounts == array('d', [0.5, 1.5, 2.5])
+
+
+def test_size_defaults_to_arraysize(cursor):
+    cursor.arraysize = 4
+
+    ids, _, _ = cursor.fetch_columns()
+
+    assert list(ids) == [0, 1, 2, 3]
+
+
+def test_size_spans_batch_boundaries(cursor):
+    cursor.fetch_columns(900)
+
+    ids, regions, _ = cursor.fetch_columns(1200)
+
+    assert list(ids) == list(range(900, 2100))
+    assert len(regions) == 1200
+    assert cursor.rownumber == 2100
+
+
+def test_negative_size_fetches_the_rest(cursor):
+    cursor.fetch_columns(10)
+
+    ids, _, _ = cursor.fetch_columns(-1)
+
+    assert list(ids) == list(range(10, 2500))
+    assert cursor.rowcount == 2500
+
+
+def test_interleaves_with_fetchone_and_fetchmany(cursor):
+    assert cursor.fetchone()[0] == 0
+    ids, _, _ = cursor.fetch_columns(2)
+    assert list(ids) == [1, 2]
+    assert [r[0] for r in cursor.fetchmany(2)] == [3, 4]
+    assert next(cursor)[0] == 5
+    ids, _, _ = cursor.fetch_columns(999)
+    assert list(ids) == list(range(6, 1005))
+    assert cursor.fetchone()[0] == 1005
+
+
+def test_exhausted_results_give_empty_columns(cursor):
+    cursor.fetch_columns(-1)
+
+    # the containers keep the types of those holding rows
+    assert cursor.fetch_columns(5) == [array('q'), [], array('d')]
+    assert cursor.fetchone() is None
+    assert cursor.rowcount == 2500
+
+
+def test_columns_with_nulls_are_lists(drill):
+    drill.add_table('dfs.tmp.nulls', ['n', 'x'], ['INT', 'FLOAT8'], [[1, None], [None, 2.0]])
+    cursor = connect(drill, numbers='float').cursor()
+    cursor.execute('select * from dfs.tmp.nulls')
+
+    assert cursor.fetch_columns(-1) == [[1, None], [None, 2.0]]
+
+
+def test_values_are_typecast(drill):
+    drill.add_table('dfs.tmp.dates', ['d'], ['DATE'], [[0], [86_400_000]])
+    cursor = connect(drill).cursor()
+    cursor.execute('select * from dfs.tmp.dates')
+
+    (dates,) = cursor.fetch_columns(-1)
+
+    assert [d.isoformat() for d in dates] == ['1970-01-01', '1970-01-02']
+
+
+def test_requires_row_data(drill):
+    cursor = connect(drill).cursor()
+
+    with pytest.raises(ProgrammingError):
+        cursor.fetch_columns(1)
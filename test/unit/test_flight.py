@@ -0,0 +1,222 @@
+# This is the MIT license: http://www.opensource.org/licenses/mit-license.php
+#
+# Copyright (c) 2005-2012 the SQLAlchemy authors and contributors <see AUTHORS file>.
+# SQLAlchemy is a trademark of Michael Bayer.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify, merge,
+# publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons
+# to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+# PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE
+# FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import threading
+import time
+
+import pytest
+
+from sqlalchemy_drill.drilldbapi import OperationalError, api_globals
+from sqlalchemy_drill.drilldbapi._flight import _flights
+
+from .fakes import connect, wait_for
+
+QUERY = 'select * from dfs.tmp.sales'
+
+
+@pytest.fixture
+def conn(drill, transport):
+    return connect(drill, transport, single_flight=True, whole_body_bytes=0)
+
+
+@pytest.fixture
+def held(drill):
+    """Holds up the responses to QUERY until set."""
+    release = threading.Event()
+
+    def respond(payload):
+        assert release.wait(5)
+        return 200, drill.result(*drill.tables['dfs.tmp.sales'])
+
+    drill.handlers.append((r'select \* from dfs\.tmp\.sales', respond))
+    yield release
+    release.set()
+
+
+def _flight_of(cursor):
+    return cursor._batch_stream._flight
+
+
+def test_cursors_join_a_query_in_flight(drill, conn, held):
+    cursors = [conn.cursor() for _ in range(4)]
+    executed = threading.Barrier(len(cursors), timeout=5)
+    results = {}
+
+    def run(cursor):
+        cursor.execute(QUERY)
+        # a query can no longer be joined once rows have been dropped
+        executed.wait()
+        results[cursor] = cursor.fetchall()
+
+    threads = [threading.Thread(target=run, args=(c,)) for c in cursors]
+    threads[0].start()
+    wait_for(lambda: drill.queries('sales'))
+    for thread in threads[1:]:
+        thread.start()
+    # the other cursors wait for the query to have been sent
+    time.sleep(0.2)
+    held.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(drill.queries('sales')) == 1
+    assert all(len(rows) == 2500 for rows in results.values()) and len(results) == 4
+    assert sum(bool(c.result_md.get('coalesced')) for c in cursors) == 3
+    assert not _flights
+
+
+def test_cursors_fetch_concurrently(drill, conn):
+    cursors = [conn.cursor() for _ in range(4)]
+    for cursor in cursors:
+        cursor.execute(QUERY)
+    results = []
+
+    def fetch(cursor):
+        results.append([cursor.fetchmany(7) for _ in range(400)])
+
+    threads = [threading.Thread(target=fetch, args=(c,)) for c in cursors]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(drill.queries('sales')) == 1
+    assert all(r == results[0] for r in results) and len(results) == 4
+    assert sum(len(chunk) for chunk in results[0]) == 2500
+
+
+def test_abandoned_query_is_cancelled_once(drill, conn):
+    cursors = [conn.cursor() for _ in range(4)]
+    for cursor in cursors:
+        cursor.execute(QUERY)
+    for cursor in cursors:
+        cursor.fetchmany(10)
+    query_id = cursors[0].result_md['queryId']
+
+    threads = [threading.Thread(target=c.close) for c in cursors]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert drill.cancelled == [query_id]
+
+
+def test_cursor_closed_early_leaves_the_others_reading(drill, conn):
+    first, second = conn.cursor(), conn.cursor()
+    first.execute(QUERY)
+    second.execute(QUERY)
+    first.fetchmany(10)
+
+    first.close()
+
+    assert len(second.fetchall()) == 2500
+    assert not drill.cancelled
+
+
+def test_batches_are_kept_for_the_slowest_cursor(drill, conn):
+    fast, slow = conn.cursor(), conn.cursor()
+    fast.execute(QUERY)
+    slow.execute(QUERY)
+    flight = _flight_of(fast)
+
+    fast.fetchmany(1500)
+    assert len(flight._batches) == 2
+    slow.fetchmany(1000)
+    assert len(flight._batches) == 1
+    slow.fetchmany(500)
+    assert len(flight._batches) == 0
+
+    assert len(fast.fetchall()) == 1000 and len(slow.fetchall()) == 1000
+
+
+def test_slow_cursor_is_detached(drill, conn, monkeypatch):
+    monkeypatch.setattr(api_globals, '_FLIGHT_MAX_BATCHES', 1)
+    fast, idle = conn.cursor(), conn.cursor()
+    fast.execute(QUERY)
+    idle.execute(QUERY)
+    flight = _flight_of(fast)
+
+    assert len(fast.fetchall()) == 2500
+
+    assert len(flight._batches) <= 1
+    with pytest.raises(OperationalError, match='behind'):
+        idle.fetchone()
+    idle.close()
+    assert not drill.cancelled
+
+
+def test_flights_of_other_schemas_are_not_joined(drill, transport):
+    for schema in ('a', 'b'):
+        drill.add_table(f'dfs.{schema}.t', ['schema'], ['VARCHAR'], [[schema]])
+    cursors = []
+    for schema in ('a', 'b'):
+        cursor = connect(drill, transport, single_flight=True, whole_body_bytes=0).cursor()
+        cursor.execute(f'USE dfs.{schema}')
+        cursor.execute('select * from t')
+        cursors.append(cursor)
+
+    assert [c.fetchall() for c in cursors] == [[('a',)], [('b',)]]
+    assert not any(c.result_md.get('coalesced') for c in cursors)
+
+
+def test_cursors_join_while_a_batch_is_read(drill, transport, conn):
+    # the drillbit stalls after the leading metadata and part of the rows
+    drill.stall_after = 4096
+    reader, waiter = conn.cursor(), conn.cursor()
+    reader.execute(QUERY)
+    waiter.execute(QUERY)
+    flight = _flight_of(reader)
+    errors = []
+
+    def fetch(cursor):
+        try:
+            cursor.fetchone()
+        except Exception as ex:  # pylint: disable=broad-except
+            errors.append(ex)
+
+    fetchers = [threading.Thread(target=fetch, args=(c,)) for c in (reader, waiter)]
+    fetchers[0].start()
+    wait_for(lambda: flight._reading)
+    # the other consumer waits for the batch being read
+    fetchers[1].start()
+    time.sleep(0.2)
+
+    joiner = conn.cursor()
+    joining = threading.Thread(target=joiner.execute, args=(QUERY,))
+    joining.start()
+    joining.join(2)
+
+    assert not joining.is_alive()
+    assert joiner.result_md.get('coalesced')
+    assert all(f.is_alive() for f in fetchers)
+
+    # the last cursor to leave wakes the stalled read, which closes the query
+    for cursor in (reader, waiter, joiner):
+        cursor.close()
+    for fetcher in fetchers:
+        fetcher.join(5)
+
+    assert not any(f.is_alive() for f in fetchers)
+    # the fetches fail with the error of the interrupted read
+    assert len(errors) == 2 and errors[0] is errors[1]
+    assert drill.cancelled == [reader.result_md['queryId']]
+    assert transport.open_responses == 0
+    assert not _flights
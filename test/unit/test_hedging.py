@@ -0,0 +1,117 @@
+# This is the MIT license: http://www.opensource.org/licenses/mit-license.php
+#
+# Copyright (c) 2005-2012 the SQLAlchemy authors and contributors <see AUTHORS file>.
+# SQLAlchemy is a trademark of Michael Bayer.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify, merge,
+# publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons
+# to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+# PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE
+# FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import time
+
+import pytest
+
+from sqlalchemy_drill.drilldbapi import api_globals
+from sqlalchemy_drill.drilldbapi._balancer import Balancer
+
+from .fakes import BASE_URL, connect, wait_for
+
+NODE1 = 'http://node1:8047'
+
+
+@pytest.fixture(autouse=True)
+def short_hedge_delay(monkeypatch):
+    monkeypatch.setattr(api_globals, '_HEDGE_INITIAL_DELAY_S', 0.05)
+
+
+def _hedging_connection(drill, transport):
+    conn = connect(drill, transport, hosts=['node1'], hedge_percentile=95)
+    # the first attempt of the next query goes to the drillbit of the URL
+    conn._balancer._next = 0
+    return conn
+
+
+def test_slow_query_is_hedged_and_cancelled(drill, transport):
+    conn = _hedging_connection(drill, transport)
+    drill.delays[BASE_URL] = 0.5
+
+    start = time.monotonic()
+    cursor = conn.cursor()
+    cursor.execute('select * from dfs.tmp.sales')
+    rows = cursor.fetchall()
+
+    assert time.monotonic() - start < 0.5
+    assert len(rows) == 2500
+    first, second = cursor.result_md['hedgeAttempts']
+    assert (first['drillbit'], first['outcome']) == (BASE_URL, 'cancelled')
+    assert (second['drillbit'], second['outcome']) == (NODE1, 'chosen')
+
+    # the slower attempt is cancelled once it has responded with its ID
+    wait_for(lambda: drill.cancelled)
+    assert drill.cancelled == [first['queryId']]
+    wait_for(lambda: transport.open_responses == 0)
+
+
+def test_prompt_query_is_not_hedged(drill, transport):
+    conn = _hedging_connection(drill, transport)
+
+    cursor = conn.cursor()
+    cursor.execute('select * from dfs.tmp.sales')
+    cursor.fetchall()
+
+    assert cursor.result_md['hedgeAttempts'] == [{'drillbit': BASE_URL, 'outcome': 'chosen'}]
+    assert len(drill.queries('dfs.tmp.sales')) == 1
+    assert not drill.cancelled
+
+
+def test_failed_attempt_leaves_the_other(drill, transport):
+    conn = _hedging_connection(drill, transport)
+    drill.delays[BASE_URL] = 0.2
+    drill.down.add(NODE1)
+
+    cursor = conn.cursor()
+    cursor.execute('select * from dfs.tmp.sales')
+
+    assert len(cursor.fetchall()) == 2500
+    first, second = cursor.result_md['hedgeAttempts']
+    assert (first['drillbit'], first['outcome']) == (BASE_URL, 'chosen')
+    assert (second['drillbit'], second['outcome']) == (NODE1, 'failed')
+
+
+def test_writes_are_not_hedged(drill, transport):
+    drill.handlers.append((
+        r'create table .*',
+        lambda payload: (200, drill.result(['ok'], ['BOOLEAN'], [[True]]))
+    ))
+    conn = _hedging_connection(drill, transport)
+    drill.delays[BASE_URL] = 0.2
+
+    cursor = conn.cursor()
+    cursor.execute('create table dfs.tmp.t as select * from dfs.tmp.sales')
+
+    assert cursor.fetchall() == [(True,)]
+    assert drill.requests[-1][0] == BASE_URL
+    assert len(drill.queries('create table')) == 1
+    assert 'hedgeAttempts' not in cursor.result_md
+
+
+def test_hedge_delay_is_a_percentile_of_latencies():
+    balancer = Balancer(['http://a', 'http://b'])
+    assert balancer.hedge_delay(95) == api_globals._HEDGE_INITIAL_DELAY_S
+
+    for ms in range(1, 101):
+        balancer.record_latency(ms / 1000)
+
+    assert balancer.hedge_delay(95) == pytest.approx(0.096)
+    assert balancer.hedge_delay(0) == api_globals._HEDGE_MIN_DELAY_S
@@ -0,0 +1,97 @@
+# This is the MIT license: http://www.opensource.org/licenses/mit-license.php
+#
+# Copyright (c) 2005-2012 the SQLAlchemy authors and contributors <see AUTHORS file>.
+# SQLAlchemy is a trademark of Michael Bayer.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify, merge,
+# publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons
+# to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+# PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE
+# FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import pytest
+
+from sqlalchemy_drill.drilldbapi import CursorClosedException, ProgrammingError
+
+from .fakes import connect
+
+
+@pytest.fixture
+def cursor(drill):
+    cursor = connect(drill, numbers='float').cursor()
+    cursor.execute('select * from dfs.tmp.sales')
+    return cursor
+
+
+def test_iterates_over_every_row(cursor):
+    rows = list(cursor)
+
+    assert len(rows) == 2500
+    assert rows[0] == (0, 'south', 0.5)
+    assert rows[-1] == (2499, 'north', 2499.5)
+    assert cursor.rownumber == cursor.rowcount == 2500
+
+
+def test_stops_at_the_end_every_time(cursor):
+    list(cursor)
+
+    with pytest.raises(StopIteration):
+        next(cursor)
+    with pytest.raises(StopIteration):
+        next(cursor)
+    assert cursor.fetchone() is None
+
+
+def test_cursor_is_its_own_iterator(cursor):
+    assert iter(cursor) is cursor
+
+
+def test_rownumber_follows_iteration(cursor):
+    for i, row in enumerate(cursor, 1):
+        assert row[0] == i - 1
+        assert cursor.rownumber == i
+        if i == 1001:
+            break
+
+    assert cursor.rownumber == 1001
+
+
+def test_iteration_mixes_with_fetchmany(cursor):
+    head = [next(cursor) for _ in range(3)]
+    middle = cursor.fetchmany(1000)
+    rest = [row for row in cursor]
+
+    assert [r[0] for r in head + middle + rest] == list(range(2500))
+    assert cursor.rownumber == 2500
+
+
+def test_fetchmany_skips_rows_buffered_for_iteration(cursor):
+    next(cursor)
+
+    assert [r[0] for r in cursor.fetchmany(2)] == [1, 2]
+    assert next(cursor)[0] == 3
+    assert cursor.rownumber == 4
+
+
+def test_cursors_without_a_result_raise(drill):
+    cursor = connect(drill).cursor()
+
+    with pytest.raises(ProgrammingError):
+        next(cursor)
+
+
+def test_closed_cursors_cannot_be_iterated(cursor):
+    next(cursor)
+    cursor.close()
+
+    with pytest.raises(CursorClosedException):
+        next(cursor)
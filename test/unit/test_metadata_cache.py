@@ -0,0 +1,129 @@
+# This is the MIT license: http://www.opensource.org/licenses/mit-license.php
+#
+# Copyright (c) 2005-2012 the SQLAlchemy authors and contributors <see AUTHORS file>.
+# SQLAlchemy is a trademark of Michael Bayer.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify, merge,
+# publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons
+# to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+# PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE
+# FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import time
+from collections import namedtuple
+
+import pytest
+from sqlalchemy.engine import make_url
+
+from sqlalchemy_drill.base import DrillDialect
+from sqlalchemy_drill.sadrill import DrillDialect_sadrill
+
+Schema = namedtuple('Schema', ['SCHEMA_NAME'])
+
+
+class FakeConnection:
+    """A SQLAlchemy connection answering SHOW DATABASES."""
+
+    def __init__(self):
+        self.queries = []
+        self.schemas = ['dfs.tmp', 'cp.default']
+
+    def execute(self, query):
+        self.queries.append(query)
+        return [Schema(name) for name in self.schemas]
+
+
+class FakeCursor:
+    def __init__(self):
+        self.executed = []
+
+    def execute(self, statement, parameters=(), options=None):
+        self.executed.append(statement)
+
+    def executemany(self, statement, seq_of_parameters, options=None):
+        self.executed.append(statement)
+
+
+@pytest.fixture
+def connection():
+    return FakeConnection()
+
+
+def test_cache_is_off_by_default(connection):
+    dialect = DrillDialect()
+
+    dialect.get_schema_names(connection)
+    dialect.get_schema_names(connection)
+
+    assert dialect.metadata_cache_ttl == 0
+    assert len(connection.queries) == 2
+
+
+def test_reflection_is_cached(connection):
+    dialect = DrillDialect(metadata_cache_ttl=60)
+
+    schemas = dialect.get_schema_names(connection)
+    connection.schemas.append('dfs.new')
+
+    assert dialect.get_schema_names(connection) == schemas == ('dfs.tmp',)
+    assert len(connection.queries) == 1
+
+
+def test_cached_metadata_expires(connection, monkeypatch):
+    dialect = DrillDialect(metadata_cache_ttl=60)
+    dialect.get_schema_names(connection)
+
+    later = time.monotonic() + 61
+    monkeypatch.setattr('sqlalchemy_drill.base.time.monotonic', lambda: later)
+    dialect.get_schema_names(connection)
+
+    assert len(connection.queries) == 2
+
+
+def test_ttl_is_taken_from_the_url():
+    dialect = DrillDialect_sadrill()
+
+    dialect.create_connect_args(make_url('drill+sadrill://localhost:8047/dfs?metadata_cache_ttl=300'))
+
+    assert dialect.metadata_cache_ttl == 300
+
+
+@pytest.mark.parametrize('dialect_class', [DrillDialect, DrillDialect_sadrill])
+@pytest.mark.parametrize('execute', [
+    lambda d, c, s: d.do_execute(c, s, ()),
+    lambda d, c, s: d.do_execute_no_params(c, s),
+    lambda d, c, s: d.do_executemany(c, s, [(1,), (2,)]),
+], ids=['execute', 'execute_no_params', 'executemany'])
+def test_ddl_clears_the_cache(connection, dialect_class, execute):
+    # the JDBC and ODBC dialects execute statements as DrillDialect does
+    dialect = dialect_class(metadata_cache_ttl=60)
+    cursor = FakeCursor()
+    dialect.get_schema_names(connection)
+
+    execute(dialect, cursor, 'select * from dfs.tmp.t')
+    dialect.get_schema_names(connection)
+    assert len(connection.queries) == 1
+
+    execute(dialect, cursor, '  CREATE TABLE dfs.tmp.t2 AS select 1')
+    dialect.get_schema_names(connection)
+    assert len(connection.queries) == 2
+    assert cursor.executed == ['select * from dfs.tmp.t', '  CREATE TABLE dfs.tmp.t2 AS select 1']
+
+
+def test_cache_can_be_cleared(connection):
+    dialect = DrillDialect(metadata_cache_ttl=60)
+    dialect.get_schema_names(connection)
+
+    dialect.clear_metadata_cache()
+    dialect.get_schema_names(connection)
+
+    assert len(connection.queries) == 2
@@ -0,0 +1,115 @@
+# This is the MIT license: http://www.opensource.org/licenses/mit-license.php
+#
+# Copyright (c) 2005-2012 the SQLAlchemy authors and contributors <see AUTHORS file>.
+# SQLAlchemy is a trademark of Michael Bayer.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify, merge,
+# publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons
+# to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+# PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE
+# FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+from datetime import time
+
+import pytest
+
+from .fakes import FakeDrill, connect
+
+pd = pytest.importorskip('pandas')
+np = pytest.importorskip('numpy')
+
+_COLUMNS = ['id', 'ok', 'day', 'at', 'clock', 'score', 'name']
+_TYPES = ['BIGINT', 'BIT', 'DATE', 'TIMESTAMP', 'TIME', 'FLOAT8', 'VARCHAR']
+
+
+def _events_drill(version: str, rows: list) -> FakeDrill:
+    drill = FakeDrill(version)
+    drill.add_table('dfs.tmp.events', _COLUMNS, _TYPES, rows)
+    return drill
+
+
+def _frame(drill, **kwargs):
+    cursor = connect(drill, **kwargs).cursor()
+    cursor.execute('select * from dfs.tmp.events')
+    return cursor.fetch_df()
+
+
+def test_columns_are_typed_by_drill_type():
+    drill = _events_drill('1.21.0', [
+        [1, True, 1622505600000, 1622550645123, 45045500, 1.5, 'a'],
+        [2, False, None, 1622550600000, 0, None, None],
+    ])
+
+    df = _frame(drill, numbers='float')
+
+    assert df.dtypes[:-1].to_dict() == {
+        'id': np.dtype('int64'), 'ok': np.dtype('bool'),
+        'day': np.dtype('datetime64[ms]'), 'at': np.dtype('datetime64[ms]'),
+        'clock': np.dtype('object'), 'score': np.dtype('float64'),
+    }
+    assert df['day'][0] == pd.Timestamp('2021-06-01') and pd.isna(df['day'][1])
+    assert df['at'][0] == pd.Timestamp('2021-06-01 12:30:45.123')
+    assert df['clock'][0] == time(12, 30, 45, 500000)
+    assert np.isnan(df['score'][1])
+
+
+def test_nullable_columns_use_nullable_dtypes():
+    drill = _events_drill('1.21.0', [
+        [None, None, None, None, None, None, None],
+        [1, True, 0, 0, 0, 1.5, 'a'],
+    ])
+
+    df = _frame(drill)
+
+    assert str(df['id'].dtype) == 'Int64' and pd.isna(df['id'][0])
+    assert str(df['ok'].dtype) == 'boolean' and pd.isna(df['ok'][0])
+
+
+def test_strings_from_drill_before_1_19_are_parsed():
+    # Drill < 1.19 sends every value as a string
+    drill = _events_drill('1.17.0', [
+        ['1', 'true', '2021-06-01', '2021-06-01T12:30:45.123', '12:30:45', '1.5', 'a'],
+        [None, 'false', None, '2021-06-01T12:30', '00:00:00', None, None],
+    ])
+
+    df = _frame(drill)
+
+    assert str(df['id'].dtype) == 'Int64' and df['id'][0] == 1
+    assert df['ok'].tolist() == [True, False]
+    assert df['day'].dtype == np.dtype('datetime64[ms]')
+    assert df['day'][0] == pd.Timestamp('2021-06-01') and pd.isna(df['day'][1])
+    assert df['at'].tolist() == [
+        pd.Timestamp('2021-06-01 12:30:45.123'), pd.Timestamp('2021-06-01 12:30')
+    ]
+    assert df['score'][0] == 1.5
+    # there is no dtype for times, which are left as Drill sent them
+    assert df['clock'][0] == '12:30:45'
+
+
+def test_iter_df_yields_chunks(drill):
+    cursor = connect(drill).cursor()
+    cursor.execute('select * from dfs.tmp.sales')
+
+    chunks = list(cursor.iter_df(1000))
+
+    assert [len(c) for c in chunks] == [1000, 1000, 500]
+    assert chunks[2]['id'].iloc[-1] == 2499
+    assert cursor.fetch_df().empty
+
+
+def test_results_without_rows_have_columns():
+    drill = _events_drill('1.21.0', [])
+
+    df = _frame(drill)
+
+    assert df.empty
+    assert list(df.columns) == _COLUMNS
@@ -0,0 +1,86 @@
+# This is the MIT license: http://www.opensource.org/licenses/mit-license.php
+#
+# Copyright (c) 2005-2012 the SQLAlchemy authors and contributors <see AUTHORS file>.
+# SQLAlchemy is a trademark of Michael Bayer.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify, merge,
+# publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons
+# to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+# PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE
+# FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import threading
+import time
+
+import ijson
+import pytest
+
+from .fakes import connect
+
+
+def test_prefetched_rows_match_streamed_rows(drill):
+    streamed = connect(drill, whole_body_bytes=0).cursor()
+    streamed.execute('select * from dfs.tmp.sales')
+    prefetched = connect(drill, prefetch=2, whole_body_bytes=0).cursor()
+    prefetched.execute('select * from dfs.tmp.sales')
+
+    assert prefetched._prefetcher is not None
+    assert prefetched.fetchall() == streamed.fetchall()
+    assert prefetched._prefetcher is None
+    assert prefetched.result_md['queryState'] == 'COMPLETED'
+
+
+def test_producer_errors_are_raised_by_fetch(drill):
+    drill.handlers.append((
+        'select broken', lambda payload: (200, b'{"queryId": "q", "columns": ["a"], '
+                                              b'"metadata": ["INT"], "rows": [{"a": 1}, {"a": ')
+    ))
+    cursor = connect(drill, prefetch=2, whole_body_bytes=0).cursor()
+    cursor.execute('select broken')
+
+    with pytest.raises(ijson.IncompleteJSONError):
+        cursor.fetchall()
+
+
+def test_closing_early_stops_the_producer(drill, transport):
+    cursor = connect(drill, transport, prefetch=1, whole_body_bytes=0).cursor()
+    cursor.execute('select * from dfs.tmp.sales')
+    cursor.fetchone()
+    thread = cursor._prefetcher._thread
+
+    cursor.close()
+
+    assert not thread.is_alive()
+    assert transport.open_responses == 0
+    assert drill.cancelled == [cursor.result_md['queryId']]
+
+
+def test_closing_during_a_stalled_read_does_not_wait_for_the_join_timeout(drill, transport):
+    # the drillbit stalls after the leading metadata and part of the rows
+    drill.stall_after = 4096
+    cursor = connect(drill, transport, prefetch=2, chunk_size=1024, whole_body_bytes=0).cursor()
+    cursor.execute('select * from dfs.tmp.sales')
+    thread = cursor._prefetcher._thread
+    # the producer is now blocked reading the first batch
+    time.sleep(0.2)
+    assert thread.is_alive()
+
+    closer = threading.Thread(target=cursor.close)
+    start = time.monotonic()
+    closer.start()
+    closer.join(5)
+
+    assert not closer.is_alive()
+    assert time.monotonic() - start < 2
+    assert not thread.is_alive()
+    assert transport.open_responses == 0
+    assert drill.cancelled == [cursor.result_md['queryId']]
@@ -0,0 +1,127 @@
+# This is the MIT license: http://www.opensource.org/licenses/mit-license.php
+#
+# Copyright (c) 2005-2012 the SQLAlchemy authors and contributors <see AUTHORS file>.
+# SQLAlchemy is a trademark of Michael Bayer.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify, merge,
+# publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons
+# to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+# PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE
+# FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import re
+
+import pytest
+from sqlalchemy import create_engine, exc, text
+from sqlalchemy.dialects import registry
+
+from sqlalchemy_drill.drilldbapi import ProgrammingError, _transport
+
+from .fakes import FakeTransport, connect
+
+QUERY = 'select * from dfs.tmp.sales'
+INSERT = r'insert into dfs\.tmp\.t values \(\d+\)'
+
+
+def _payloads(drill, pattern):
+    return [p for _, p in drill.requests if re.fullmatch(pattern, p['query'])]
+
+
+@pytest.fixture
+def inserts(drill):
+    drill.handlers.append(
+        (INSERT, lambda payload: (200, drill.result(['ok'], ['BIT'], [[True]])))
+    )
+
+
+@pytest.fixture
+def engine(drill, monkeypatch):
+    """An engine of the drill+sadrill dialect whose connections talk to the fake Drill."""
+    registry.register('drill.sadrill', 'sqlalchemy_drill.sadrill', 'DrillDialect_sadrill')
+    monkeypatch.setitem(
+        _transport._TRANSPORTS, 'urllib3', lambda **kwargs: FakeTransport(drill)
+    )
+    engine = create_engine('drill+sadrill://drill:8047/dfs/tmp')
+    yield engine
+    engine.dispose()
+
+
+@pytest.mark.parametrize('options, expected', [
+    ({'autoLimit': 10}, '10'),
+    ({'autoLimit': '10'}, '10'),
+    ({'autoLimit': 0}, '0'),
+])
+def test_auto_limit_is_sent_as_a_string(drill, options, expected):
+    cursor = connect(drill).cursor()
+
+    cursor.execute(QUERY, options=options)
+
+    assert _payloads(drill, re.escape(QUERY))[-1]['autoLimit'] == expected
+
+
+def test_default_schema_is_sent(drill):
+    cursor = connect(drill).cursor()
+
+    cursor.execute('select * from sales', options={'defaultSchema': 'dfs.tmp'})
+
+    assert len(cursor.fetchall()) == 2500
+    assert drill.requests[-1][1]['defaultSchema'] == 'dfs.tmp'
+
+
+@pytest.mark.parametrize('options', [
+    {'autoLimit': -1},
+    {'autoLimit': '-1'},
+    {'autoLimit': 1.5},
+    {'autoLimit': 'ten'},
+    {'autoLimit': True},
+    {'defaultSchema': 3},
+])
+def test_bad_options_are_rejected(drill, options):
+    cursor = connect(drill).cursor()
+
+    with pytest.raises(ProgrammingError):
+        cursor.execute(QUERY, options=options)
+    assert _payloads(drill, re.escape(QUERY)) == []
+
+
+def test_executemany_sends_the_options(drill, inserts):
+    cursor = connect(drill).cursor()
+
+    cursor.executemany('insert into dfs.tmp.t values (?)', [(1,), (2,)], {'autoLimit': 5})
+
+    assert [p['autoLimit'] for p in _payloads(drill, INSERT)] == ['5', '5']
+
+
+def test_execution_options_set_the_payload(drill, engine):
+    with engine.connect() as conn:
+        conn = conn.execution_options(drill_auto_limit=100, drill_default_schema='dfs.tmp')
+        conn.execute(text(QUERY)).fetchall()
+
+    payload = _payloads(drill, re.escape(QUERY))[-1]
+    assert payload['autoLimit'] == '100'
+    assert payload['defaultSchema'] == 'dfs.tmp'
+
+
+def test_execution_options_apply_to_executemany(drill, engine, inserts):
+    with engine.connect() as conn:
+        conn = conn.execution_options(drill_auto_limit=7, drill_default_schema='dfs.tmp')
+        conn.execute(text('insert into dfs.tmp.t values (:n)'), [{'n': 1}, {'n': 2}])
+
+    payloads = _payloads(drill, INSERT)
+    assert [p['autoLimit'] for p in payloads] == ['7', '7']
+    assert [p['defaultSchema'] for p in payloads] == ['dfs.tmp', 'dfs.tmp']
+
+
+def test_bad_execution_options_are_rejected(drill, engine):
+    with engine.connect() as conn:
+        with pytest.raises(exc.ProgrammingError):
+            conn.execution_options(drill_auto_limit=-5).execute(text(QUERY))
@@ -0,0 +1,113 @@
+# This is the MIT license: http://www.opensource.org/licenses/mit-license.php
+#
+# Copyright (c) 2005-2012 the SQLAlchemy authors and contributors <see AUTHORS file>.
+# SQLAlchemy is a trademark of Michael Bayer.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify, merge,
+# publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons
+# to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+# PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE
+# FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import pytest
+
+from sqlalchemy_drill.drilldbapi import DatabaseError, OperationalError
+from sqlalchemy_drill.drilldbapi._balancer import Balancer
+
+from .fakes import BASE_URL, connect
+
+QUERY = 'select * from dfs.tmp.sales'
+
+
+def _execute(conn, query=QUERY):
+    cursor = conn.cursor()
+    cursor.execute(query)
+    return cursor.fetchall()
+
+
+@pytest.fixture
+def conn(drill, transport):
+    return connect(drill, transport, retry_backoff=0)
+
+
+@pytest.mark.parametrize('failure', [
+    (503, 'Service Unavailable'),
+    (500, 'SYSTEM ERROR: ForemanException: Drillbit down'),
+])
+def test_transient_failures_are_retried(drill, conn, failure):
+    drill.failures = [failure]
+
+    assert len(_execute(conn)) == 2500
+    assert len(drill.queries('dfs.tmp.sales')) == 2
+
+
+def test_query_errors_are_not_retried(drill, conn):
+    drill.failures = [(500, 'PARSE ERROR: Encountered "selec"')]
+
+    with pytest.raises(DatabaseError, match='PARSE ERROR'):
+        _execute(conn)
+    assert len(drill.queries('dfs.tmp.sales')) == 1
+
+
+def test_writes_are_not_retried(drill, conn):
+    drill.failures = [(503, 'Service Unavailable')]
+
+    with pytest.raises(DatabaseError):
+        _execute(conn, 'create table dfs.tmp.t as select * from dfs.tmp.sales')
+    assert len(drill.queries('create table')) == 1
+
+
+def test_retries_are_limited(drill, transport):
+    conn = connect(drill, transport, retries=2, retry_backoff=0)
+    drill.failures = [(503, 'Service Unavailable')] * 3
+
+    with pytest.raises(DatabaseError) as excinfo:
+        _execute(conn)
+    assert excinfo.value.httperror == 503
+    assert len(drill.queries('dfs.tmp.sales')) == 3
+
+
+def test_retries_back_off_with_jitter(drill, transport, monkeypatch):
+    conn = connect(drill, transport, retries=3, retry_backoff=0.1)
+    delays = []
+    monkeypatch.setattr(transport, 'sleep', delays.append)
+    drill.failures = [(503, 'Service Unavailable')] * 2
+
+    _execute(conn)
+
+    assert len(delays) == 2
+    assert all(0 <= d <= 0.1 * 2 ** i for i, d in enumerate(delays))
+
+
+def test_retry_budget_is_drained_by_failures():
+    balancer = Balancer(['http://a'])
+    assert balancer.allows_retry()
+
+    for _ in range(5):
+        balancer.record_outcome(False)
+    assert not balancer.allows_retry()
+
+    for _ in range(10):
+        balancer.record_outcome(True)
+    assert balancer.allows_retry()
+
+
+def test_unreachable_drill_opens_the_circuit(drill, conn):
+    drill.down.add(BASE_URL)
+
+    with pytest.raises(OperationalError, match='connection refused'):
+        _execute(conn)
+    # the breaker fails fast without reaching for the drillbit
+    with pytest.raises(OperationalError, match='unavailable'):
+        _execute(conn)
+
+    assert conn._balancer.circuit_open()
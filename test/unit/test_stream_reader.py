@@ -0,0 +1,131 @@
+# This is the MIT license: http://www.opensource.org/licenses/mit-license.php
+#
+# Copyright (c) 2005-2012 the SQLAlchemy authors and contributors <see AUTHORS file>.
+# SQLAlchemy is a trademark of Michael Bayer.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify, merge,
+# publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons
+# to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+# PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE
+# FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import io
+
+from sqlalchemy_drill.drilldbapi._parsing import ResponseStreamWrapper
+from sqlalchemy_drill.drilldbapi._transport import HTTPResponse
+
+from .fakes import connect
+
+
+class CountingStream(io.RawIOBase):
+    """A raw stream recording the size of each read made from it."""
+
+    def __init__(self, data: bytes):
+        super().__init__()
+        self._data = io.BytesIO(data)
+        self.reads = []
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        n = self._data.readinto(b)
+        self.reads.append(len(b))
+        return n
+
+
+def _wrapper(data: bytes, chunk_size: int):
+    stream = CountingStream(data)
+    resp = HTTPResponse(200, {}, stream=stream)
+    return ResponseStreamWrapper(resp, chunk_size), stream
+
+
+def test_reads_are_limited_to_the_chunk_size():
+    wrapper, stream = _wrapper(b'x' * 100, 16)
+
+    chunks = iter(lambda: wrapper.read(1000), b'')
+
+    assert [len(c) for c in chunks] == [16] * 6 + [4]
+    assert max(stream.reads) == 16
+    assert wrapper.bytes_read == 100
+
+
+def test_peek_does_not_consume():
+    wrapper, _ = _wrapper(b'{"queryId": "q"}', 8)
+
+    assert wrapper.peek() == b'{"queryI'
+    assert wrapper.peek() == b'{"queryI'
+    assert wrapper.read(4) == b'{"qu'
+    assert wrapper.read() == b'eryId": "q"}'
+
+
+def test_readinto_serves_peeked_bytes_first():
+    wrapper, _ = _wrapper(b'0123456789', 4)
+    wrapper.peek()
+    buf = bytearray(3)
+
+    assert wrapper.readinto(buf) == 3 and buf == b'012'
+    assert wrapper.readinto(buf) == 1 and buf[:1] == b'3'
+    assert wrapper.readinto(buf) == 3 and buf == b'456'
+
+
+def test_consumed_responses_are_read_from_their_content():
+    resp = HTTPResponse(200, {}, content=b'abcdef')
+    wrapper = ResponseStreamWrapper(resp, 4)
+
+    assert wrapper.read() == b'abcdef'
+
+
+def test_streamed_rows_span_batches(drill):
+    conn = connect(drill, chunk_size=64)
+    cursor = conn.cursor()
+    cursor.execute('select * from dfs.tmp.sales')
+
+    rows = cursor.fetchall()
+
+    assert len(rows) == 2500
+    assert rows[1] == (1, 'north', 1.5)
+    assert rows[-1] == (2499, 'north', 2499.5)
+    assert cursor.rowcount == 2500
+    assert cursor.result_md['queryState'] == 'COMPLETED'
+    assert [d[0] for d in cursor.description] == ['id', 'region', 'amount']
+
+
+def test_streamed_responses_are_released(drill, transport):
+    conn = connect(drill, transport, whole_body_bytes=0)
+    cursor = conn.cursor()
+    cursor.execute('select * from dfs.tmp.sales')
+    assert transport.open_responses == 1
+
+    cursor.fetchall()
+
+    assert transport.open_responses == 0
+    assert drill.cancelled == []
+
+
+def test_read_ahead_finds_the_end_within_the_limit():
+    wrapper, stream = _wrapper(b'0123456789', 4)
+
+    assert wrapper.read_ahead(16)
+    assert wrapper.peek() == b'0123456789'
+    assert max(stream.reads) == 4
+    assert wrapper.read() == b'0123456789'
+
+
+def test_read_ahead_leaves_longer_streams_to_be_read():
+    wrapper, _ = _wrapper(b'x' * 20 + b'y' * 80, 8)
+
+    assert not wrapper.read_ahead(16)
+    assert wrapper.bytes_read == 24
+    assert wrapper.read(20) == b'x' * 20
+    assert wrapper.read() == b'y' * 80
+    assert wrapper.bytes_read == 100
@@ -0,0 +1,141 @@
+# This is the MIT license: http://www.opensource.org/licenses/mit-license.php
+#
+# Copyright (c) 2005-2012 the SQLAlchemy authors and contributors <see AUTHORS file>.
+# SQLAlchemy is a trademark of Michael Bayer.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify, merge,
+# publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons
+# to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+# PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE
+# FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import threading
+import time
+
+import pytest
+import requests
+from sqlalchemy import create_engine, pool, text
+from sqlalchemy.dialects import registry
+
+from sqlalchemy_drill import drilldbapi
+from sqlalchemy_drill.drilldbapi._transport import RequestsTransport
+
+from .fakes import SESSION_COOKIE
+
+QUERY = 'select * from dfs.tmp.sales'
+
+
+def _run_threads(target, n: int):
+    errors = []
+
+    def run():
+        try:
+            target()
+        except Exception as ex:  # pylint: disable=broad-except
+            errors.append(ex)
+
+    threads = [threading.Thread(target=run) for _ in range(n)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(30)
+    assert not any(t.is_alive() for t in threads)
+    assert not errors, errors
+
+
+def _logins(server) -> int:
+    return sum(path == '/j_security_check' for _, path, _ in server.received)
+
+
+@pytest.mark.parametrize('name', ['urllib3', 'requests', 'httpx'])
+def test_a_connection_is_shared_between_threads(drill, server, name):
+    conn = drilldbapi.connect(
+        server.host, server.port, drilluser='u', drillpass='p', transport=name, pool_maxsize=4
+    )
+    results = []
+
+    def query():
+        for _ in range(3):
+            cursor = conn.cursor()
+            cursor.execute(QUERY)
+            results.append(cursor.fetchall())
+            cursor.close()
+
+    _run_threads(query, 8)
+    conn.close()
+
+    assert len(results) == 24
+    assert all(len(rows) == 2500 and rows[-1] == (2499, 'north', 2499.5) for rows in results)
+    assert _logins(server) == 1
+    assert len(drill.queries('sys.drillbits')) == 1
+    assert all(
+        cookie == SESSION_COOKIE for _, path, cookie in server.received
+        if path == '/query.json'
+    )
+
+
+def test_requests_sessions_send_one_request_at_a_time():
+    active = []
+    overlapped = []
+
+    class RecordingSession(requests.Session):
+        def request(self, *args, **kwargs):  # pylint: disable=arguments-differ
+            active.append(1)
+            overlapped.append(len(active) > 1)
+            time.sleep(0.01)
+            active.pop()
+            resp = requests.Response()
+            resp.status_code = 200
+            resp._content = b'{}'
+            return resp
+
+    transport = RequestsTransport(RecordingSession())
+
+    _run_threads(lambda: transport.post_json('http://drill:8047/query.json', {}), 8)
+
+    assert len(overlapped) == 8 and not any(overlapped)
+
+
+@pytest.fixture
+def engine_url(server):
+    registry.register('drill.sadrill', 'sqlalchemy_drill.sadrill', 'DrillDialect_sadrill')
+    return f'drill+sadrill://u:p@{server.host}:{server.port}/dfs/tmp'
+
+
+@pytest.mark.parametrize('name, pool_size_of', [
+    ('urllib3', lambda t: t._pool.connection_pool_kw['maxsize']),
+    ('requests', lambda t: t.session.get_adapter('http://drill')._pool_maxsize),
+    ('httpx', lambda t: t._client._transport._pool._max_connections),
+])
+def test_pool_maxsize_is_a_url_option(engine_url, name, pool_size_of):
+    engine = create_engine(f'{engine_url}?pool_maxsize=3&transport={name}')
+    conn = engine.raw_connection()
+
+    assert pool_size_of(conn.driver_connection._transport) == 3
+    conn.close()
+    engine.dispose()
+
+
+def test_dialect_pools_connections_between_threads(engine_url, server):
+    engine = create_engine(engine_url, pool_size=2, max_overflow=0)
+
+    def query():
+        with engine.connect() as conn:
+            assert len(conn.execute(text(QUERY)).fetchall()) == 2500
+
+    _run_threads(query, 8)
+
+    assert isinstance(engine.pool, pool.QueuePool)
+    assert engine.pool.size() == 2
+    # a login per pooled connection rather than per thread
+    assert 1 <= _logins(server) <= 2
+    engine.dispose()
@@ -0,0 +1,235 @@
+# This is the MIT license: http://www.opensource.org/licenses/mit-license.php
+#
+# Copyright (c) 2005-2012 the SQLAlchemy authors and contributors <see AUTHORS file>.
+# SQLAlchemy is a trademark of Michael Bayer.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify, merge,
+# publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons
+# to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+# PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE
+# FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import asyncio
+import gzip
+import json
+import socket
+import threading
+
+import pytest
+from sqlalchemy.util import greenlet_spawn
+
+from sqlalchemy_drill.drilldbapi import OperationalError
+from sqlalchemy_drill.drilldbapi._transport import (
+    AsyncHttpxTransport, HTTPResponse, Transport, create_transport
+)
+
+from .fakes import SESSION_COOKIE, wait_for
+
+httpx = pytest.importorskip('httpx')
+
+BLOCKING_TRANSPORTS = ['requests', 'urllib3', 'httpx']
+RESULT = json.dumps({
+    'queryId': 'q', 'columns': ['i'], 'metadata': ['INT'],
+    'rows': [{'i': i} for i in range(5000)], 'queryState': 'COMPLETED',
+}).encode()
+
+
+@pytest.fixture(autouse=True)
+def result(drill):
+    drill.handlers.append(('select 1', lambda payload: (200, RESULT)))
+
+
+def _query(transport: Transport, base_url: str, stream: bool = True) -> HTTPResponse:
+    return transport.post_json(f'{base_url}/query.json', {'query': 'select 1'}, stream=stream)
+
+
+def test_transports_implement_every_method():
+    class Incomplete(Transport):
+        def post_json(self, url, payload, stream=False):
+            return None
+
+    with pytest.raises(TypeError, match='abstract'):
+        Incomplete()  # pylint: disable=abstract-class-instantiated
+
+
+@pytest.mark.parametrize('name', BLOCKING_TRANSPORTS)
+def test_login_cookies_are_sent_with_later_requests(server, name):
+    transport = create_transport(name)
+
+    resp = transport.post_form(
+        f'{server.base_url}/j_security_check', {'j_username': 'u', 'j_password': 'p'}
+    )
+    _query(transport, server.base_url, stream=False)
+    transport.get(f'{server.base_url}/profiles/cancel/q')
+    transport.close()
+
+    assert resp.status_code == 200
+    assert [r[:2] for r in server.received] == [
+        ('POST', '/j_security_check'), ('GET', '/'), ('POST', '/query.json'),
+        ('GET', '/profiles/cancel/q'),
+    ]
+    assert all(cookie == SESSION_COOKIE for _, _, cookie in server.received[1:])
+
+
+@pytest.mark.parametrize('compression', [True, False])
+@pytest.mark.parametrize('name', BLOCKING_TRANSPORTS)
+def test_results_are_streamed(server, name, compression):
+    transport = create_transport(name, compression=compression)
+
+    resp = _query(transport, server.base_url)
+    first = resp.stream.read(100)
+    rest = resp.content
+
+    assert first + rest == RESULT
+    expected_size = len(gzip.compress(RESULT)) if compression else len(RESULT)
+    assert resp.bytes_received == expected_size
+    assert resp.bytes_decoded == len(RESULT)
+    resp.close()
+    transport.close()
+
+
+@pytest.mark.parametrize('name', BLOCKING_TRANSPORTS)
+def test_unread_responses_release_their_connection(server, name):
+    transport = create_transport(name, pool_maxsize=1)
+    resp = _query(transport, server.base_url)
+    resp.stream.read(100)
+    resp.close()
+    results = []
+
+    # with a single connection in the pool, a response which still held it
+    # would block the next
+    thread = threading.Thread(
+        target=lambda: results.append(_query(transport, server.base_url, stream=False))
+    )
+    thread.start()
+    thread.join(5)
+
+    assert results and results[0].content == RESULT
+    # the connection of the unread response was closed rather than kept
+    wait_for(lambda: server.open_connections == 1)
+    transport.close()
+
+
+@pytest.mark.parametrize('name', BLOCKING_TRANSPORTS)
+def test_closing_the_transport_closes_its_connections(server, name):
+    transport = create_transport(name)
+    _query(transport, server.base_url, stream=False)
+    assert server.open_connections == 1
+
+    transport.close()
+
+    wait_for(lambda: server.open_connections == 0)
+
+
+@pytest.mark.parametrize('name', BLOCKING_TRANSPORTS)
+def test_unreachable_drillbits_raise_operational_error(name):
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    transport = create_transport(name)
+
+    with pytest.raises(OperationalError, match=f'Could not reach http://127.0.0.1:{port}'):
+        _query(transport, f'http://127.0.0.1:{port}')
+    with pytest.raises(OperationalError):
+        transport.get(f'http://127.0.0.1:{port}/status')
+    transport.close()
+
+
+class _Chunks(httpx.AsyncByteStream):
+    """A response body streamed in chunks, recording whether it was closed."""
+
+    def __init__(self, body: bytes):
+        self._body = body
+        self.closed = False
+
+    async def __aiter__(self):
+        for i in range(0, len(self._body), 1024):
+            yield self._body[i:i + 1024]
+
+    async def aclose(self):
+        self.closed = True
+
+
+def _async_transport(handle) -> AsyncHttpxTransport:
+    return AsyncHttpxTransport(client=httpx.AsyncClient(transport=httpx.MockTransport(handle)))
+
+
+def _run_in_greenlet(fn):
+    async def run():
+        return await greenlet_spawn(fn)
+    return asyncio.run(run())
+
+
+def test_async_login_cookies_are_sent_with_later_requests():
+    requests = []
+
+    def handle(request):
+        requests.append((request.url.path, request.headers.get('Cookie')))
+        if request.url.path == '/j_security_check':
+            return httpx.Response(
+                303, headers={'Location': '/', 'Set-Cookie': f'{SESSION_COOKIE}; Path=/'}
+            )
+        return httpx.Response(200, content=RESULT)
+
+    transport = _async_transport(handle)
+
+    def run():
+        transport.post_form('http://drill:8047/j_security_check', {'j_username': 'u'})
+        _query(transport, 'http://drill:8047', stream=False)
+        transport.get('http://drill:8047/profiles/cancel/q')
+        transport.close()
+
+    _run_in_greenlet(run)
+
+    assert [path for path, _ in requests] == [
+        '/j_security_check', '/', '/query.json', '/profiles/cancel/q'
+    ]
+    assert all(cookie == SESSION_COOKIE for _, cookie in requests[1:])
+
+
+def test_async_results_are_streamed_and_closed():
+    bodies = []
+
+    def handle(request):
+        assert 'gzip' in request.headers['Accept-Encoding']
+        bodies.append(_Chunks(gzip.compress(RESULT)))
+        return httpx.Response(200, headers={'Content-Encoding': 'gzip'}, stream=bodies[-1])
+
+    transport = _async_transport(handle)
+
+    def run():
+        resp = _query(transport, 'http://drill:8047')
+        first = resp.stream.read(100)
+        unread = _query(transport, 'http://drill:8047')
+        unread.stream.read(100)
+        unread.close()
+        content = resp.content
+        resp.close()
+        transport.close()
+        return first + content, resp.bytes_received
+
+    content, bytes_received = _run_in_greenlet(run)
+
+    assert content == RESULT
+    assert bytes_received == len(bodies[0]._body)
+    assert all(body.closed for body in bodies)
+    assert transport._client.is_closed
+
+
+def test_async_unreachable_drillbits_raise_operational_error():
+    def handle(request):
+        raise httpx.ConnectError('connection refused', request=request)
+
+    transport = _async_transport(handle)
+
+    with pytest.raises(OperationalError, match='Could not reach http://drill:8047'):
+        _run_in_greenlet(lambda: _query(transport, 'http://drill:8047'))
@@ -0,0 +1,99 @@
+# This is the MIT license: http://www.opensource.org/licenses/mit-license.php
+#
+# Copyright (c) 2005-2012 the SQLAlchemy authors and contributors <see AUTHORS file>.
+# SQLAlchemy is a trademark of Michael Bayer.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify, merge,
+# publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons
+# to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+# PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE
+# FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+from datetime import date, datetime, time
+
+import pytest
+
+from sqlalchemy_drill.drilldbapi import _types, api_globals
+from sqlalchemy_drill.drilldbapi._types import (
+    _dates_from_ticks, _times_from_ticks, _timestamps_from_ticks
+)
+
+from .fakes import FakeDrill, connect
+
+# 2021-06-01 12:30:45.123, the epoch and a time before it
+_TICKS = [1622550645123, 0, -86_400_000 - 1000, None]
+
+
+@pytest.fixture(params=['python', 'numpy'])
+def conversion(request, monkeypatch):
+    """Runs a test with columns converted value by value and with NumPy."""
+    if request.param == 'numpy':
+        pytest.importorskip('numpy')
+        monkeypatch.setattr(api_globals, '_NUMPY_MIN_VALUES', 1)
+    else:
+        monkeypatch.setattr(_types, 'np', None)
+    return request.param
+
+
+def test_dates_from_ticks(conversion):
+    assert _dates_from_ticks(_TICKS) == [
+        date(2021, 6, 1), date(1970, 1, 1), date(1969, 12, 30), None
+    ]
+
+
+def test_timestamps_from_ticks(conversion):
+    assert _timestamps_from_ticks(_TICKS) == [
+        datetime(2021, 6, 1, 12, 30, 45, 123000),
+        datetime(1970, 1, 1),
+        datetime(1969, 12, 30, 23, 59, 59),
+        None,
+    ]
+
+
+def test_times_from_ticks():
+    assert _times_from_ticks([45045500, 0, None]) == [time(12, 30, 45, 500000), time(0), None]
+
+
+def test_long_columns_convert_alike_with_and_without_numpy(monkeypatch):
+    pytest.importorskip('numpy')
+    ticks = [i * 3_600_123 for i in range(-500, 500)] + [None]
+    with_numpy = (_dates_from_ticks(ticks), _timestamps_from_ticks(ticks))
+
+    monkeypatch.setattr(_types, 'np', None)
+
+    assert (_dates_from_ticks(ticks), _timestamps_from_ticks(ticks)) == with_numpy
+
+
+def test_cursor_typecasts_temporal_columns():
+    drill = FakeDrill()
+    drill.add_table(
+        'dfs.tmp.events', ['day', 'at', 'clock'], ['DATE', 'TIMESTAMP', 'TIME'],
+        [[1622505600000, 1622550645123, 45045500], [None, 0, None]] * 50
+    )
+    cursor = connect(drill).cursor()
+    cursor.execute('select * from dfs.tmp.events')
+
+    rows = cursor.fetchall()
+
+    assert rows[0] == (date(2021, 6, 1), datetime(2021, 6, 1, 12, 30, 45, 123000),
+                       time(12, 30, 45, 500000))
+    assert rows[1] == (None, datetime(1970, 1, 1), None)
+    assert len(rows) == 100
+
+
+def test_drill_before_1_19_values_are_not_typecast():
+    drill = FakeDrill('1.17.0')
+    drill.add_table('dfs.tmp.events', ['day'], ['DATE'], [['2021-06-01']])
+    cursor = connect(drill).cursor()
+    cursor.execute('select * from dfs.tmp.events')
+
+    assert cursor.fetchall() == [('2021-06-01',)]
@@ -0,0 +1,162 @@
+# This is the MIT license: http://www.opensource.org/licenses/mit-license.php
+#
+# Copyright (c) 2005-2012 the SQLAlchemy authors and contributors <see AUTHORS file>.
+# SQLAlchemy is a trademark of Michael Bayer.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify, merge,
+# publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons
+# to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+# PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE
+# FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import gzip
+import io
+from decimal import Decimal
+
+import pytest
+
+from sqlalchemy_drill.drilldbapi import DatabaseError
+from sqlalchemy_drill.drilldbapi._transport import HTTPResponse
+
+from .fakes import FakeTransport, connect
+
+
+class GzipTransport(FakeTransport):
+    """A transport streaming gzip encoded results without a Content-Length."""
+
+    def _response(self, status, body, stream):
+        if not stream:
+            return super()._response(status, body, stream)
+        with self._lock:
+            self.open_responses += 1
+        headers = {'Content-Type': 'application/json', 'Content-Encoding': 'gzip'}
+        return HTTPResponse(
+            status, headers, stream=io.BytesIO(gzip.compress(body)), close=self._close_response
+        )
+
+
+@pytest.fixture
+def prices(drill):
+    drill.add_table(
+        'dfs.tmp.prices', ['item', 'price', 'weight'], ['VARCHAR', 'DECIMAL(10, 2)', 'FLOAT8'],
+        [['a', 1.25, 0.5], ['b', 2.5, None]]
+    )
+    drill.content_length = True
+
+
+def _rows(drill, transport, query, **kwargs):
+    cursor = connect(drill, transport, **kwargs).cursor()
+    cursor.execute(query)
+    # a body parsed in one pass has been released before the rows are fetched
+    parsed_whole = transport.open_responses == 0
+    return cursor.fetchall(), parsed_whole, cursor
+
+
+def test_small_bodies_are_parsed_in_one_pass(drill, transport, prices):
+    rows, parsed_whole, cursor = _rows(drill, transport, 'select * from dfs.tmp.sales')
+
+    assert parsed_whole
+    assert len(rows) == 2500 and rows[3] == (3, 'north', Decimal('3.5'))
+    assert cursor.rowcount == 2500
+    assert cursor.result_md['queryState'] == 'COMPLETED'
+
+
+def test_bodies_over_whole_body_bytes_are_streamed(drill, transport, prices):
+    whole, _, _ = _rows(drill, transport, 'select * from dfs.tmp.sales')
+
+    rows, parsed_whole, _ = _rows(
+        drill, transport, 'select * from dfs.tmp.sales', whole_body_bytes=1024
+    )
+
+    assert not parsed_whole
+    assert rows == whole
+
+
+def test_small_chunked_bodies_are_parsed_in_one_pass(drill, transport):
+    # without a Content-Length, the body is read ahead to find its end
+    rows, parsed_whole, cursor = _rows(drill, transport, 'select * from dfs.tmp.sales')
+
+    assert parsed_whole
+    assert len(rows) == 2500 and rows[-1] == (2499, 'north', 2499.5)
+    assert cursor.result_md['queryState'] == 'COMPLETED'
+
+
+def test_small_compressed_bodies_are_parsed_in_one_pass(drill):
+    transport = GzipTransport(drill)
+    rows, parsed_whole, cursor = _rows(drill, transport, 'select * from dfs.tmp.sales')
+
+    assert parsed_whole
+    assert len(rows) == 2500 and rows[-1] == (2499, 'north', 2499.5)
+    assert cursor.bytes_decoded > cursor.bytes_received
+
+
+@pytest.mark.parametrize('transport_class', [FakeTransport, GzipTransport])
+def test_large_bodies_are_streamed_from_the_read_ahead(drill, transport_class):
+    transport = transport_class(drill)
+    whole, _, _ = _rows(drill, transport, 'select * from dfs.tmp.sales')
+
+    rows, parsed_whole, cursor = _rows(
+        drill, transport, 'select * from dfs.tmp.sales', whole_body_bytes=4096, chunk_size=1024
+    )
+
+    assert not parsed_whole
+    assert rows == whole
+    assert cursor.result_md['queryState'] == 'COMPLETED'
+
+
+def test_unstreamed_results_are_parsed_in_one_pass(drill, transport):
+    rows, parsed_whole, _ = _rows(
+        drill, transport, 'select * from dfs.tmp.sales', stream_results=False
+    )
+
+    assert parsed_whole
+    assert len(rows) == 2500
+
+
+def test_auto_numbers_decode_decimal_columns_exactly(drill, transport, prices):
+    rows, _, cursor = _rows(drill, transport, 'select * from dfs.tmp.prices', numbers='auto')
+
+    assert rows == [('a', Decimal('1.25'), 0.5), ('b', Decimal('2.5'), None)]
+    assert type(rows[0][2]) is float
+    assert cursor._decoded_numbers == 'decimal'
+
+
+def test_auto_numbers_decode_floats_without_decimal_columns(drill, transport, prices):
+    rows, _, cursor = _rows(drill, transport, 'select * from dfs.tmp.sales', numbers='auto')
+
+    assert type(rows[0][2]) is float
+    assert cursor._decoded_numbers == 'float'
+
+
+def test_results_without_rows(drill, transport, prices):
+    drill.handlers.append((
+        'select nothing', lambda payload: (200, {'queryId': 'q', 'queryState': 'COMPLETED'})
+    ))
+    cursor = connect(drill, transport).cursor()
+    cursor.execute('select nothing')
+
+    assert cursor.description is None
+    assert cursor.result_md['queryId'] == 'q'
+
+
+def test_failed_query_states_are_raised(drill, transport, prices):
+    drill.handlers.append((
+        'select failing', lambda payload: (200, {
+            'queryId': 'q', 'columns': ['a'], 'metadata': ['INT'], 'rows': [],
+            'queryState': 'FAILED', 'errorMessage': 'RESOURCE ERROR: out of memory',
+        })
+    ))
+    cursor = connect(drill, transport).cursor()
+
+    with pytest.raises(DatabaseError, match='out of memory'):
+        cursor.execute('select failing')
+        cursor.fetchall()